@@ -1,3 +1,6 @@
+import os
+import asyncio
+import logging
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
@@ -11,6 +14,7 @@ from backend.routers.session import router as session_router
 from backend.routers.tiktok import router as tiktok_router
 from backend.routers.chat import router as chat_router
 from backend.routers.tts import router as tts_router
+from backend.services import ws_relay, chat_log_writer
 
 app = FastAPI()
 
@@ -25,6 +29,8 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # /chat/logs 다음 페이지 cursor, /chat/ask 단계별 지연 시간
+    expose_headers=["X-Next-Cursor", "Server-Timing"],
 )
 
 # Include routers
@@ -40,6 +46,35 @@ app.include_router(tts_router)
 from backend.routers.broadcast import router as broadcast_router
 app.include_router(broadcast_router)
 
+@app.on_event("startup")
+async def on_startup():
+    # WebSocket fan-out 릴레이 (WS_RELAY_ENABLED=true면 Redis pub/sub로 worker 간 공유)
+    await ws_relay.start()
+    # chat_logs write-behind writer
+    chat_log_writer.start()
+    # RAG 임베딩/LLM 모델은 처음 사용할 때 로드됨, RAG_WARMUP=true면 시작 직후 백그라운드에서 미리 로드
+    if os.getenv("RAG_WARMUP", "false").lower() in ("1", "true", "yes"):
+        asyncio.get_running_loop().run_in_executor(None, _rag_warmup)
+
+def _rag_warmup():
+    try:
+        from backend.rag import chain
+        chain.warmup()
+    except Exception as e:
+        logging.error(f"[RAG] warmup 실패: {e}")
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    await ws_relay.stop()
+    # 진행 중인 인덱스 빌드 worker process 정리
+    from backend.rag.index_jobs import index_jobs
+    index_jobs.shutdown()
+    # TTS upstream 연결 정리
+    from backend.routers.tts import close_client
+    await close_client()
+    # 남은 chat log flush
+    await asyncio.to_thread(chat_log_writer.stop)
+
 # Always use absolute path for assets directory
 assets_dir = Path(__file__).parent / "assets"
 assets_dir.mkdir(exist_ok=True)
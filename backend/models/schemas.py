@@ -25,8 +25,18 @@ class AskPayload(BaseModel):
     id: str  # character_id
     session_id: str
     viewer_id: str
-    history: List[ChatTurn]
+    history: List[ChatTurn] = []  # room_id로 라이브 댓글을 쓰면 비워도 됨
     profile: Optional[dict] = None  # profile(instruction, examples) 허용
+    room_id: Optional[str] = None  # 라이브 room: 지정하면 댓글 선별기에서 질문 선택
+
+class AskBatchPayload(BaseModel):
+    id: str  # character_id
+    session_id: str
+    viewer_id: str = ""
+    room_id: Optional[str] = None  # 지정하면 댓글 선별기에서 최대 k개 선택
+    comments: List[str] = []  # room_id 대신 직접 보낼 댓글
+    k: int = 5
+    profile: Optional[dict] = None
 
 class StartSessionPayload(BaseModel):
     pass
@@ -34,6 +44,10 @@ class StartSessionPayload(BaseModel):
 class EndSessionPayload(BaseModel):
     session_id: str
 
+class IndexBuildPayload(BaseModel):
+    world_text: str
+    profile: Optional[dict] = None  # 없으면 저장된 캐릭터 profile 사용
+
 class CharacterCreatePayload(BaseModel):
     name: str
     description: str
@@ -1,32 +1,123 @@
 import os
+import json
+import time
+import asyncio
+import logging
+import threading
 from dotenv import load_dotenv
-from typing import List
+from operator import itemgetter
+from typing import List, Optional
 
 from langchain_community.vectorstores import FAISS
-from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_core.prompts import PromptTemplate
-from langchain_core.runnables import RunnableMap, RunnablePassthrough, RunnableLambda
-from langchain_openai import ChatOpenAI
-from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_core.runnables import RunnableMap, RunnableLambda, RunnableSequence
+from langchain_core.output_parsers import StrOutputParser
 from langchain_core.documents import Document
 
 from backend.rag.parsers import emotion_parser
+from backend.rag import vector_index, index_jobs
+from backend.rag.chain_cache import character_chains
+from backend.rag.retrieval_cache import retrieval_cache
+from backend.rag.embedding_cache import CachedEmbeddings
+from backend.rag.query_batcher import MicroBatchEmbeddings
+from backend.services import prompt_cache, conversation_memory, llm_governor
+from backend.services.sentence_stream import SentenceBuffer, find_emotion_tag
 
 # storage 저장위치 지정
 CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
 db_dir = os.path.join(CURRENT_DIR, "storage")
+SOURCE_FILE = "source.json"
 
 # .env 로드
 env_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '.env'))
 load_dotenv(env_path)
 
 # 모델 및 임베딩 설정
-embedding_model = HuggingFaceEmbeddings(model_name="BAAI/bge-small-en-v1.5")
-llm = ChatOpenAI(model="gpt-4o", temperature=0.7, api_key=os.getenv("OPENAI_API_KEY"))
-splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=100)
+# import만으로 torch/임베딩 모델을 올리지 않도록 처음 사용할 때 생성 (여러 요청이 동시에 와도 한 번만)
+EMBEDDING_MODEL = os.getenv("RAG_EMBEDDING_MODEL", "BAAI/bge-small-en-v1.5")
+LLM_MODEL = os.getenv("RAG_LLM_MODEL", "gpt-4o")
 
-# 캐릭터 체인 캐시
-character_chains = {}
+_embedding_model = None
+_cached_embeddings = None
+_llm = None
+_splitter = None
+# 임베딩 모델 로딩(수 초) 중에도 llm/splitter는 바로 만들 수 있도록 lock을 따로 둠
+_embedding_lock = threading.Lock()
+_llm_lock = threading.Lock()
+_splitter_lock = threading.Lock()
+
+
+def get_embedding_model():
+    global _embedding_model
+    if _embedding_model is None:
+        with _embedding_lock:
+            if _embedding_model is None:
+                from langchain_huggingface import HuggingFaceEmbeddings
+                _embedding_model = HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL)
+    return _embedding_model
+
+
+def get_cached_embeddings() -> CachedEmbeddings:
+    """
+    문서 임베딩: 디스크 캐시(모델 이름 + 내용 hash)에서 재사용
+    질문 임베딩: 동시에 들어온 질문을 모아서 한 번에 (query_batcher)
+    """
+    global _cached_embeddings
+    if _cached_embeddings is None:
+        model = get_embedding_model()
+        with _embedding_lock:
+            if _cached_embeddings is None:
+                _cached_embeddings = CachedEmbeddings(MicroBatchEmbeddings(model), EMBEDDING_MODEL)
+    return _cached_embeddings
+
+
+def get_llm():
+    global _llm
+    if _llm is None:
+        with _llm_lock:
+            if _llm is None:
+                from langchain_openai import ChatOpenAI
+                _llm = ChatOpenAI(model=LLM_MODEL, temperature=0.7, api_key=os.getenv("OPENAI_API_KEY"))
+    return _llm
+
+
+def get_splitter():
+    global _splitter
+    if _splitter is None:
+        with _splitter_lock:
+            if _splitter is None:
+                from langchain.text_splitter import RecursiveCharacterTextSplitter
+                _splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=100)
+    return _splitter
+
+
+def warmup() -> dict:
+    """
+    앱 시작 후 백그라운드에서 호출 (RAG_WARMUP=true): 모델 로드 + 첫 임베딩을 미리 해서
+    첫 요청이 모델 로딩 시간을 기다리지 않도록 함. 단계별 소요 시간(ms) 반환
+    """
+    timings = {}
+    started = time.perf_counter()
+    get_splitter()
+    timings["splitter"] = round((time.perf_counter() - started) * 1000, 1)
+    started = time.perf_counter()
+    get_llm()
+    timings["llm"] = round((time.perf_counter() - started) * 1000, 1)
+    started = time.perf_counter()
+    get_embedding_model().embed_query("warmup")
+    timings["embedding"] = round((time.perf_counter() - started) * 1000, 1)
+    logging.info(f"[RAG] warmup 완료: {timings}")
+    return timings
+
+
+def __getattr__(name):
+    # 예전 모듈 변수(embedding_model, llm, splitter)를 쓰던 코드 호환: 접근하는 순간 생성
+    accessors = {"embedding_model": get_embedding_model, "llm": get_llm, "splitter": get_splitter}
+    if name in accessors:
+        return accessors[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# 캐릭터 체인 캐시: 개수/메모리 한도가 있는 LRU (backend/rag/chain_cache.py), 방송 중인 캐릭터는 pin
 
 # Jinja2 템플릿 환경 설정
 from jinja2 import Environment, FileSystemLoader
@@ -38,7 +129,19 @@ jinja_env = Environment(loader=FileSystemLoader(TEMPLATE_DIR))
 def format_docs(docs: List[Document]) -> str:
     return "\n\n".join([str(doc.page_content) if doc.page_content is not None else "" for doc in docs])
 
-def load_character_chain(character_id: str, world_text: str, character_profile: dict):
+def cached_retriever(character_id: str, vectordb: FAISS, version: str):
+    """같은 인덱스 version에서 같은 (정규화한) 질문은 임베딩/검색 없이 이전 결과 재사용"""
+    retriever = vectordb.as_retriever(search_kwargs={"k": 3})
+
+    async def asearch(query):
+        return await retrieval_cache.aget_or_search(character_id, version, query, retriever.ainvoke)
+
+    return RunnableLambda(
+        lambda query: retrieval_cache.get_or_search(character_id, version, query, retriever.invoke),
+        afunc=asearch,
+    )
+
+def build_documents(world_text: str, character_profile: dict) -> List[Document]:
     docs = []
 
     profile_text = f"""Character name: {character_profile.get('name', '')}
@@ -48,15 +151,13 @@ Tone: {character_profile.get('tone', '')}"""
 
     docs.append(Document(page_content=profile_text, metadata={"type": "profile"}))
 
-    world_docs = splitter.create_documents([world_text])
+    world_docs = get_splitter().create_documents([world_text])
     for doc in world_docs:
         doc.metadata["type"] = "world"
     docs.extend(world_docs)
+    return docs
 
-    vectordb = FAISS.from_documents(docs, embedding_model)
-    vectordb.save_local(os.path.join(db_dir, character_id))
-    retriever = vectordb.as_retriever(search_kwargs={"k": 3})
-
+def character_prompt(character_id: str, world_text: str, character_profile: dict) -> PromptTemplate:
     # 국가에 따라 Jinja2 템플릿 파일 선택 및 렌더링
     country = str(character_profile.get("country", "")).lower()
     if country == "korean":
@@ -64,77 +165,96 @@ Tone: {character_profile.get('tone', '')}"""
     else:
         template_file = "character_prompt_template_en.j2"
 
-    template = jinja_env.get_template(template_file)
-    prompt_template = template.render(
-        name=str(character_profile.get("name", "")),
-        style=str(character_profile.get("style", "")),
-        perspective=str(character_profile.get("perspective", "")),
-        tone=str(character_profile.get("tone", "")),
-        world=str(world_text),
-        input="{input}"
-    )
-
-    prompt = PromptTemplate.from_template(prompt_template).partial(
-        name=str(character_profile.get("name", "")),
-        style=str(character_profile.get("style", "")),
-        perspective=str(character_profile.get("perspective", "")),
-        tone=str(character_profile.get("tone", "")),
-        world=str(world_text)
-    )
+    # 캐릭터별로 한 번 렌더링한 prefix 재사용, 변수({input})는 템플릿 맨 끝에만 남김
+    prefix = prompt_cache.get_rag_prefix(character_id, jinja_env, template_file, {
+        "name": str(character_profile.get("name", "")),
+        "style": str(character_profile.get("style", "")),
+        "perspective": str(character_profile.get("perspective", "")),
+        "tone": str(character_profile.get("tone", "")),
+        "world": str(world_text),
+        "profile": character_profile,
+    })
+    return PromptTemplate.from_template(prefix.text)
 
-    chain = (
+def build_chain(character_id: str, vectordb: FAISS, version: str, prompt: PromptTemplate):
+    """
+    입력은 _character_input의 {"input", "query"}
+    검색은 마지막 시청자 입력(query)만으로 → 이전 대화가 달라도 같은 질문이면 retrieval_cache hit
+    """
+    return (
         RunnableMap({
-            "context": retriever | RunnableLambda(format_docs),
-            "input": RunnablePassthrough()
+            "context": itemgetter("query") | cached_retriever(character_id, vectordb, version) | RunnableLambda(format_docs),
+            "input": itemgetter("input"),
         }) |
         prompt |
-        llm |
-        EmotionOutputParser()  # 감정 태깅 파서 추가
+        get_llm() |
+        emotion_parser.EmotionOutputParser(character_id=character_id)  # 감정 태깅 파서 추가
     )
 
-    character_chains[character_id] = chain
+def save_source(path: str, world_text: str, character_profile: dict):
+    """인덱스를 만든 세계관/profile을 버전 디렉터리에 같이 저장 (다른 worker가 같은 프롬프트로 체인을 만들 수 있도록)"""
+    with open(os.path.join(path, SOURCE_FILE), "w", encoding="utf-8") as f:
+        json.dump({"world_text": world_text, "profile": character_profile}, f, ensure_ascii=False)
+
+def load_source(path: str) -> Optional[dict]:
+    try:
+        with open(os.path.join(path, SOURCE_FILE), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def load_character_chain(character_id: str, world_text: str, character_profile: dict):
+    """요청 안에서 바로 빌드 (오래 걸리면 index_jobs 백그라운드 빌드 사용), 같은 캐릭터의 다른 빌드와는 파일 lock으로 직렬화"""
+    base = os.path.join(db_dir, character_id)
+    with index_jobs.character_lock(base):
+        build_id = index_jobs.new_build_id()
+        sync_stats = index_jobs.build_index_job(character_id, world_text, character_profile, base, build_id)
+        vector_index.publish_version(base, build_id)
+    logging.info(f"[RAG] {character_id} 인덱스 갱신: {sync_stats}")
+    return load_character_index(character_id)
 
 def load_character_index(character_id: str):
-    path = os.path.join(db_dir, character_id)
+    """
+    서빙 중인 버전(vector_index.current_path)의 인덱스로 체인을 만들어 캐시에 넣음
+    버전 디렉터리에 source.json이 있으면 캐릭터 템플릿, 없으면(예전 인덱스) 기본 프롬프트
+    """
+    base = os.path.join(db_dir, character_id)
+    version = vector_index.current_version(base)
+    path = vector_index.current_path(base)
     if not os.path.exists(path):
         raise FileNotFoundError(f"No FAISS index found for character {character_id}")
 
-    vectordb = FAISS.load_local(path, embedding_model, allow_dangerous_deserialization=True)
-    retriever = vectordb.as_retriever(search_kwargs={"k": 3})
-
-    fallback_prompt = PromptTemplate.from_template(
-        "Character context:\n{context}\n\nUser input:\n{input}"
-    )
+    # 읽기 전용 mmap 로드: 같은 호스트의 여러 worker가 인덱스 메모리를 page cache로 공유
+    mapped = vector_index.MMAP_ENABLED
+    vectordb = vector_index.load_index(path, get_cached_embeddings(), mmap=mapped)
+    if vectordb is None:
+        raise FileNotFoundError(f"No FAISS index found for character {character_id}")
 
-    chain = (
-        RunnableMap({
-            "context": retriever | RunnableLambda(format_docs),
-            "input": RunnablePassthrough()
-        }) |
-        fallback_prompt |
-        llm |
-        EmotionOutputParser()  # 감정 태깅 파서 추가
-    )
+    source = load_source(path)
+    if source is not None:
+        prompt = character_prompt(character_id, source.get("world_text", ""), source.get("profile") or {})
+    else:
+        prompt = PromptTemplate.from_template(
+            "Character context:\n{context}\n\nUser input:\n{input}"
+        )
 
-    character_chains[character_id] = chain
+    chain = build_chain(character_id, vectordb, vector_index.read_meta(path).get("version", ""), prompt)
 
-def ask_character(character_id: str, history: List[dict]) -> dict:
-    if character_id not in character_chains:
-        try:
-            load_character_index(character_id)
-        except Exception as e:
-            return {"error": str(e)}
+    character_chains.put(character_id, chain, vectordb, mapped=mapped, version=version)
+    return chain
 
-    chain = character_chains[character_id]
+def _get_chain(character_id: str):
+    # 다른 worker가 새 버전을 게시했으면(symlink 대상이 바뀜) 캐시된 체인을 버리고 새 버전 로드
+    version = vector_index.current_version(os.path.join(db_dir, character_id))
+    return character_chains.get_or_load(character_id, lambda: load_character_index(character_id), version=version)
 
+def _character_input(character_id: str, history: List[dict], session_id: Optional[str], budget: Optional[int] = None) -> Optional[dict]:
     if not history or not isinstance(history, list):
-        return {"error": "Invalid chat history"}
+        return None
 
-    chat_context = ""
-    for turn in history[:-1]:
-        if isinstance(turn, dict) and "role" in turn and "content" in turn:
-            role = "User" if turn["role"] == "user" else "AI"
-            chat_context += f"{role}: {turn['content']}\n"
+    # 이전 대화는 요약 + 최근 턴만 (캐릭터별 토큰 예산 이내, 긴 방송에서도 프롬프트 크기 일정)
+    previous = [turn for turn in history[:-1] if isinstance(turn, dict) and "role" in turn and "content" in turn]
+    chat_context = conversation_memory.build_context(character_id, session_id, previous + [history[-1]], budget)
 
     last_turn = history[-1]
     last_input = last_turn["content"] if isinstance(last_turn, dict) else ""
@@ -143,5 +263,108 @@ def ask_character(character_id: str, history: List[dict]) -> dict:
     if chat_context:
         final_user_input += f"Previous conversation:\n{chat_context}\n\n"
     final_user_input += f"User: {last_input}"
+    # input: 프롬프트에 들어갈 전체 텍스트, query: 검색에 쓸 마지막 입력
+    return {"input": final_user_input, "query": last_input}
+
+def ask_character(character_id: str, history: List[dict], session_id: Optional[str] = None) -> dict:
+    try:
+        chain = _get_chain(character_id)
+    except Exception as e:
+        return {"error": str(e)}
+
+    chain_input = _character_input(character_id, history, session_id)
+    if chain_input is None:
+        return {"error": "Invalid chat history"}
+
+    # 다른 LLM 호출과 같은 governor 대기열 사용 (rate limit, 캐릭터별 동시 호출 수, deadline)
+    return llm_governor.call(
+        chain.invoke, chain_input,
+        character_id=character_id,
+        priority=llm_governor.priority_for(session_id),
+        tokens=llm_governor.estimate_tokens(chain_input["input"]),
+    )  # 반환값은 dict (response + emotion)
+
+# --- async / 스트리밍 ---------------------------------------------------------------
+# 검색(질문 임베딩은 query_batcher에서 batch), LLM 호출 모두 이벤트 루프에서 기다리므로 worker 하나가 여러 시청자를 동시에 처리
+
+async def _aget_chain(character_id: str):
+    version = vector_index.current_version(os.path.join(db_dir, character_id))
+    chain = character_chains.get(character_id, version) if character_id in character_chains else None
+    if chain is None:
+        # 인덱스 파일 로드는 blocking이라 thread에서
+        chain = await asyncio.to_thread(_get_chain, character_id)
+    return chain
+
+async def aask_character(character_id: str, history: List[dict], session_id: Optional[str] = None):
+    """ask_character의 async 버전 (chain.ainvoke)"""
+    try:
+        chain = await _aget_chain(character_id)
+    except Exception as e:
+        return {"error": str(e)}
+
+    budget = await conversation_memory.aget_budget(character_id)
+    chain_input = _character_input(character_id, history, session_id, budget)
+    if chain_input is None:
+        return {"error": "Invalid chat history"}
+
+    return await llm_governor.acall(
+        chain.ainvoke, chain_input,
+        character_id=character_id,
+        priority=llm_governor.priority_for(session_id),
+        tokens=llm_governor.estimate_tokens(chain_input["input"]),
+    )
+
+async def astream_character(character_id: str, history: List[dict], session_id: Optional[str] = None):
+    """
+    스트리밍 버전 ask_character: (event, data)를 순서대로 yield (chat_service.astream_ask와 같은 형식)
+    - token: LLM 토큰
+    - sentence: 끝난 문장 (태그 제거, TTS에 바로 전달 가능)
+    - emotion: [감정: ...] 태그가 파싱되는 즉시 한 번 (태그가 없으면 마지막에 분류 결과)
+    - done: {"text", "emotion"} (감정 파서는 완성된 전체 텍스트에 적용)
+    - error: {"error"} (체인 로드 실패, 잘못된 history)
+    """
+    try:
+        chain = await _aget_chain(character_id)
+    except Exception as e:
+        yield "error", {"error": str(e)}
+        return
+
+    budget = await conversation_memory.aget_budget(character_id)
+    chain_input = _character_input(character_id, history, session_id, budget)
+    if chain_input is None:
+        yield "error", {"error": "Invalid chat history"}
+        return
+
+    # 마지막 단계(감정 파서)는 전체 텍스트가 있어야 하므로 빼고 문자열 토큰으로 스트리밍
+    *steps, parser = chain.steps
+    text_chain = RunnableSequence(*steps, StrOutputParser())
+    sentences = SentenceBuffer()
+    response_text = ""
+    emotion_sent = False
+    index = 0
+    async for token in llm_governor.astream(
+        text_chain.astream, chain_input,
+        character_id=character_id,
+        priority=llm_governor.priority_for(session_id),
+        tokens=llm_governor.estimate_tokens(chain_input["input"]),
+    ):
+        if not token:
+            continue
+        response_text += token
+        yield "token", {"text": token}
+        for sentence in sentences.feed(token):
+            yield "sentence", {"index": index, "text": sentence}
+            index += 1
+        if not emotion_sent:
+            emotion = find_emotion_tag(response_text)
+            if emotion:
+                emotion_sent = True
+                yield "emotion", {"emotion": emotion}
+    for sentence in sentences.flush():
+        yield "sentence", {"index": index, "text": sentence}
+        index += 1
 
-    return chain.invoke(final_user_input)  # 반환값은 dict (response + emotion)
+    result = await parser.aparse(response_text)
+    if not emotion_sent:
+        yield "emotion", {"emotion": result.emotion.value}
+    yield "done", {"text": result.text, "emotion": result.emotion.value}
@@ -0,0 +1,214 @@
+"""
+캐릭터 RAG 체인 LRU 캐시
+
+캐릭터별 체인은 FAISS 인덱스와 docstore를 들고 있으므로 dict에 계속 쌓으면 프로세스 메모리가 끝없이 늘어난다.
+- 개수(RAG_CHAIN_CACHE_SIZE)와 대략적인 byte(RAG_CHAIN_CACHE_MB) 두 한도를 넘으면 가장 오래 안 쓴 체인부터 제거
+- 방송 중인 캐릭터는 pin 해서 제거 대상에서 제외 (방송 세션 하나당 owner 하나)
+- mmap으로 로드한 인덱스의 벡터는 page cache에 있으므로 byte 계산에서 제외
+- 제거는 참조만 끊음 (진행 중인 요청이 쓰던 인덱스는 요청이 끝나면 GC가 해제)
+- 항목마다 인덱스 버전을 기록, get(version=...)에서 다른 worker가 새 버전을 게시했으면 miss로 처리
+heavy 모듈(langchain, faiss)을 import하지 않으므로 라우터에서도 가볍게 import 할 수 있다.
+"""
+import os
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Set
+
+MAX_ENTRIES = int(os.getenv("RAG_CHAIN_CACHE_SIZE", 20))
+MAX_BYTES = int(float(os.getenv("RAG_CHAIN_CACHE_MB", 1024)) * 1024 * 1024)
+# docstore 문서 하나당 파이썬 객체 오버헤드 (Document, metadata dict, id 문자열)
+DOC_OVERHEAD = 600
+
+
+def estimate_index_bytes(index, mapped: bool = False) -> int:
+    """faiss 인덱스가 프로세스 메모리에서 차지하는 대략적인 byte"""
+    ntotal = getattr(index, "ntotal", 0)
+    dim = getattr(index, "d", 0)
+    vectors = ntotal * dim * 4
+    kind = type(index).__name__
+    if "HNSW" in kind:
+        # level 0 이웃 링크 (M*2개, int32) + 원본 벡터
+        neighbors = index.hnsw.nb_neighbors(0) if hasattr(index, "hnsw") else 64
+        return ntotal * neighbors * 4 + (0 if mapped else vectors)
+    if "Refine" in kind:
+        # PQ 코드 + 원본 벡터(재정렬용)
+        base = getattr(index, "base_index", None)
+        codes = ntotal * getattr(base, "code_size", 0) + ntotal * 8
+        return codes + (0 if mapped else vectors)
+    return 0 if mapped else vectors
+
+
+def estimate_store_bytes(vectordb, mapped: bool = False) -> int:
+    if vectordb is None:
+        return 0
+    total = estimate_index_bytes(vectordb.index, mapped)
+    docs = getattr(getattr(vectordb, "docstore", None), "_dict", {}) or {}
+    for doc in docs.values():
+        total += len((getattr(doc, "page_content", "") or "").encode("utf-8")) + DOC_OVERHEAD
+    return total
+
+
+class _Entry:
+    __slots__ = ("chain", "vectordb", "nbytes", "version")
+
+    def __init__(self, chain, vectordb, nbytes, version):
+        self.chain = chain
+        self.vectordb = vectordb
+        self.nbytes = nbytes
+        self.version = version
+
+
+class ChainCache:
+    def __init__(self, max_entries: int = MAX_ENTRIES, max_bytes: int = MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._pins: Dict[str, Set[str]] = {}
+        self._bytes = 0
+        self._lock = threading.RLock()
+        self._load_locks: Dict[str, threading.Lock] = {}
+        self.stats_counters = {"hits": 0, "misses": 0, "evictions": 0, "loads": 0, "stale": 0}
+
+    # 조회/저장 -------------------------------------------------------------------
+    def get(self, character_id: str, version: Optional[str] = None):
+        """version을 주면 저장된 항목의 인덱스 버전이 다를 때 제거하고 None"""
+        with self._lock:
+            entry = self._entries.get(character_id)
+            if entry is not None and version is not None and entry.version is not None and entry.version != version:
+                self._entries.pop(character_id)
+                self._bytes -= entry.nbytes
+                self.stats_counters["stale"] += 1
+                entry = None
+            if entry is None:
+                self.stats_counters["misses"] += 1
+                return None
+            self._entries.move_to_end(character_id)
+            self.stats_counters["hits"] += 1
+            return entry.chain
+
+    def put(self, character_id: str, chain, vectordb=None, mapped: bool = False, version: Optional[str] = None):
+        nbytes = estimate_store_bytes(vectordb, mapped)
+        with self._lock:
+            old = self._entries.pop(character_id, None)
+            if old is not None:
+                self._bytes -= old.nbytes
+            self._entries[character_id] = _Entry(chain, vectordb, nbytes, version)
+            self._bytes += nbytes
+            self.stats_counters["loads"] += 1
+            self._evict()
+
+    def get_or_load(self, character_id: str, loader: Callable[[], Any], version: Optional[str] = None):
+        """캐시에 없으면(또는 version이 다르면) loader()로 로드 (같은 캐릭터를 동시에 여러 번 로드하지 않음)"""
+        chain = self.get(character_id, version)
+        if chain is not None:
+            return chain
+        with self._lock:
+            load_lock = self._load_locks.setdefault(character_id, threading.Lock())
+        with load_lock:
+            with self._lock:
+                entry = self._entries.get(character_id)
+            if entry is not None and (version is None or entry.version in (None, version)):
+                return entry.chain
+            result = loader()
+        with self._lock:
+            self._load_locks.pop(character_id, None)
+            entry = self._entries.get(character_id)
+        return entry.chain if entry is not None else result
+
+    def pop(self, character_id: str, default=None):
+        with self._lock:
+            entry = self._entries.pop(character_id, None)
+            if entry is None:
+                return default
+            self._bytes -= entry.nbytes
+            return entry.chain
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    # dict 호환 (기존 character_chains 사용 코드)
+    def __contains__(self, character_id: str) -> bool:
+        with self._lock:
+            return character_id in self._entries
+
+    def __getitem__(self, character_id: str):
+        chain = self.get(character_id)
+        if chain is None:
+            raise KeyError(character_id)
+        return chain
+
+    def __setitem__(self, character_id: str, chain):
+        self.put(character_id, chain)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    # pin -------------------------------------------------------------------------
+    def pin(self, character_id: str, owner: str = "default"):
+        with self._lock:
+            self._pins.setdefault(character_id, set()).add(owner)
+
+    def unpin(self, character_id: Optional[str] = None, owner: Optional[str] = None):
+        """character_id의 owner pin 해제, owner만 주면 그 owner의 모든 pin 해제"""
+        with self._lock:
+            targets = [character_id] if character_id is not None else list(self._pins)
+            for cid in targets:
+                owners = self._pins.get(cid)
+                if not owners:
+                    continue
+                if owner is None:
+                    owners.clear()
+                else:
+                    owners.discard(owner)
+                if not owners:
+                    self._pins.pop(cid, None)
+            self._evict()
+
+    def is_pinned(self, character_id: str) -> bool:
+        with self._lock:
+            return bool(self._pins.get(character_id))
+
+    # 제거 ------------------------------------------------------------------------
+    def _evict(self):
+        """한도를 넘으면 pin 되지 않은 가장 오래된 항목부터 제거 (lock 안에서 호출)"""
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            victim = next((cid for cid in self._entries if not self._pins.get(cid)), None)
+            if victim is None:
+                logging.warning("[RAG] 체인 캐시 한도 초과, 남은 체인은 모두 pin 되어 있어 제거하지 않습니다.")
+                return
+            entry = self._entries.pop(victim)
+            self._bytes -= entry.nbytes
+            self.stats_counters["evictions"] += 1
+            logging.info(f"[RAG] 체인 캐시에서 제거: {victim} ({entry.nbytes / 1024 / 1024:.1f}MB)")
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.stats_counters["hits"] + self.stats_counters["misses"]
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "pinned": sorted(cid for cid, owners in self._pins.items() if owners),
+                "hit_rate": round(self.stats_counters["hits"] / lookups, 3) if lookups else 0.0,
+                "by_character": {cid: entry.nbytes for cid, entry in self._entries.items()},
+                **self.stats_counters,
+            }
+
+
+character_chains = ChainCache()
+
+
+def pin(character_id: str, owner: str = "default"):
+    character_chains.pin(character_id, owner)
+
+
+def unpin(character_id: Optional[str] = None, owner: Optional[str] = None):
+    character_chains.unpin(character_id, owner)
+
+
+def stats() -> dict:
+    return character_chains.stats()
@@ -0,0 +1,141 @@
+"""
+디스크 임베딩 캐시 (content-addressed, sqlite)
+
+같은 모델로 같은 텍스트를 다시 임베딩하지 않도록 (모델 이름, 텍스트 sha256) → 벡터를 sqlite에 저장한다.
+- CachedEmbeddings: langchain Embeddings 래퍼, embed_documents는 캐시에 없는 텍스트만 한 번에 임베딩
+- embed_query는 캐시하지 않음 (질문은 매번 다르고 짧음)
+- 프로세스/worker 여러 개가 같은 파일을 써도 되도록 WAL 모드 + INSERT OR IGNORE
+"""
+import os
+import sqlite3
+import hashlib
+import logging
+import threading
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_PATH = os.getenv("RAG_EMBEDDING_CACHE_PATH", os.path.join(CURRENT_DIR, "storage", "embedding_cache.sqlite3"))
+# sqlite 변수 개수 제한(기본 999) 아래로 나눠서 조회
+LOOKUP_CHUNK = 500
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    def __init__(self, path: str = CACHE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self.stats = {"hits": 0, "misses": 0}
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            if self.path != ":memory:":
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            if self.path != ":memory:":
+                conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                " model TEXT NOT NULL, hash TEXT NOT NULL, dim INTEGER NOT NULL, vector BLOB NOT NULL,"
+                " PRIMARY KEY (model, hash))"
+            )
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def get_many(self, model: str, hashes: Sequence[str]) -> Dict[str, List[float]]:
+        found: Dict[str, List[float]] = {}
+        unique = list(dict.fromkeys(hashes))
+        with self._lock:
+            conn = self._connect()
+            for start in range(0, len(unique), LOOKUP_CHUNK):
+                part = unique[start:start + LOOKUP_CHUNK]
+                rows = conn.execute(
+                    f"SELECT hash, vector FROM embeddings WHERE model = ? AND hash IN ({','.join('?' * len(part))})",
+                    [model, *part],
+                ).fetchall()
+                for h, blob in rows:
+                    found[h] = np.frombuffer(blob, dtype=np.float32).tolist()
+        return found
+
+    def put_many(self, model: str, items: Dict[str, List[float]]):
+        if not items:
+            return
+        rows = []
+        for h, vector in items.items():
+            array = np.asarray(vector, dtype=np.float32)
+            rows.append((model, h, int(array.shape[0]), array.tobytes()))
+        with self._lock:
+            conn = self._connect()
+            conn.executemany("INSERT OR IGNORE INTO embeddings (model, hash, dim, vector) VALUES (?, ?, ?, ?)", rows)
+            conn.commit()
+
+    def count(self, model: Optional[str] = None) -> int:
+        with self._lock:
+            conn = self._connect()
+            if model is None:
+                return conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            return conn.execute("SELECT COUNT(*) FROM embeddings WHERE model = ?", (model,)).fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class CachedEmbeddings(Embeddings):
+    """embed_documents 결과를 EmbeddingCache에 저장하고 재사용하는 Embeddings 래퍼"""
+
+    def __init__(self, embeddings: Embeddings, model_name: str, cache: Optional[EmbeddingCache] = None):
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.cache = cache or get_cache()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        hashes = [content_hash(t) for t in texts]
+        try:
+            vectors = self.cache.get_many(self.model_name, hashes)
+        except sqlite3.Error as e:
+            logging.error(f"[EMBED_CACHE] 캐시 조회 실패, 전체 임베딩: {e}")
+            vectors = {}
+        missing = {}
+        for text, h in zip(texts, hashes):
+            if h not in vectors and h not in missing:
+                missing[h] = text
+        self.cache.stats["hits"] += len(texts) - len(missing)
+        self.cache.stats["misses"] += len(missing)
+        if missing:
+            computed = self.embeddings.embed_documents(list(missing.values()))
+            new = dict(zip(missing.keys(), computed))
+            vectors.update(new)
+            try:
+                self.cache.put_many(self.model_name, new)
+            except sqlite3.Error as e:
+                logging.error(f"[EMBED_CACHE] 캐시 저장 실패: {e}")
+        return [vectors[h] for h in hashes]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embeddings.embed_query(text)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return await self.embeddings.aembed_query(text)
+
+
+_cache: Optional[EmbeddingCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> EmbeddingCache:
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = EmbeddingCache()
+    return _cache
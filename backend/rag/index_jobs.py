@@ -0,0 +1,348 @@
+"""
+캐릭터 지식 베이스(FAISS 인덱스) 백그라운드 빌드 job
+
+load_character_chain은 요청 처리 중에 문서 분할 + 임베딩 + 저장을 전부 하므로 긴 세계관이면 수십 초가 걸린다.
+여기서는 빌드를 process pool(RAG_INDEX_BUILD_WORKERS개)에서 job으로 돌린다.
+- 같은 캐릭터의 빌드는 호스트 전체에서 하나만: <캐릭터>.lock 파일 lock(flock)을 job이 끝날 때까지 잡음
+  → 다른 API worker가 잡고 있으면 IndexJobConflict (라우터에서 409)
+- job 상태는 <캐릭터>.job.json에도 기록해서 다른 API worker에서도 조회 가능 (진행률은 버전 디렉터리의 progress.json)
+- worker는 현재 서빙 버전을 새 버전 디렉터리(<캐릭터>.versions/<job id>)에 복사해서 증분 갱신 (vector_index.sync_index)
+- 빌드가 끝나면 vector_index.publish_version으로 <캐릭터>.current symlink를 한 번에 교체하고 체인을 새로 로드
+  교체 전까지 질문은 이전 버전을 그대로 사용, 다른 worker는 다음 요청에서 버전이 바뀐 것을 보고 다시 로드 (chain._get_chain)
+worker process는 spawn으로 만든다 (torch/thread 상태를 fork하지 않음), 임베딩 모델은 worker마다 한 번 로드.
+"""
+import os
+import glob
+import json
+import time
+import uuid
+import fcntl
+import shutil
+import logging
+import threading
+import multiprocessing
+from contextlib import contextmanager
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from typing import Callable, Dict, Optional
+
+from backend.rag import vector_index
+
+MAX_WORKERS = int(os.getenv("RAG_INDEX_BUILD_WORKERS", 1))
+# 끝난 job 기록은 최근 것만 보관
+MAX_FINISHED = 200
+PROGRESS_FILE = "progress.json"
+JOB_SUFFIX = ".job.json"
+EMBED_BATCH = 64
+
+QUEUED, RUNNING, SUCCEEDED, FAILED = "queued", "running", "succeeded", "failed"
+
+
+class IndexJobConflict(Exception):
+    def __init__(self, character_id: str, job_id: Optional[str] = None):
+        super().__init__(f"character {character_id} already has a running index build ({job_id or 'unknown'})")
+        self.character_id = character_id
+        self.job_id = job_id
+
+
+def new_build_id() -> str:
+    return uuid.uuid4().hex
+
+
+# --- 캐릭터별 파일 lock ---------------------------------------------------------------
+
+class CharacterLock:
+    """<캐릭터>.lock 에 대한 flock (process가 죽으면 OS가 풀어 줌, 같은 process 안에서도 fd가 다르면 배타적)"""
+
+    def __init__(self, base: str):
+        self.path = base + ".lock"
+        self._fd: Optional[int] = None
+
+    def acquire(self, blocking: bool = True) -> bool:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        fd = os.open(self.path, os.O_CREAT | os.O_RDWR, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+        except BlockingIOError:
+            os.close(fd)
+            return False
+        self._fd = fd
+        return True
+
+    def release(self):
+        if self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
+
+    def is_held_elsewhere(self) -> bool:
+        if not self.acquire(blocking=False):
+            return True
+        self.release()
+        return False
+
+
+@contextmanager
+def character_lock(base: str):
+    lock = CharacterLock(base)
+    lock.acquire()
+    try:
+        yield
+    finally:
+        lock.release()
+
+
+# --- 진행률 / job 상태 파일 ------------------------------------------------------------
+
+def _write_json(path: str, data: dict):
+    tmp = f"{path}.tmp-{os.getpid()}-{threading.get_ident()}"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+def _read_json(path: str) -> dict:
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_progress(staging: str, stage: str, progress: float):
+    _write_json(os.path.join(staging, PROGRESS_FILE), {"stage": stage, "progress": round(progress, 3)})
+
+
+def read_progress(staging: str) -> dict:
+    return _read_json(os.path.join(staging, PROGRESS_FILE))
+
+
+def build_index_job(character_id: str, world_text: str, character_profile: dict, base: str, build_id: str) -> dict:
+    """
+    worker process에서 실행: 새 버전 디렉터리에 인덱스를 만들고 sync 통계를 반환
+    (게시는 호출한 쪽이 vector_index.publish_version으로, 서빙 중인 버전은 건드리지 않음)
+    """
+    from backend.rag import chain
+
+    staging = vector_index.version_path(base, build_id)
+    shutil.rmtree(staging, ignore_errors=True)
+    current = vector_index.current_path(base)
+    if os.path.exists(os.path.join(current, "index.faiss")):
+        shutil.copytree(current, staging)
+    else:
+        os.makedirs(staging)
+    # 진행률: 임베딩 0~0.9, 인덱스 갱신/저장 0.9~1.0
+    _write_progress(staging, "split", 0.0)
+
+    docs = chain.build_documents(world_text, character_profile)
+    embeddings = chain.get_cached_embeddings()
+    # 임베딩을 나눠서 미리 캐시에 채움 → 진행률 기록 가능, sync_index는 캐시만 읽음
+    texts = [doc.page_content for doc in docs]
+    for start in range(0, len(texts), EMBED_BATCH):
+        _write_progress(staging, "embed", 0.9 * start / len(texts))
+        embeddings.embed_documents(texts[start:start + EMBED_BATCH])
+
+    _write_progress(staging, "index", 0.9)
+    _, stats = vector_index.sync_index(staging, docs, embeddings)
+    chain.save_source(staging, world_text, character_profile)
+    os.remove(os.path.join(staging, PROGRESS_FILE))
+    return stats
+
+
+class IndexJob:
+    def __init__(self, character_id: str, job_id: Optional[str] = None):
+        self.job_id = job_id or new_build_id()
+        self.character_id = character_id
+        self.status = QUEUED
+        self.stage: Optional[str] = None
+        self.progress = 0.0
+        self.stats: Optional[dict] = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.future: Optional[Future] = None
+        self.lock: Optional[CharacterLock] = None
+
+    @property
+    def active(self) -> bool:
+        return self.status in (QUEUED, RUNNING)
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.job_id,
+            "character_id": self.character_id,
+            "status": self.status,
+            "stage": self.stage,
+            "progress": self.progress,
+            "stats": self.stats,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class IndexJobQueue:
+    def __init__(
+        self,
+        db_dir: Optional[str] = None,
+        executor: Optional[Executor] = None,
+        worker: Callable = build_index_job,
+        activate: Optional[Callable] = None,
+    ):
+        self.db_dir = db_dir
+        self._executor = executor
+        self._worker = worker
+        self._activate = activate
+        self._jobs: Dict[str, IndexJob] = {}
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> Executor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=MAX_WORKERS, mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._executor
+
+    def _base(self, character_id: str) -> str:
+        if self.db_dir is None:
+            from backend.rag import chain
+            self.db_dir = chain.db_dir
+        return os.path.join(self.db_dir, character_id)
+
+    def _save(self, job: IndexJob):
+        try:
+            _write_json(self._base(job.character_id) + JOB_SUFFIX, job.to_dict())
+        except OSError as e:
+            logging.warning(f"[RAG] {job.character_id} job 상태 저장 실패: {e}")
+
+    def submit(self, character_id: str, world_text: str, character_profile: dict) -> IndexJob:
+        base = self._base(character_id)
+        with self._lock:
+            for job in self._jobs.values():
+                if job.character_id == character_id and job.active:
+                    raise IndexJobConflict(character_id, job.job_id)
+            lock = CharacterLock(base)
+            if not lock.acquire(blocking=False):
+                # 다른 API worker(또는 load_character_chain)가 빌드 중
+                raise IndexJobConflict(character_id, _read_json(base + JOB_SUFFIX).get("job_id"))
+            job = IndexJob(character_id)
+            job.lock = lock
+            self._jobs[job.job_id] = job
+            self._trim()
+        self._save(job)
+        try:
+            future = self._get_executor().submit(
+                self._worker, character_id, world_text, character_profile, base, job.job_id
+            )
+        except Exception as e:
+            self._fail(job, e)
+            return job
+        job.future = future
+        # 게시/체인 로드는 pool 관리 thread를 막지 않도록 별도 thread에서
+        future.add_done_callback(
+            lambda f: threading.Thread(target=self._finish, args=(job, f), daemon=True).start()
+        )
+        return job
+
+    def _finish(self, job: IndexJob, future: Future):
+        base = self._base(job.character_id)
+        try:
+            job.stats = future.result()
+            job.stage = "publish"
+            vector_index.publish_version(base, job.job_id)
+            if self._activate is None:
+                from backend.rag import chain
+                self._activate = chain.load_character_index
+            self._activate(job.character_id)
+        except Exception as e:
+            if vector_index.current_version(base) != job.job_id:
+                shutil.rmtree(vector_index.version_path(base, job.job_id), ignore_errors=True)
+            self._fail(job, e)
+            return
+        job.stage = None
+        job.progress = 1.0
+        job.started_at = job.started_at or job.created_at
+        job.finished_at = time.time()
+        self._done(job, SUCCEEDED)
+        logging.info(f"[RAG] {job.character_id} 인덱스 빌드 완료 ({job.finished_at - job.created_at:.1f}s): {job.stats}")
+
+    def _fail(self, job: IndexJob, error: Exception):
+        job.error = str(error)
+        job.finished_at = time.time()
+        self._done(job, FAILED)
+        logging.error(f"[RAG] {job.character_id} 인덱스 빌드 실패: {error}")
+
+    def _done(self, job: IndexJob, status: str):
+        # 끝난 상태 기록 → 파일 lock 해제를 한 번에 (어느 worker에서 보든 끝난 상태와 lock 해제가 같이 보임)
+        with self._lock:
+            job.status = status
+            self._save(job)
+            if job.lock is not None:
+                job.lock.release()
+                job.lock = None
+
+    def _trim(self):
+        """끝난 job이 MAX_FINISHED개를 넘으면 오래된 것부터 삭제 (lock 안에서 호출)"""
+        finished = [job for job in self._jobs.values() if not job.active]
+        for job in sorted(finished, key=lambda j: j.created_at)[:max(0, len(finished) - MAX_FINISHED)]:
+            self._jobs.pop(job.job_id, None)
+
+    def _with_progress(self, data: dict) -> dict:
+        if data.get("status") == RUNNING and data.get("stage") != "publish":
+            progress = read_progress(vector_index.version_path(self._base(data["character_id"]), data["job_id"]))
+            if progress:
+                data["stage"] = progress.get("stage")
+                data["progress"] = progress.get("progress", data.get("progress"))
+        return data
+
+    def _from_file(self, character_id: str) -> Optional[dict]:
+        """다른 API worker가 만든 job 상태 (lock이 풀려 있는데 진행 중이면 그 worker가 죽은 것)"""
+        base = self._base(character_id)
+        data = _read_json(base + JOB_SUFFIX)
+        if not data:
+            return None
+        if data.get("status") in (QUEUED, RUNNING):
+            if CharacterLock(base).is_held_elsewhere():
+                data["status"] = RUNNING
+            else:
+                data.update(status=FAILED, error="빌드하던 worker가 종료되었습니다.")
+        return self._with_progress(data)
+
+    def status(self, job_id: str) -> Optional[dict]:
+        job = self._jobs.get(job_id)
+        if job is None:
+            for path in glob.glob(os.path.join(glob.escape(self._base("")), "*" + JOB_SUFFIX)):
+                data = _read_json(path)
+                if data.get("job_id") == job_id:
+                    return self._from_file(data["character_id"])
+            return None
+        with self._lock:
+            # 끝난 상태(_done)를 running으로 덮어쓰지 않도록 lock 안에서 전환
+            if job.status == QUEUED and job.future is not None and job.future.running():
+                job.status = RUNNING
+                job.started_at = time.time()
+                self._save(job)
+        data = self._with_progress(job.to_dict())
+        job.stage, job.progress = data["stage"], data["progress"]
+        return data
+
+    def latest(self, character_id: str) -> Optional[dict]:
+        # submit(_trim)이 다른 요청 thread에서 _jobs를 바꾸므로 lock 안에서 복사
+        with self._lock:
+            jobs = [job for job in self._jobs.values() if job.character_id == character_id]
+        local = self.status(max(jobs, key=lambda j: j.created_at).job_id) if jobs else None
+        shared = self._from_file(character_id)
+        if local is None or (shared is not None and shared["created_at"] > local["created_at"]):
+            return shared
+        return local
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+index_jobs = IndexJobQueue()
@@ -0,0 +1,202 @@
+"""
+감정 분류기 (precompiled, single pass)
+
+[감정: ...] 태그와 모든 감정 키워드를 정규식 하나(태그 branch가 맨 앞)로 합쳐 처리한다.
+- 태그: 고정 prefix("[감정")를 str.find로 찾은 위치에서 같은 정규식을 match, 값이 알려진 감정이면 태그 우선
+  (태그는 보통 응답 끝에 있어서, 키워드 점수를 다 센 뒤 태그를 만나는 것보다 빠름)
+- 태그가 없으면 같은 정규식으로 텍스트를 한 번만 훑어 키워드 점수 계산
+  (감정별 any(word in text) 스캔 대신, finditer보다 빠른 findall 사용)
+- 키워드 가중치 합이 가장 큰 감정 (동점이면 EMOTION_PRIORITY 순서), 없으면 neutral
+- 키워드에 대소문자가 없으면(기본 한글 키워드) 텍스트 소문자 변환을 생략 (태그 값만 소문자로)
+- 캐릭터 profile의 emotion_keywords로 키워드/가중치를 추가·변경 가능
+  예) {"happy": ["신나", "최고"], "sad": {"속상": 2.0}}
+"""
+import re
+import asyncio
+import logging
+import threading
+from typing import Dict, Iterable, List, Optional
+
+EMOTION_PRIORITY = ["happy", "sad", "angry", "fear", "surprise", "disgust"]
+EMOTIONS = set(EMOTION_PRIORITY) | {"neutral"}
+DEFAULT_EMOTION = "neutral"
+
+# 기존 EmotionOutputParser 규칙과 같은 키워드 (가중치 1.0)
+DEFAULT_KEYWORDS: Dict[str, Dict[str, float]] = {
+    "happy": {"기뻐": 1.0, "행복": 1.0, "좋아": 1.0, "웃어": 1.0},
+    "sad": {"슬퍼": 1.0, "우울": 1.0, "눈물": 1.0},
+    "angry": {"화나": 1.0, "짜증": 1.0, "열받": 1.0, "분노": 1.0},
+    "fear": {"무서워": 1.0, "불안": 1.0, "겁나": 1.0},
+    "surprise": {"헉": 1.0, "놀랐": 1.0, "깜짝": 1.0},
+    "disgust": {"역겨": 1.0, "징그러": 1.0, "불쾌": 1.0},
+}
+
+TAG_PREFIX = "[감정"
+# findall이 문자열을 돌려주도록 캡처 그룹 없이 (값은 "[감정:" 뒤 ~ "]" 앞을 strip)
+TAG_PATTERN = r"\[감정:[^\]]*\]"
+TAG_VALUE = slice(len(TAG_PREFIX) + 1, -1)
+
+
+def merge_keywords(base: Dict[str, Dict[str, float]], extra) -> Dict[str, Dict[str, float]]:
+    """extra: {emotion: [word, ...]} 또는 {emotion: {word: weight}}"""
+    merged = {emotion: dict(words) for emotion, words in base.items()}
+    for emotion, words in (extra or {}).items():
+        emotion = str(emotion).lower()
+        if emotion not in EMOTIONS or emotion == DEFAULT_EMOTION:
+            logging.warning(f"[EMOTION] 알 수 없는 감정 키워드 설정 무시: {emotion}")
+            continue
+        target = merged.setdefault(emotion, {})
+        if isinstance(words, dict):
+            for word, weight in words.items():
+                target[str(word).lower()] = float(weight)
+        else:
+            for word in words or []:
+                target[str(word).lower()] = 1.0
+    return merged
+
+
+class EmotionClassifier:
+    def __init__(self, keywords: Optional[Dict[str, Dict[str, float]]] = None):
+        self.keywords = keywords or DEFAULT_KEYWORDS
+        # 키워드 → [(emotion, weight)] (같은 단어가 여러 감정에 있을 수 있음)
+        self._lookup: Dict[str, List] = {}
+        for emotion, words in self.keywords.items():
+            for word, weight in words.items():
+                if word:
+                    self._lookup.setdefault(word.lower(), []).append((emotion, weight))
+        # 태그 branch를 맨 앞에, 그 뒤로 긴 키워드 우선 (짧은 키워드가 긴 키워드의 일부를 먼저 가져가지 않도록)
+        # IGNORECASE는 느리므로 키워드/텍스트를 소문자로 맞춰서 비교
+        words = sorted(self._lookup, key=len, reverse=True)
+        self._re = re.compile("|".join([TAG_PATTERN] + [re.escape(w) for w in words]))
+        self._caseless = all(w.lower() == w.upper() for w in words)
+        # 기본 키워드 세트처럼 단어마다 감정 하나·가중치 1.0이면 횟수만 세는 fast path
+        self._counts_only: Optional[Dict[str, str]] = None
+        if all(len(pairs) == 1 and pairs[0][1] == 1.0 for pairs in self._lookup.values()):
+            self._counts_only = {word: pairs[0][0] for word, pairs in self._lookup.items()}
+
+    def _normalize(self, text: str) -> str:
+        return text if self._caseless else text.lower()
+
+    def _find_tag(self, text: str) -> Optional[str]:
+        start = text.find(TAG_PREFIX)
+        while start >= 0:
+            match = self._re.match(text, start)
+            if match is not None and match.group() not in self._lookup:
+                value = match.group()[TAG_VALUE].strip().lower()
+                if value in EMOTIONS:
+                    return value
+            start = text.find(TAG_PREFIX, start + 1)
+        return None
+
+    def _scores(self, text: str) -> Dict[str, float]:
+        scores: Dict[str, float] = {}
+        lookup = self._lookup
+        for word in self._re.findall(text):
+            # 태그 match는 lookup에 없으므로 건너뜀
+            for emotion, weight in lookup.get(word, ()):
+                scores[emotion] = scores.get(emotion, 0.0) + weight
+        return scores
+
+    def tag(self, text: str) -> Optional[str]:
+        if not text:
+            return None
+        return self._find_tag(self._normalize(text))
+
+    def scores(self, text: str) -> Dict[str, float]:
+        if not text:
+            return {}
+        return self._scores(self._normalize(text))
+
+    def classify(self, text: str) -> str:
+        if not text:
+            return DEFAULT_EMOTION
+        if not self._caseless:
+            text = text.lower()
+        if TAG_PREFIX in text:
+            tag = self._find_tag(text)
+            if tag is not None:
+                return tag
+        counts_only = self._counts_only
+        if counts_only is None:
+            scores = self._scores(text)
+        else:
+            scores = {}
+            for word in self._re.findall(text):
+                emotion = counts_only.get(word)
+                if emotion is not None:
+                    scores[emotion] = scores.get(emotion, 0) + 1
+            if len(scores) == 1:
+                return next(iter(scores))
+        best = max(scores.values(), default=0.0)
+        if best <= 0:
+            return DEFAULT_EMOTION
+        for emotion in EMOTION_PRIORITY:
+            if scores.get(emotion) == best:
+                return emotion
+        return DEFAULT_EMOTION
+
+    def classify_batch(self, texts: Iterable[str]) -> List[str]:
+        return [self.classify(text) for text in texts]
+
+
+default_classifier = EmotionClassifier()
+
+# 캐릭터별 분류기 캐시 (profile.emotion_keywords가 없으면 기본 분류기 공유)
+_classifiers: Dict[str, EmotionClassifier] = {}
+_lock = threading.Lock()
+
+
+def classifier_from_profile(profile: Optional[dict]) -> EmotionClassifier:
+    extra = (profile or {}).get("emotion_keywords")
+    if not extra:
+        return default_classifier
+    try:
+        return EmotionClassifier(merge_keywords(DEFAULT_KEYWORDS, extra))
+    except (AttributeError, TypeError, ValueError) as e:
+        logging.warning(f"[EMOTION] emotion_keywords 형식 오류, 기본 키워드 사용: {e}")
+        return default_classifier
+
+
+def get_classifier(character_id: Optional[str] = None) -> EmotionClassifier:
+    if not character_id:
+        return default_classifier
+    with _lock:
+        classifier = _classifiers.get(character_id)
+    if classifier is not None:
+        return classifier
+    try:
+        from backend.services.character_service import get_character_profile
+        classifier = classifier_from_profile(get_character_profile(character_id))
+    except Exception as e:
+        logging.error(f"[EMOTION] 캐릭터 profile 조회 실패, 기본 키워드 사용: {e}")
+        return default_classifier
+    with _lock:
+        _classifiers[character_id] = classifier
+    return classifier
+
+
+async def aget_classifier(character_id: Optional[str] = None) -> EmotionClassifier:
+    """get_classifier의 async 버전: 캐시에 없으면 Supabase profile 조회를 이벤트 루프 밖에서"""
+    if not character_id:
+        return default_classifier
+    with _lock:
+        classifier = _classifiers.get(character_id)
+    if classifier is not None:
+        return classifier
+    return await asyncio.to_thread(get_classifier, character_id)
+
+
+def invalidate_classifier(character_id: Optional[str] = None):
+    with _lock:
+        if character_id is None:
+            _classifiers.clear()
+        else:
+            _classifiers.pop(character_id, None)
+
+
+def classify(text: str, character_id: Optional[str] = None) -> str:
+    return get_classifier(character_id).classify(text)
+
+
+def classify_batch(texts: Iterable[str], character_id: Optional[str] = None) -> List[str]:
+    return get_classifier(character_id).classify_batch(texts)
@@ -1,8 +1,11 @@
 from enum import Enum
+from typing import Optional
 from pydantic import BaseModel
 from langchain_core.outputs import LLMResult
 from langchain_core.output_parsers import BaseOutputParser
 
+from backend.rag.parsers.emotion_classifier import get_classifier, aget_classifier
+
 class EmotionCategory(str, Enum):
     neutral = "neutral"
     happy = "happy"
@@ -17,26 +20,19 @@ class EmotionTaggedOutput(BaseModel):
     emotion: EmotionCategory
 
 class EmotionOutputParser(BaseOutputParser):
-    def parse(self, text: str) -> EmotionTaggedOutput:
-        # 아주 단순한 감정 분류 규칙 (MVP용)
-        lower = text.lower()
-        if any(word in lower for word in ["기뻐", "행복", "좋아", "웃어"]):
-            emotion = EmotionCategory.happy
-        elif any(word in lower for word in ["슬퍼", "우울", "눈물"]):
-            emotion = EmotionCategory.sad
-        elif any(word in lower for word in ["화나", "짜증", "열받", "분노"]):
-            emotion = EmotionCategory.angry
-        elif any(word in lower for word in ["무서워", "불안", "겁나"]):
-            emotion = EmotionCategory.fear
-        elif any(word in lower for word in ["헉", "놀랐", "깜짝"]):
-            emotion = EmotionCategory.surprise
-        elif any(word in lower for word in ["역겨", "징그러", "불쾌"]):
-            emotion = EmotionCategory.disgust
-        else:
-            emotion = EmotionCategory.neutral
+    # 캐릭터별 emotion_keywords를 쓰려면 character_id 지정
+    character_id: Optional[str] = None
 
+    def parse(self, text: str) -> EmotionTaggedOutput:
+        # [감정: ...] 태그 + 키워드 가중치 점수를 한 번에 계산하는 precompiled 분류기 사용
+        emotion = EmotionCategory(get_classifier(self.character_id).classify(text))
         return EmotionTaggedOutput(text=text, emotion=emotion)
 
+    async def aparse(self, text: str) -> EmotionTaggedOutput:
+        # 분류기 캐시 miss면 profile 조회만 이벤트 루프 밖에서, 분류는 그대로
+        classifier = await aget_classifier(self.character_id)
+        return EmotionTaggedOutput(text=text, emotion=EmotionCategory(classifier.classify(text)))
+
     @property
     def _type(self) -> str:
         return "emotion_tagged_output"
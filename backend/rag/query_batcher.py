@@ -0,0 +1,118 @@
+"""
+질문 임베딩 micro-batching
+
+동시에 들어온 ask_character 요청이 각자 embed_query를 부르면 CPU에서 1행짜리 forward pass가 요청 수만큼 돈다.
+MicroBatchEmbeddings는 질문을 큐에 넣고 worker thread 하나가
+- 직전 batch가 도는 동안 쌓인 질문을 (최대 RAG_QUERY_BATCH_MAX개) 모으고,
+  부하가 있는데 한 개만 쌓였으면 RAG_QUERY_BATCH_WAIT_MS 동안 더 기다렸다가
+- embed_documents 한 번으로 임베딩하고 (HuggingFaceEmbeddings는 질문/문서 인코딩이 같음)
+- 각 요청의 Future에 자기 행을 돌려준다.
+요청 쪽은 자기 Future만 기다린다 (동기: result(), 비동기: await aembed_query).
+한가할 때 혼자 들어온 질문은 기다리지 않고 바로 임베딩한다 (단일 요청 지연은 늘지 않음).
+embed_documents(인덱스 생성)는 batching 없이 그대로 전달.
+scripts/bench_query_batching.py로 동시 질문 수별 처리량 측정.
+"""
+import os
+import time
+import asyncio
+import logging
+import threading
+from collections import deque
+from concurrent.futures import Future
+from typing import List, Optional
+
+from langchain_core.embeddings import Embeddings
+
+BATCH_WAIT_MS = float(os.getenv("RAG_QUERY_BATCH_WAIT_MS", 5))
+BATCH_MAX = int(os.getenv("RAG_QUERY_BATCH_MAX", 64))
+
+
+class MicroBatchEmbeddings(Embeddings):
+    def __init__(self, embeddings: Embeddings, max_batch: int = BATCH_MAX, max_wait_ms: float = BATCH_WAIT_MS):
+        self.embeddings = embeddings
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self._queue: deque = deque()
+        self._cond = threading.Condition()
+        self._worker: Optional[threading.Thread] = None
+        self._busy = False
+        self.stats = {"queries": 0, "batches": 0, "max_batch_seen": 0}
+
+    # Embeddings 인터페이스 ---------------------------------------------------------
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.submit(text).result()
+
+    async def aembed_query(self, text: str) -> List[float]:
+        # 이벤트 루프를 막지 않고 자기 행만 기다림
+        return await asyncio.wrap_future(self.submit(text))
+
+    # batching --------------------------------------------------------------------
+    def submit(self, text: str) -> Future:
+        future: Future = Future()
+        with self._cond:
+            self._queue.append((text, future))
+            self._ensure_worker()
+            self._cond.notify()
+        return future
+
+    def _ensure_worker(self):
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._run, name="query-embedding-batcher", daemon=True)
+            self._worker.start()
+
+    def _next_batch(self) -> list:
+        with self._cond:
+            while not self._queue:
+                self._cond.wait()
+            # 부하가 있을 때(직전 batch 직후에도 질문이 남아 있었음)만 혼자 온 질문을 잠깐 붙잡아 둠
+            if len(self._queue) == 1 and self._busy and self.max_wait:
+                deadline = time.monotonic() + self.max_wait
+                while len(self._queue) < self.max_batch:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+            batch = []
+            while self._queue and len(batch) < self.max_batch:
+                text, future = self._queue.popleft()
+                # 기다리던 쪽이 취소한 질문(SSE 연결 끊김 등)은 빼고, 나머지는 취소할 수 없는 상태로 바꿈
+                if future.set_running_or_notify_cancel():
+                    batch.append((text, future))
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if not batch:
+                continue
+            texts = [text for text, _ in batch]
+            try:
+                vectors = self.embeddings.embed_documents(texts)
+            except Exception as e:
+                logging.error(f"[RAG] 질문 임베딩 batch 실패 ({len(texts)}개): {e}")
+                for _, future in batch:
+                    self._resolve(future, error=e)
+                continue
+            finally:
+                with self._cond:
+                    # batch가 도는 동안 아무 질문도 안 왔으면 부하가 낮은 상태 → 다음 질문은 기다리지 않고 바로 처리
+                    self._busy = bool(self._queue)
+            self.stats["queries"] += len(batch)
+            self.stats["batches"] += 1
+            self.stats["max_batch_seen"] = max(self.stats["max_batch_seen"], len(batch))
+            for (_, future), vector in zip(batch, vectors):
+                self._resolve(future, vector)
+
+    @staticmethod
+    def _resolve(future: Future, vector=None, error: Optional[Exception] = None):
+        # Future 하나에 결과를 못 넣어도 worker와 같은 batch의 다른 질문에는 영향 없음
+        try:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(vector)
+        except Exception as e:
+            logging.warning(f"[RAG] 질문 임베딩 결과 전달 실패: {e}")
@@ -0,0 +1,109 @@
+"""
+RAG 검색 결과 캐시
+
+시청자 입력은 달라도 같은 세계관 chunk를 찾는 경우가 많은데 ask_character는 매번 질문 임베딩 + FAISS 검색을 한다.
+(character_id, 인덱스 version, 정규화한 질문) → 검색된 문서 목록을 LRU로 저장한다.
+- 인덱스 version은 index.json의 version (chunk 구성 hash, vector_index._write_meta)
+  → 인덱스가 다시 만들어져 chunk가 바뀌면 key가 달라져서 자동으로 miss
+- 캐릭터의 새 version이 들어오면 그 캐릭터의 예전 version 항목은 바로 제거 (메모리 낭비 방지)
+- 정규화: 유니코드 NFKC + 소문자 + 연속 공백 하나로 (대소문자/공백만 다른 입력은 같은 검색)
+"""
+import os
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+MAX_ENTRIES = int(os.getenv("RAG_RETRIEVAL_CACHE_SIZE", 2048))
+
+_SPACE_RE = re.compile(r"\s+")
+
+
+def normalize_query(query: str) -> str:
+    return _SPACE_RE.sub(" ", unicodedata.normalize("NFKC", query or "")).strip().lower()
+
+
+class RetrievalCache:
+    def __init__(self, max_entries: int = MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str, str], list]" = OrderedDict()
+        self._versions: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self.stats_counters = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+    def _check_version(self, character_id: str, version: str):
+        """캐릭터 인덱스 version이 바뀌었으면 예전 version 항목 제거 (lock 안에서 호출)"""
+        current = self._versions.get(character_id)
+        if current == version:
+            return
+        if current is not None:
+            stale = [key for key in self._entries if key[0] == character_id and key[1] != version]
+            for key in stale:
+                del self._entries[key]
+            self.stats_counters["invalidations"] += len(stale)
+        self._versions[character_id] = version
+
+    def get(self, character_id: str, version: str, query: str) -> Optional[list]:
+        key = (character_id, version, normalize_query(query))
+        with self._lock:
+            docs = self._entries.get(key)
+            if docs is None:
+                self.stats_counters["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats_counters["hits"] += 1
+            return list(docs)
+
+    def put(self, character_id: str, version: str, query: str, docs: list):
+        key = (character_id, version, normalize_query(query))
+        with self._lock:
+            self._check_version(character_id, version)
+            self._entries[key] = list(docs)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats_counters["evictions"] += 1
+
+    def get_or_search(self, character_id: str, version: str, query: str, search: Callable[[str], List]) -> list:
+        docs = self.get(character_id, version, query)
+        if docs is None:
+            docs = search(query)
+            self.put(character_id, version, query, docs)
+        return docs
+
+    async def aget_or_search(self, character_id: str, version: str, query: str, asearch: Callable[[str], Awaitable[List]]) -> list:
+        docs = self.get(character_id, version, query)
+        if docs is None:
+            docs = await asearch(query)
+            self.put(character_id, version, query, docs)
+        return docs
+
+    def invalidate(self, character_id: Optional[str] = None):
+        """character_id의 항목 전부 (None이면 전체) 제거"""
+        with self._lock:
+            if character_id is None:
+                count = len(self._entries)
+                self._entries.clear()
+                self._versions.clear()
+            else:
+                stale = [key for key in self._entries if key[0] == character_id]
+                for key in stale:
+                    del self._entries[key]
+                self._versions.pop(character_id, None)
+                count = len(stale)
+            self.stats_counters["invalidations"] += count
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.stats_counters["hits"] + self.stats_counters["misses"]
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hit_rate": round(self.stats_counters["hits"] / lookups, 3) if lookups else 0.0,
+                "versions": dict(self._versions),
+                **self.stats_counters,
+            }
+
+
+retrieval_cache = RetrievalCache()
@@ -0,0 +1,316 @@
+"""
+캐릭터 FAISS 인덱스 증분 갱신 + 크기별 인덱스 종류 선택
+
+문서 chunk의 id를 내용 hash(type + 내용)로 정해서, 저장된 인덱스와 비교해
+- 새로 생긴 chunk만 임베딩해서 추가
+- 없어진 chunk는 삭제
+- 그대로인 chunk는 건드리지 않음
+임베딩은 CachedEmbeddings를 쓰므로 예전에 임베딩한 적 있는 chunk는 다시 추가되더라도 모델을 호출하지 않는다.
+
+인덱스 종류는 chunk 수로 정한다 (scripts/bench_faiss_index.py로 recall/지연 시간 측정)
+- flat  : RAG_FLAT_MAX 이하, 정확한 검색
+- hnsw  : RAG_HNSW_MAX 이하, 그래프 근사 검색 (efSearch로 recall 조절, 삭제 불가 → 삭제가 있으면 재구성)
+- ivfpq : 그 이상, PQ 압축 코드로 후보를 찾고 원본 벡터로 재정렬 (nprobe, k_factor로 recall 조절)
+          PQ만으로는 recall@10이 0.5 안팎이라 IndexRefineFlat로 재정렬함
+종류가 바뀌거나 삭제를 지원하지 않으면(hnsw, ivfpq) 캐시된 임베딩으로 재구성한다 (모델 호출 없음).
+서빙용 로드(load_index(mmap=True))는 읽기 전용 mmap이라 같은 인덱스를 여러 worker가 page cache로 공유한다.
+
+버전 디렉터리 (index_jobs 백그라운드 빌드)
+- <캐릭터>.versions/<build id>/ 에 새 인덱스를 만들고 <캐릭터>.current symlink를 os.replace로 한 번에 교체
+- 서빙 경로는 current_path(): symlink가 있으면 그 버전, 없으면 예전 방식의 <캐릭터>/ 디렉터리
+- current_version()(symlink 대상 이름)이 바뀌면 다른 worker도 다음 요청에서 새 버전을 로드 (chain_cache version 확인)
+- 이전 버전은 KEEP_VERSIONS개까지 남겨 둠 (로드 중인 다른 worker가 읽던 파일이 바로 사라지지 않도록)
+"""
+import os
+import json
+import math
+import pickle
+import shutil
+import logging
+import threading
+from typing import List, Optional, Tuple
+
+import numpy as np
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from backend.rag.embedding_cache import content_hash
+
+FLAT_MAX = int(os.getenv("RAG_FLAT_MAX", 20000))
+HNSW_MAX = int(os.getenv("RAG_HNSW_MAX", 500000))
+RECALL_TARGET = float(os.getenv("RAG_RECALL_TARGET", 0.95))
+MMAP_ENABLED = os.getenv("RAG_INDEX_MMAP", "true").lower() in ("1", "true", "yes")
+HNSW_M = 32
+HNSW_EF_CONSTRUCTION = 80
+# recall@10 목표 → 검색 파라미터 (384차원 synthetic 벡터로 측정, scripts/bench_faiss_index.py)
+SEARCH_PARAMS = [
+    (0.90, {"ef_search": 32, "nprobe": 8, "k_factor": 4}),
+    (0.95, {"ef_search": 64, "nprobe": 16, "k_factor": 8}),
+    (0.99, {"ef_search": 128, "nprobe": 32, "k_factor": 16}),
+]
+META_FILE = "index.json"
+VERSIONS_SUFFIX = ".versions"
+CURRENT_SUFFIX = ".current"
+KEEP_VERSIONS = 2
+
+
+def chunk_id(doc: Document) -> str:
+    return content_hash(f"{doc.metadata.get('type', '')}\n{doc.page_content or ''}")
+
+
+def _unique(docs: List[Document]) -> Tuple[List[str], List[Document]]:
+    ids, unique = [], []
+    seen = set()
+    for doc in docs:
+        doc_id = chunk_id(doc)
+        if doc_id in seen:
+            continue
+        seen.add(doc_id)
+        ids.append(doc_id)
+        unique.append(doc)
+    return ids, unique
+
+
+# --- 인덱스 종류 ---------------------------------------------------------------
+
+def kind_for_size(count: int) -> str:
+    if count <= FLAT_MAX:
+        return "flat"
+    if count <= HNSW_MAX:
+        return "hnsw"
+    return "ivfpq"
+
+
+def kind_of(index) -> str:
+    import faiss
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(index, (faiss.IndexIVF, faiss.IndexRefine)):
+        return "ivfpq"
+    return "flat"
+
+
+def search_params(recall_target: float = RECALL_TARGET) -> dict:
+    for target, params in SEARCH_PARAMS:
+        if recall_target <= target:
+            return params
+    return SEARCH_PARAMS[-1][1]
+
+
+def tune(index, recall_target: float = RECALL_TARGET):
+    """검색 파라미터는 저장 파일이 아니라 로드할 때마다 현재 recall 목표로 설정"""
+    params = search_params(recall_target)
+    kind = kind_of(index)
+    if kind == "hnsw":
+        index.hnsw.efSearch = params["ef_search"]
+    elif kind == "ivfpq":
+        import faiss
+        ivf = faiss.extract_index_ivf(index)
+        ivf.nprobe = min(params["nprobe"], ivf.nlist)
+        if isinstance(index, faiss.IndexRefine):
+            index.k_factor = params["k_factor"]
+    return index
+
+
+def _pq_subquantizers(dim: int) -> int:
+    # 서브벡터 하나가 8차원 안팎이 되도록, dim을 나누어떨어지게 하는 가장 큰 m
+    for m in range(max(dim // 8, 1), 0, -1):
+        if dim % m == 0:
+            return m
+    return 1
+
+
+def build_faiss_index(vectors: np.ndarray, kind: str):
+    import faiss
+    count, dim = vectors.shape
+    if kind == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, HNSW_M)
+        index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+    elif kind == "ivfpq":
+        nlist = int(min(max(4 * math.sqrt(count), 16), 65536))
+        ivfpq = faiss.IndexIVFPQ(faiss.IndexFlatL2(dim), dim, nlist, _pq_subquantizers(dim), 8)
+        # 학습 데이터는 centroid당 64개 정도면 충분
+        sample = vectors
+        if count > nlist * 64:
+            sample = vectors[np.random.default_rng(0).choice(count, nlist * 64, replace=False)]
+        ivfpq.train(sample)
+        # 원본 벡터는 재정렬에만 쓰이고 mmap으로 로드하면 필요한 page만 읽음
+        index = faiss.IndexRefineFlat(ivfpq)
+    else:
+        index = faiss.IndexFlatL2(dim)
+    if count:
+        index.add(vectors)
+    return tune(index)
+
+
+def _build_store(docs: List[Document], ids: List[str], embeddings: Embeddings, kind: str) -> FAISS:
+    texts = [doc.page_content for doc in docs]
+    vectors = np.asarray(embeddings.embed_documents(texts), dtype=np.float32)
+    index = build_faiss_index(vectors, kind)
+    docstore = InMemoryDocstore({doc_id: doc for doc_id, doc in zip(ids, docs)})
+    return FAISS(embeddings, index, docstore, {i: doc_id for i, doc_id in enumerate(ids)})
+
+
+# --- 저장/로드 -------------------------------------------------------------------
+
+def read_meta(path: str) -> dict:
+    try:
+        with open(os.path.join(path, META_FILE), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_meta(path: str, vectordb: FAISS):
+    ids = sorted(vectordb.index_to_docstore_id.values())
+    meta = {
+        "kind": kind_of(vectordb.index),
+        "count": vectordb.index.ntotal,
+        # chunk 구성이 같으면 같은 값 (검색 결과 캐시 키 등에 사용)
+        "version": content_hash("\n".join(ids))[:16],
+    }
+    with open(os.path.join(path, META_FILE), "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+
+
+def save_index(path: str, vectordb: FAISS):
+    vectordb.save_local(path)
+    _write_meta(path, vectordb)
+
+
+def _mmap_flags(kind: str) -> int:
+    import faiss
+    # 원본 벡터 배열(IndexFlat codes: flat, hnsw storage, ivfpq 재정렬용)을 mmap
+    # faiss가 IO_FLAG_MMAP_IFC를 지원하지 않으면 IVF inverted list만 mmap
+    return getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY
+
+
+def _load_mmap(path: str, embeddings: Embeddings) -> FAISS:
+    import faiss
+    index = faiss.read_index(os.path.join(path, "index.faiss"), _mmap_flags(read_meta(path).get("kind", "flat")))
+    with open(os.path.join(path, "index.pkl"), "rb") as f:
+        docstore, index_to_docstore_id = pickle.load(f)
+    return FAISS(embeddings, index, docstore, index_to_docstore_id)
+
+
+def load_index(path: str, embeddings: Embeddings, mmap: bool = False) -> Optional[FAISS]:
+    """
+    mmap=True: 읽기 전용 mmap 로드 (서빙용, 수정 불가), 실패하면 일반 로드
+    mmap=False: 메모리에 전부 로드 (증분 갱신용)
+    """
+    if not os.path.exists(os.path.join(path, "index.faiss")):
+        return None
+    if mmap:
+        try:
+            vectordb = _load_mmap(path, embeddings)
+            tune(vectordb.index)
+            return vectordb
+        except Exception as e:
+            logging.warning(f"[RAG] mmap 로드 실패, 일반 로드로 대체 {path}: {e}")
+    try:
+        vectordb = FAISS.load_local(path, embeddings, allow_dangerous_deserialization=True)
+        tune(vectordb.index)
+        return vectordb
+    except Exception as e:
+        logging.error(f"[RAG] 인덱스 로드 실패, 새로 생성합니다 {path}: {e}")
+        return None
+
+
+# --- 증분 갱신 -------------------------------------------------------------------
+
+def sync_index(path: str, docs: List[Document], embeddings: Embeddings) -> Tuple[FAISS, dict]:
+    """path의 인덱스를 docs와 같아지도록 갱신 → (vectordb, {"added", "removed", "total", "kind", "rebuilt"})"""
+    ids, docs = _unique(docs)
+    kind = kind_for_size(len(ids))
+    vectordb = load_index(path, embeddings)
+    stats = {"added": 0, "removed": 0, "rebuilt": False}
+
+    if vectordb is not None:
+        wanted = set(ids)
+        existing = set(vectordb.index_to_docstore_id.values())
+        removed = [doc_id for doc_id in existing if doc_id not in wanted]
+        added = [i for i, doc_id in enumerate(ids) if doc_id not in existing]
+        stats.update(added=len(added), removed=len(removed))
+        # 크기 구간이 바뀌었거나, 삭제를 지원하지 않는 인덱스(hnsw, ivfpq)에서 삭제가 필요하면 재구성
+        if kind_of(vectordb.index) != kind or (removed and kind != "flat"):
+            vectordb = None
+        else:
+            if removed:
+                vectordb.delete(removed)
+            if added:
+                texts = [docs[i].page_content for i in added]
+                vectors = embeddings.embed_documents(texts)
+                vectordb.add_embeddings(
+                    list(zip(texts, vectors)), metadatas=[docs[i].metadata for i in added], ids=[ids[i] for i in added]
+                )
+    else:
+        stats["added"] = len(ids)
+
+    if vectordb is None:
+        vectordb = _build_store(docs, ids, embeddings, kind)
+        stats["rebuilt"] = True
+
+    if stats["added"] or stats["removed"] or stats["rebuilt"] or not os.path.exists(os.path.join(path, META_FILE)):
+        save_index(path, vectordb)
+    stats["total"] = vectordb.index.ntotal
+    stats["kind"] = kind_of(vectordb.index)
+    return vectordb, stats
+
+
+# --- 버전 디렉터리 -------------------------------------------------------------------
+
+def versions_dir(base: str) -> str:
+    return base + VERSIONS_SUFFIX
+
+
+def version_path(base: str, version: str) -> str:
+    return os.path.join(versions_dir(base), version)
+
+
+def current_version(base: str) -> str:
+    """서빙 중인 버전 이름 (예전 방식 디렉터리만 있으면 "")"""
+    try:
+        return os.path.basename(os.readlink(base + CURRENT_SUFFIX))
+    except OSError:
+        return ""
+
+
+def current_path(base: str) -> str:
+    version = current_version(base)
+    return version_path(base, version) if version else base
+
+
+def publish_version(base: str, version: str):
+    """base의 서빙 버전을 version으로 교체 (symlink를 os.replace로 바꾸므로 서빙 경로가 비는 순간이 없음)"""
+    link = base + CURRENT_SUFFIX
+    tmp = f"{link}.tmp-{os.getpid()}-{threading.get_ident()}"
+    if os.path.lexists(tmp):
+        os.remove(tmp)
+    # 상대 경로 symlink (storage 디렉터리를 옮겨도 유효)
+    os.symlink(os.path.join(os.path.basename(versions_dir(base)), version), tmp)
+    os.replace(tmp, link)
+    _prune_versions(base, version)
+
+
+def _is_complete(path: str) -> bool:
+    return os.path.exists(os.path.join(path, "index.faiss")) and not os.path.exists(os.path.join(path, "progress.json"))
+
+
+def _prune_versions(base: str, current: str):
+    """현재 버전 + 최근 버전 KEEP_VERSIONS - 1개만 남기고 삭제 (빌드가 끝나지 않은 디렉터리 포함)"""
+    root = versions_dir(base)
+    others = [name for name in os.listdir(root) if name != current]
+    complete = sorted(
+        (name for name in others if _is_complete(os.path.join(root, name))),
+        key=lambda name: os.path.getmtime(os.path.join(root, name)),
+        reverse=True,
+    )
+    keep = set(complete[:KEEP_VERSIONS - 1])
+    for name in others:
+        if name not in keep:
+            shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+    # 예전 방식 디렉터리는 버전 디렉터리가 두 세대 쌓인 뒤 삭제 (그 전까지는 이전 버전 역할)
+    if len(keep) + 1 >= KEEP_VERSIONS and os.path.isdir(base) and not os.path.islink(base):
+        shutil.rmtree(base, ignore_errors=True)
@@ -4,17 +4,22 @@ import os
 import sys
 import logging
 from pymongo import MongoClient
-from typing import List
+from typing import List, Optional
 
 router = APIRouter(prefix="/broadcast")
 
 import uuid
 
 from backend.config.settings import supabase
+from backend.services.event_sources import create_live_client
+from backend.services import comment_triage
+from backend.rag import chain_cache
+from backend.services.session_replay import (
+    active_replays, start_replay, load_events_from_mongo, load_events_from_jsonl, resolve_replay_file,
+)
 from datetime import datetime
 
 # TikTokLive 상태 확인 엔드포인트 추가
-from TikTokLive import TikTokLiveClient
 import asyncio
 
 @router.get("/status")
@@ -27,7 +32,7 @@ async def get_broadcast_status(room_id: str = Query(..., description="TikTok 계
     if not room_id:
         raise HTTPException(status_code=400, detail="Room ID(계정 아이디)가 없습니다.")
     try:
-        client = TikTokLiveClient(unique_id=room_id)
+        client = create_live_client(unique_id=room_id)
         try:
             is_live = await client.is_live()
             return {"is_live": is_live}
@@ -41,6 +46,7 @@ from pydantic import BaseModel
 class StartBroadcastRequest(BaseModel):
     room_id: str
     character_id: str
+    event_source: Optional[str] = None  # tiktok | synthetic (기본: TIKTOK_EVENT_SOURCE)
 
 @router.post("/start")
 async def start_broadcast(req: StartBroadcastRequest):
@@ -85,12 +91,15 @@ async def start_broadcast(req: StartBroadcastRequest):
                 os.path.join(os.path.dirname(__file__), "..", "services", "tiktoklive_event_collector.py")
             )
             # Collector subprocess 실행 및 PID 파일 저장
-            proc = subprocess.Popen([
+            cmd = [
                 "python3",
                 collector_path,
                 "--room_id", room_id,
                 "--session_id", session_id,
-            ])
+            ]
+            if req.event_source:
+                cmd += ["--source", req.event_source]
+            proc = subprocess.Popen(cmd)
             # 세션별 collector PID를 파일에 저장 및 실제 PID 로그 남김
             pid_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "collector_pids"))
             os.makedirs(pid_dir, exist_ok=True)
@@ -102,6 +111,8 @@ async def start_broadcast(req: StartBroadcastRequest):
         except Exception as e:
             print(f"[start_broadcast] Collector launch error: {e}", file=sys.stderr)
             raise HTTPException(status_code=500, detail=f"Collector 실행 실패: {str(e)}")
+        # 방송 중에는 캐릭터 RAG 체인이 LRU 캐시에서 제거되지 않도록 pin (종료 시 해제)
+        chain_cache.pin(character_id, owner=session_id)
         print(f"[start_broadcast] Success: session_id={session_id}", file=sys.stderr)
         return {"message": "방송 시작 및 Collector 실행", "session_id": session_id}
     except HTTPException as e:
@@ -131,6 +142,9 @@ async def stop_broadcast(req: StopBroadcastRequest):
         raise HTTPException(status_code=400, detail="Room ID 또는 Session ID가 누락되었습니다.")
     try:
         ended_at = datetime.now().isoformat()
+        chain_cache.unpin(owner=session_id)
+        # room별 댓글 선별 상태(본 시청자/선물 기록)는 방송 단위라 종료 시 정리
+        comment_triage.reset_room(room_id)
         # supabase live_sessions에 ended_at 기록
         try:
             supabase.table("live_sessions").update({"ended_at": ended_at}).eq("id", session_id).execute()
@@ -252,3 +266,62 @@ async def get_broadcast_events(
         return events
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"MongoDB 조회 오류: {str(e)}")
+
+
+class ReplayRequest(BaseModel):
+    room_id: Optional[str] = None  # 아카이브된 방송 room_id (MongoDB 소스)
+    session_id: Optional[str] = None  # 아카이브된 방송 session_id (MongoDB 소스)
+    file_name: Optional[str] = None  # REPLAY_DIR 안의 JSONL 파일 (파일 소스)
+    target_room_id: Optional[str] = None  # 이벤트를 보낼 room_id (기본: room_id)
+    character_id: Optional[str] = None  # gift tier 테이블용
+    speed: float = 1.0  # 1=실시간, N=N배속, 0 이하=최대 속도
+    targets: List[str] = ["ws"]  # ws: WebSocket fan-out, redis: collector 버퍼
+
+@router.post("/replay")
+async def start_replay_route(req: ReplayRequest):
+    """
+    아카이브된 방송 이벤트를 라이브 이벤트와 같은 경로로 리플레이 (부하 테스트/재현용)
+    """
+    unknown = set(req.targets) - {"ws", "redis"}
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"지원하지 않는 target: {sorted(unknown)}")
+    try:
+        if req.file_name:
+            path = resolve_replay_file(req.file_name)
+            events = await asyncio.to_thread(load_events_from_jsonl, path)
+        elif req.room_id and req.session_id:
+            events = await asyncio.to_thread(load_events_from_mongo, req.room_id, req.session_id)
+        else:
+            raise HTTPException(status_code=400, detail="file_name 또는 room_id/session_id가 필요합니다.")
+    except HTTPException:
+        raise
+    except (ValueError, FileNotFoundError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"리플레이 이벤트 로드 실패: {str(e)}")
+    if not events:
+        raise HTTPException(status_code=404, detail="리플레이할 이벤트가 없습니다.")
+    target_room_id = req.target_room_id or req.room_id or "replay"
+    replay = start_replay(
+        events,
+        target_room_id=target_room_id,
+        speed=req.speed,
+        targets=req.targets,
+        character_id=req.character_id,
+    )
+    return replay.status()
+
+@router.get("/replay/{replay_id}")
+async def get_replay_status(replay_id: str):
+    replay = active_replays.get(replay_id)
+    if replay is None:
+        raise HTTPException(status_code=404, detail="존재하지 않는 리플레이입니다.")
+    return replay.status()
+
+@router.post("/replay/{replay_id}/stop")
+async def stop_replay(replay_id: str):
+    replay = active_replays.get(replay_id)
+    if replay is None:
+        raise HTTPException(status_code=404, detail="존재하지 않는 리플레이입니다.")
+    replay.cancel()
+    return {"message": "리플레이 중지 요청", "replay_id": replay_id}
@@ -1,7 +1,8 @@
 from fastapi import APIRouter
-from backend.models.schemas import CharacterPayload, CharacterCreatePayload
+from backend.models.schemas import CharacterPayload, CharacterCreatePayload, IndexBuildPayload
 from backend.services.character_service import get_characters, create_character, load_character, get_character_profile, update_character_profile
 from fastapi import HTTPException
+from backend.rag.index_jobs import index_jobs, IndexJobConflict
 
 router = APIRouter(prefix="/characters")
 
@@ -31,3 +32,30 @@ def put_profile(id: str, profile: dict):
     if not updated:
         raise HTTPException(status_code=404, detail="존재하지 않는 캐릭터입니다.")
     return {"success": True}
+
+@router.post("/{id}/index", status_code=202)
+def build_index(id: str, payload: IndexBuildPayload):
+    # 지식 베이스 인덱스를 백그라운드 job으로 빌드, 끝날 때까지 질문은 이전 인덱스 사용
+    profile = payload.profile if payload.profile is not None else get_character_profile(id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="존재하지 않는 캐릭터입니다.")
+    try:
+        job = index_jobs.submit(id, payload.world_text, profile)
+    except IndexJobConflict as e:
+        raise HTTPException(status_code=409, detail={"message": "이미 인덱스를 빌드 중입니다.", "job_id": e.job_id})
+    return index_jobs.status(job.job_id)
+
+@router.get("/{id}/index")
+def get_index_job(id: str):
+    # 캐릭터의 가장 최근 인덱스 빌드 job 상태
+    job = index_jobs.latest(id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="인덱스 빌드 기록이 없습니다.")
+    return job
+
+@router.get("/index/jobs/{job_id}")
+def get_index_job_by_id(job_id: str):
+    job = index_jobs.status(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="존재하지 않는 job입니다.")
+    return job
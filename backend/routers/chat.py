@@ -1,14 +1,150 @@
-from fastapi import APIRouter
-from backend.models.schemas import AskPayload
-from backend.services.chat_service import get_chat_logs, ask
+import io
+import csv
+import json
+import itertools
+from fastapi import APIRouter, HTTPException, Response
+from fastapi.responses import StreamingResponse
+from backend.models.schemas import AskPayload, AskBatchPayload
+from backend.services.chat_service import (
+    aask, astream_ask, aask_batch, query_chat_logs, iter_chat_logs, select_columns, CHAT_LOGS_PAGE_SIZE,
+)
+from backend.services import comment_triage, response_cache, llm_governor, latency_metrics
+from backend.rag import chain_cache
+from backend.rag.retrieval_cache import retrieval_cache
 
 router = APIRouter(prefix="/chat")
 
 @router.get("/logs")
-def chat_logs(character_id: str = None, session_id: str = None, date: str = None):
-    return get_chat_logs(character_id, session_id, date)
+def chat_logs(response: Response, character_id: str = None, session_id: str = None, date: str = None,
+              limit: int = CHAT_LOGS_PAGE_SIZE, cursor: str = None, fields: str = None, characters_id: str = None):
+    """
+    최신순 keyset 페이지 (응답 본문은 기존과 같은 row 목록)
+    다음 페이지가 있으면 X-Next-Cursor 헤더 값을 cursor로 다시 요청
+    """
+    # ChatLogsTab은 characters_id로 보냄
+    rows, next_cursor = query_chat_logs(character_id or characters_id, session_id, date, limit, cursor, fields)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return rows
+
+
+@router.get("/logs/export")
+def chat_logs_export(character_id: str = None, session_id: str = None, date: str = None,
+                     fields: str = None, format: str = "ndjson"):
+    # 전체 로그를 페이지 단위로 읽으면서 바로 내려보냄 (NDJSON 또는 CSV)
+    if format not in ("ndjson", "csv"):
+        raise HTTPException(status_code=400, detail="format은 ndjson 또는 csv 입니다.")
+    columns = select_columns(fields)
+    pages = iter_chat_logs(character_id, session_id, date, fields)
+    # 첫 페이지는 응답 시작 전에 조회 (잘못된 date 등은 400으로 응답)
+    first = next(pages, None)
+    rows = itertools.chain([first] if first is not None else [], pages)
+
+    def ndjson():
+        for row in rows:
+            yield json.dumps(row, ensure_ascii=False, default=str) + "\n"
+
+    def csv_lines():
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=columns, extrasaction="ignore")
+        writer.writeheader()
+        for row in rows:
+            writer.writerow(row)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+        yield buffer.getvalue()
+
+    if format == "csv":
+        return StreamingResponse(csv_lines(), media_type="text/csv; charset=utf-8",
+                                 headers={"Content-Disposition": "attachment; filename=chat_logs.csv"})
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson")
 
 
 @router.post("/ask")
-def ask_route(payload: AskPayload):
-    return ask(payload)
+async def ask_route(payload: AskPayload, response: Response, debug: bool = False):
+    # async 경로: LLM 응답을 기다리는 동안 threadpool worker를 점유하지 않음
+    # 단계별 지연 시간은 항상 Server-Timing 헤더로, debug=true면 응답의 timings 필드로도 반환
+    with latency_metrics.trace() as timings:
+        result = await aask(payload)
+    response.headers["Server-Timing"] = latency_metrics.server_timing(timings)
+    return {**result, "timings": timings} if debug else result
+
+
+@router.post("/ask/batch")
+async def ask_batch_route(payload: AskBatchPayload, response: Response, debug: bool = False):
+    # 댓글 여러 개를 LLM 한 번으로 답변 (answers는 /chat/ask 응답과 같은 형식의 목록)
+    with latency_metrics.trace() as timings:
+        result = await aask_batch(payload)
+    response.headers["Server-Timing"] = latency_metrics.server_timing(timings)
+    return {**result, "timings": timings} if debug else result
+
+
+@router.post("/ask/stream")
+async def ask_stream_route(payload: AskPayload, debug: bool = False):
+    """
+    SSE 스트리밍 응답 (event: token | sentence | emotion | done | error)
+    sentence 이벤트의 text는 바로 /tts/stream의 clean_response로 보낼 수 있음
+    debug=true면 done 이벤트에 단계별 지연 시간(timings) 포함
+    """
+    async def event_stream():
+        try:
+            with latency_metrics.trace() as timings:
+                async for event, data in astream_ask(payload):
+                    if event == "done" and debug:
+                        data = {**data, "timings": dict(timings)}
+                    yield f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+        except Exception as e:
+            yield f"event: error\ndata: {json.dumps({'detail': f'질문 처리 실패: {str(e)}'}, ensure_ascii=False)}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/triage/{room_id}")
+def triage_status(room_id: str, limit: int = 10):
+    # 댓글 선별기 대기열 확인용 (꺼내지 않고 조회만)
+    triage = comment_triage.get_triage(room_id)
+    return {"room_id": room_id, "queued": len(triage), "top": triage.peek(limit), "stats": triage.stats}
+
+
+@router.get("/cache/stats")
+def cache_stats(character_id: str = None):
+    # 캐릭터별 응답 캐시 적중률
+    return response_cache.stats(character_id)
+
+
+@router.get("/rag/cache/stats")
+def rag_cache_stats():
+    # 캐릭터 RAG 체인 LRU(적중/미스/제거 수, 캐릭터별 대략적인 메모리, pin 된 캐릭터) + 검색 결과 캐시
+    return {**chain_cache.stats(), "retrieval": retrieval_cache.stats()}
+
+
+@router.delete("/cache")
+def cache_clear(character_id: str = None):
+    response_cache.invalidate(character_id)
+    return {"cleared": character_id or "all"}
+
+
+@router.get("/governor/stats")
+def governor_stats():
+    # LLM 대기열: 진행 중/대기 중 호출 수, 우선순위·캐릭터별 대기 시간, rate limit 잔량
+    return llm_governor.stats()
+
+
+@router.get("/metrics")
+def chat_metrics(prefix: str = None):
+    """
+    단계별 지연 시간 histogram 요약 (count, avg, p50/p95/p99, max)
+    node.*: LangGraph 노드, ask.*/stream.*/batch.*: chat_service 단계, chat_log.insert: supabase bulk insert
+    """
+    return latency_metrics.snapshot(prefix)
+
+
+@router.delete("/metrics")
+def chat_metrics_reset():
+    latency_metrics.reset()
+    return {"reset": True}
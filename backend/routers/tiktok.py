@@ -1,16 +1,18 @@
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, BackgroundTasks, Request
 from pydantic import BaseModel
-from TikTokLive import TikTokLiveClient
+from typing import Optional
 from TikTokLive.events import CommentEvent, GiftEvent
 from TikTokLive.client.errors import UserOfflineError
 from fastapi.responses import JSONResponse
 import asyncio
 import traceback
 
-router = APIRouter()
+from backend.services import ws_relay
+from backend.services.event_sources import create_live_client
+from backend.services.gift_processor import GiftComboProcessor, gift_from_event, get_tier_table
+from backend.services import comment_triage
 
-# 메모리 내에 연결된 websocket 목록 (room_id별로 관리)
-websocket_clients = {}  # {room_id: set([WebSocket, ...])}
+router = APIRouter()
 
 # --- TikTokLive 세션 관리용 ---
 running_clients = {}
@@ -18,16 +20,17 @@ active_clients = {}
 
 class TikTokStartRequest(BaseModel):
     unique_id: str
+    character_id: Optional[str] = None  # 캐릭터별 gift tier 테이블 사용 시
 
 @router.post("/tiktok/start")
 async def start_tiktok_stream(request: TikTokStartRequest, background_tasks: BackgroundTasks):
     print(f"[BACKEND] /tiktok/start called with unique_id: {request.unique_id}")
     try:
-        # 이미 실행 중인 경우 중복 실행 방지
-        if request.unique_id in running_clients:
+        # 이미 실행 중인 경우 중복 실행 방지 (릴레이 모드에서는 다른 worker 포함)
+        if request.unique_id in running_clients or not await ws_relay.aclaim_listener(request.unique_id):
             return {"message": "이미 해당 Room ID로 TikTokLive가 실행 중입니다."}
         # 백그라운드로 리스너 실행 및 추적
-        task = background_tasks.add_task(run_tiktok_listener, request.unique_id)
+        task = background_tasks.add_task(run_tiktok_listener, request.unique_id, character_id=request.character_id)
         running_clients[request.unique_id] = task
         return {"message": "틱톡 방송을 시작했습니다."}
     except Exception as e:
@@ -46,13 +49,22 @@ async def stop_tiktok_listener(request: Request):
     data = await request.json()
     unique_id = data.get("unique_id")
     app = request.app  # app 객체를 request에서 가져옴
+    if unique_id not in running_clients and await ws_relay.alistener_owner(unique_id):
+        # 다른 worker가 리스너를 소유하고 있으면 control 채널로 종료 요청
+        await ws_relay.asend_control("stop_listener", unique_id=unique_id)
+        print(f"[STOP] 다른 worker에 종료 요청 전달: {unique_id}")
+        return {"message": f"TikTokLive listener stop requested for {unique_id}"}
+    return await _stop_local_listener(unique_id, app)
+
+async def _stop_local_listener(unique_id: str, app=None):
     # 실제로 TikTokLive listener를 종료하는 로직 구현
     if unique_id in running_clients:
-        if hasattr(app.state, "tiktok_tasks") and unique_id in app.state.tiktok_tasks:
+        if app is not None and hasattr(app.state, "tiktok_tasks") and unique_id in app.state.tiktok_tasks:
             task = app.state.tiktok_tasks[unique_id]
             task.cancel()
             del app.state.tiktok_tasks[unique_id]
         del running_clients[unique_id]
+        await ws_relay.arelease_listener(unique_id)
         # --- 강제 client 종료 추가 ---
         if unique_id in active_clients:
             try:
@@ -73,32 +85,48 @@ async def stop_tiktok_listener(request: Request):
             del active_clients[unique_id]
         return {"message": f"No active TikTokLive listener for {unique_id}"}
 
+async def _on_stop_listener_control(data: dict):
+    unique_id = data.get("unique_id")
+    if unique_id in running_clients:
+        await _stop_local_listener(unique_id)
+
+ws_relay.on_control("stop_listener", _on_stop_listener_control)
+
 # 백그라운드에서 TikTok 채팅 수집 및 WebSocket으로 전송
 import time
 from websockets.exceptions import ConnectionClosedError
 
-def run_tiktok_listener(unique_id: str, max_retries: int = 2, retry_delay: int = 5):
+def run_tiktok_listener(unique_id: str, max_retries: int = 2, retry_delay: int = 5, character_id: str = None):
     print(f"[BACKEND] run_tiktok_listener started with unique_id: {unique_id}")
+    try:
+        _run_tiktok_listener(unique_id, max_retries, retry_delay, character_id)
+    finally:
+        # 리스너가 끝나면 같은 room을 다시 시작할 수 있도록 정리
+        running_clients.pop(unique_id, None)
+        active_clients.pop(unique_id, None)
+        ws_relay.release_listener(unique_id)
+
+def _run_tiktok_listener(unique_id: str, max_retries: int, retry_delay: int, character_id: str = None):
+    tier_table = get_tier_table(character_id)
     retries = 0
     while retries <= max_retries:
         try:
             loop = asyncio.new_event_loop()
             asyncio.set_event_loop(loop)
-            client = TikTokLiveClient(unique_id=unique_id)
+            client = create_live_client(unique_id=unique_id)
             active_clients[unique_id] = client
+            # 콤보 선물은 streak 종료(또는 시간 창) 단위로 한 번만 전송
+            gift_processor = GiftComboProcessor(
+                emit=lambda gift_msg: ws_relay.publish(unique_id, gift_msg),
+                tier_table=tier_table,
+            )
 
-            # 상태 전송 함수 (room_id별 클라이언트에만 전송)
+            # 상태 전송 함수 (해당 room_id와 _all 구독자에게 전송, 릴레이 모드면 Redis 경유)
             async def send_status_to_clients(status, detail=None):
                 msg = {"type": "status", "status": status}
                 if detail:
                     msg["detail"] = detail
-                # 해당 room_id와 _all에 모두 전송
-                for ws in list(websocket_clients.get(unique_id, set())) + list(websocket_clients.get("_all", set())):
-                    try:
-                        asyncio.create_task(ws.send_json(msg))
-                    except Exception:
-                        print("WebSocket 상태 전송 중 예외:")
-                        print(traceback.format_exc())
+                ws_relay.publish(unique_id, msg)
 
             # 연결 시도 상태 알림
             loop.run_until_complete(send_status_to_clients(
@@ -111,57 +139,27 @@ def run_tiktok_listener(unique_id: str, max_retries: int = 2, retry_delay: int =
             async def on_comment(event: CommentEvent):
                 chat = {"user": event.user.nickname, "comment": event.comment}
                 print(f"[BACKEND] 채팅 수신: {chat}")
-                for ws in list(websocket_clients.get(unique_id, set())) + list(websocket_clients.get("_all", set())):
-                    try:
-                        asyncio.create_task(ws.send_json(chat))
-                    except Exception:
-                        print("WebSocket 전송 중 예외:")
-                        print(traceback.format_exc())
+                ws_relay.publish(unique_id, chat)
+                # LLM에 보낼 댓글 후보로 등록 (스팸/중복은 여기서 걸러짐)
+                comment_triage.submit_comment(unique_id, str(getattr(event.user, "id", "") or ""), event.user.nickname, event.comment)
 
             @client.on(GiftEvent)
             async def on_gift(event: GiftEvent):
-                gift_name = getattr(event.gift, "name", "")
-                gift_coin = getattr(event.gift, "diamond_count", "error")
-                repeat_count = getattr(event.gift, "repeat_count", 1)
-                user_nickname = getattr(event.user, "nickname", "")
-                print(f"[GIFT] name: {gift_name}, coin: {gift_coin}, repeat_count: {repeat_count}, user: {user_nickname}")
-                # diamond_count(coin)에 따라 gift_level_X로 motion_tag 결정
-                try:
-                    coin = int(gift_coin)
-                except Exception:
-                    coin = 1
-                if coin < 10:
-                    motion_tag = "gift_level_1"
-                elif coin < 50:
-                    motion_tag = "gift_level_2"
-                elif coin < 100:
-                    motion_tag = "gift_level_3"
-                elif coin < 500:
-                    motion_tag = "gift_level_4"
-                elif coin < 1000:
-                    motion_tag = "gift_level_5"
-                elif coin < 5000:
-                    motion_tag = "gift_level_6"
-                else:
-                    motion_tag = "gift_level_7"
-                gift_msg = {
-                    "type": "gift",
-                    "gift_name": gift_name,
-                    "gift_coin": gift_coin,
-                    "repeat_count": repeat_count,
-                    "user_nickname": user_nickname,
-                    "motion_tag": motion_tag
-                }
-                for ws in list(websocket_clients.get(unique_id, set())) + list(websocket_clients.get("_all", set())):
-                    try:
-                        asyncio.create_task(ws.send_json(gift_msg))
-                    except Exception:
-                        print("WebSocket gift 전송 중 예외:")
-                        print(traceback.format_exc())
+                gift = gift_from_event(event)
+                print(f"[GIFT] name: {gift['gift_name']}, coin: {gift['gift_coin']}, repeat_count: {gift['repeat_count']}, "
+                      f"streaking: {gift['streakable'] and not gift['repeat_end']}, user: {gift['user_nickname']}")
+                gift_processor.push(gift)
+                # 콤보는 누적 repeat_count라 끝났을 때 한 번만 반영
+                if not gift["streakable"] or gift["repeat_end"]:
+                    comment_triage.record_gift(unique_id, gift["user_id"], gift["gift_coin"] * gift["repeat_count"])
 
             # 연결 성공 상태 알림
             loop.run_until_complete(send_status_to_clients("connected"))
-            client.run()
+            try:
+                client.run()
+            finally:
+                # 끝나지 않은 콤보도 버리지 않고 전송
+                gift_processor.flush_all()
             # 정상 종료 시 break
             break
         except UserOfflineError as e:
@@ -259,37 +257,28 @@ if __name__ == "__main__":
 @router.websocket("/ws/{room_id}")
 async def tiktok_room_ws_endpoint(websocket: WebSocket, room_id: str):
     await websocket.accept()
-    if room_id not in websocket_clients:
-        websocket_clients[room_id] = set()
-    websocket_clients[room_id].add(websocket)
+    await ws_relay.register(room_id, websocket)
     try:
         while True:
             await websocket.receive_text()  # ping/pong 용
     except WebSocketDisconnect:
-        websocket_clients[room_id].remove(websocket)
-        if not websocket_clients[room_id]:
-            del websocket_clients[room_id]
+        pass
     except Exception:
-        websocket_clients[room_id].remove(websocket)
-        if not websocket_clients[room_id]:
-            del websocket_clients[room_id]
+        pass
+    finally:
+        await ws_relay.unregister(room_id, websocket)
 
 # (레거시) 모든 room에 대해 브로드캐스트하는 엔드포인트(가능하면 위의 엔드포인트 사용 권장)
 @router.websocket("/ws/tiktok")
 async def tiktok_ws_endpoint(websocket: WebSocket):
     await websocket.accept()
-    if "_all" not in websocket_clients:
-        websocket_clients["_all"] = set()
-    websocket_clients["_all"].add(websocket)
+    await ws_relay.register(ws_relay.ALL_ROOMS, websocket)
     try:
         while True:
             await websocket.receive_text()
     except WebSocketDisconnect:
-        websocket_clients["_all"].remove(websocket)
-        if not websocket_clients["_all"]:
-            del websocket_clients["_all"]
+        pass
     except Exception:
-        websocket_clients["_all"].remove(websocket)
-        if not websocket_clients["_all"]:
-            del websocket_clients["_all"]
-        websocket_clients.remove(websocket)
+        pass
+    finally:
+        await ws_relay.unregister(ws_relay.ALL_ROOMS, websocket)
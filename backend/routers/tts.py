@@ -1,13 +1,64 @@
-from fastapi import APIRouter, Request, Response, HTTPException
+from fastapi import APIRouter, Request, HTTPException
+from fastapi.responses import JSONResponse, StreamingResponse
 from backend.config.settings import ELEVENLABS_API_KEY
+from backend.services.latency_metrics import record
 import httpx
+import logging
 import re
+import time
 
 router = APIRouter(prefix="/tts")
 
 # ElevenLabs 기본값: "Rachel" voice (voice_id는 실제 사용 시 캐릭터별로 전달)
 DEFAULT_VOICE_ID = "MpbDJfQJUYUnp0i1QvOZ"  # hunmin
 
+# 요청마다 TLS 연결을 새로 맺지 않도록 client 공유 (첫 byte까지 시간 단축)
+_client = None
+
+def get_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(timeout=httpx.Timeout(60.0, connect=10.0))
+    return _client
+
+async def close_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+async def _relay_audio(resp: httpx.Response, started: float):
+    """upstream 오디오를 받는 대로 전달, 첫 chunk(TTFB)와 전체 시간을 tts.* 지표로 기록"""
+    first = True
+    try:
+        async for chunk in resp.aiter_bytes():
+            if first:
+                first = False
+                record("tts.ttfb", (time.perf_counter() - started) * 1000)
+            yield chunk
+    except httpx.HTTPError as e:
+        # 이미 200을 보낸 뒤라 상태 코드는 바꿀 수 없음 → 스트림만 끊고 기록
+        logging.error(f"[TTS] 스트리밍 중 upstream 오류: {e}")
+    finally:
+        await resp.aclose()
+        record("tts.total", (time.perf_counter() - started) * 1000)
+
+class _UpstreamAudioResponse(StreamingResponse):
+    """
+    클라이언트가 본문 iteration 전에 끊으면 _relay_audio의 finally가 돌지 않고
+    (send 실패 시 background task도 실행되지 않음) upstream 연결이 pool에 묶이므로 응답이 끝나면 항상 닫음
+    """
+
+    def __init__(self, upstream: httpx.Response, started: float):
+        super().__init__(_relay_audio(upstream, started), media_type="audio/mpeg")
+        self.upstream = upstream
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            await self.upstream.aclose()
+
 def clean_response_text(text: str) -> str:
     """
     Clean the response text by:
@@ -60,23 +111,27 @@ async def tts_stream(request: Request):
             },
             "language_id": "ko"          # Explicitly set language to Korean
         }
+        started = time.perf_counter()
+        client = get_client()
         try:
-            async with httpx.AsyncClient(timeout=60.0) as client:
-                resp = await client.post(eleven_url, headers=headers, json=payload)
-                content_type = resp.headers.get("content-type", "")
-                if resp.status_code == 200 and "audio/mpeg" in content_type:
-                    audio_bytes = resp.content
-                    from fastapi.responses import Response
-                    return Response(content=audio_bytes, media_type="audio/mpeg")
-                # 에러 응답 처리
-                from fastapi.responses import JSONResponse
-                detail = resp.text
-                return JSONResponse(
-                    status_code=resp.status_code,
-                    content={"detail": f"TTS API 오류: {detail}"}
-                )
+            # stream=True: 헤더만 받고 본문은 StreamingResponse가 읽음 (resp.content를 기다리지 않음)
+            upstream_request = client.build_request("POST", eleven_url, headers=headers, json=payload)
+            resp = await client.send(upstream_request, stream=True)
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"TTS 변환 실패: {str(e)}")
+        content_type = resp.headers.get("content-type", "")
+        if resp.status_code == 200 and "audio/mpeg" in content_type:
+            return _UpstreamAudioResponse(resp, started)
+        # 첫 byte를 보내기 전에 알 수 있는 에러는 upstream 상태 코드 그대로 반환
+        try:
+            detail = (await resp.aread()).decode("utf-8", errors="replace")
+        finally:
+            await resp.aclose()
+        record("tts.error", (time.perf_counter() - started) * 1000)
+        return JSONResponse(
+            status_code=resp.status_code if resp.status_code != 200 else 502,
+            content={"detail": f"TTS API 오류: {detail}"}
+        )
     elif provider == "gemini":
         # TODO: Implement Google Gemini TTS integration here
         raise HTTPException(status_code=501, detail="Google Gemini TTS는 아직 구현되지 않았습니다.")
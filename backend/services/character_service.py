@@ -1,6 +1,9 @@
 from backend.config.settings import supabase
 from backend.models.schemas import CharacterPayload, CharacterCreatePayload
 from fastapi import HTTPException
+from backend.services.gift_processor import invalidate_tier_table
+from backend.services import response_cache, prompt_cache, conversation_memory, ws_relay
+from backend.rag.parsers.emotion_classifier import invalidate_classifier
 
 def get_characters():
     rows = supabase.table("characters").select("id, name, image_url, description, status, created_at").execute()
@@ -91,8 +94,36 @@ def get_character_profile(character_id: str):
         return None
     return rows.data[0].get("profile")
 
+def invalidate_character_caches(character_id: str, profile: dict = None):
+    """
+    이 worker의 캐릭터별 캐시 무효화 (profile의 gift_tiers/instruction/감정 키워드 등이 바뀌었을 수 있음)
+    profile을 받으면 프롬프트 prefix는 바로 다시 렌더링, 없으면 다음 요청에서 다시 조회
+    """
+    invalidate_tier_table(character_id)
+    response_cache.invalidate(character_id)
+    conversation_memory.invalidate_budget(character_id)
+    invalidate_classifier(character_id)
+    if profile is None:
+        prompt_cache.invalidate(character_id)
+    else:
+        prompt_cache.rebuild(character_id, profile)
+
 def update_character_profile(character_id: str, profile: dict):
     result = supabase.table("characters").update({"profile": profile}).eq("id", character_id).execute()
     if result.data and len(result.data) > 0:
+        # 저장된 profile로 프롬프트 prefix를 바로 다시 렌더링 (다음 요청부터 새 버전 사용)
+        invalidate_character_caches(character_id, profile)
+        # 다른 uvicorn worker의 캐시도 무효화 (WS_RELAY_ENABLED일 때 control 채널로 전달)
+        # 동기 publish: 호출하는 PUT /characters/{id}/profile은 sync 라우트라 threadpool에서 실행됨
+        # (async 코드에서 부를 때는 ws_relay.asend_control 사용)
+        ws_relay.send_control("profile_updated", character_id=character_id, origin=ws_relay.WORKER_ID)
         return True
     return False
+
+async def _on_profile_updated_control(data: dict):
+    # control 채널은 보낸 worker에게도 돌아오므로 자기 메시지는 무시 (이미 무효화함)
+    character_id = data.get("character_id")
+    if character_id and data.get("origin") != ws_relay.WORKER_ID:
+        invalidate_character_caches(character_id)
+
+ws_relay.on_control("profile_updated", _on_profile_updated_control)
@@ -5,8 +5,12 @@ from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 from langgraph.graph import END, StateGraph
 from langchain_openai import ChatOpenAI
+from langchain_core.runnables import RunnableConfig, RunnableLambda
 import re
-from backend.rag.parsers.emotion_parser import EmotionOutputParser
+import asyncio
+from backend.rag.parsers.emotion_classifier import get_classifier, aget_classifier
+from backend.services import comment_triage, response_cache, prompt_cache, llm_governor
+from backend.services.latency_metrics import traced_node
 
 # 1️⃣ State 정의
 default_memory = {}
@@ -14,67 +18,105 @@ default_memory = {}
 class GraphState(TypedDict):
     instruction_prompt: str
     examples: str
+    prompt_prefix: str
+    prompt_version: str
     selected_input: str
+    selected_comment: Dict[str, Any]
     response_text: str
     emotion_tag: str
     memory: Dict[str, Any]
 
 # 2️⃣ 어드민 instruction node
 def instruction_loader(state: GraphState) -> GraphState:
-    # PlaygroundTab 등에서 전달한 instruction_prompt, examples를 state에 그대로 사용
-    state["instruction_prompt"] = state.get("instruction_prompt", "")
-    state["examples"] = state.get("examples", "")
+    # PlaygroundTab 등에서 전달한 profile 또는 저장된 캐릭터 profile로 렌더링해 둔 prefix 사용
+    memory = state.get("memory", {})
+    prefix = prompt_cache.get_chat_prefix(memory.get("character_id"), memory.get("profile"))
+    state["instruction_prompt"] = prefix.instruction
+    state["examples"] = prefix.examples
+    state["prompt_prefix"] = prefix.text
+    state["prompt_version"] = prefix.version
     return state
 
 # 3️⃣ 상황판단 엔진 node
 def situation_filter(state: GraphState) -> GraphState:
-    # TODO: 실제 chat log에서 적합 input 선택
-    # 임시: memory에 chat log가 있으면 가장 최근 content 사용
-    chat_log = state.get("memory", {}).get("chat_log", [])
+    # 라이브 room이 있으면 댓글 선별기에서 가장 답할 가치가 있는 댓글 선택
+    memory = state.get("memory", {})
+    room_id = memory.get("room_id")
+    selected = comment_triage.pick_comment(room_id) if room_id else None
+    if selected:
+        state["selected_comment"] = selected
+        state["selected_input"] = selected["text"]
+        return state
+    # 없으면 memory의 chat log 중 가장 최근 content 사용
+    chat_log = memory.get("chat_log", [])
     selected_input = chat_log[-1]["content"] if chat_log else "사주오빠? 제 운세 봐주세요!"
+    state["selected_comment"] = {}
     state["selected_input"] = selected_input
     return state
 
 # 4️⃣ LLM 응답 node
 llm = ChatOpenAI(model="gpt-4o")
 
-# 예시 Q&A를 Q/A 쌍으로 포맷하는 함수
-def format_examples(examples):
-    if not examples:
-        return "(예시 없음)"
-    # 배열/문자열 모두 허용
-    if isinstance(examples, str):
-        return examples
-    lines = []
-    for qa in examples:
-        user = qa.get('user') or qa.get('input') or ''
-        character = qa.get('character') or qa.get('output') or ''
-        if user and character:
-            lines.append(f"Q: {user}\nA: {character}")
-    return "\n".join(lines)
-
+# 캐릭터 설명/예시 문답은 prompt_cache의 prefix로 맨 앞에 두고, 매번 바뀌는 질문은 맨 뒤에 붙임
+# (앞부분이 매 호출 동일해야 provider 쪽 prompt caching이 적용됨)
 prompt_template = ChatPromptTemplate.from_template(
-    """
-    [캐릭터 설명]
-    {instruction_prompt}
-
-    [예시 문답]
-    {examples}
-
-    [실제 사용자 입력]
-    Q: {selected_input}
-    A: (캐릭터로서 자연스럽게 답변하고 마지막에 [감정: happy|sad|angry|neutral|surprise|disgust|fear] 태그를 붙이세요.)
-    """
+    """{prompt_prefix}
+{conversation}[실제 사용자 입력]
+Q: {selected_input}
+A: (캐릭터로서 자연스럽게 답변하고 마지막에 [감정: happy|sad|angry|neutral|surprise|disgust|fear] 태그를 붙이세요.)
+"""
 )
 llm_chain = prompt_template | llm | StrOutputParser()
 
-def llm_response(state: GraphState) -> GraphState:
-    response_text = llm_chain.invoke({
-        "instruction_prompt": state["instruction_prompt"],
-        "examples": format_examples(state.get("examples", [])),
+def _conversation_block(state: GraphState) -> str:
+    # conversation_memory가 만든 요약 + 최근 턴 (토큰 예산 이내), 없으면 빈 문자열
+    conversation = state.get("memory", {}).get("conversation")
+    return f"[이전 대화]\n{conversation}\n\n" if conversation else ""
+
+def _llm_inputs(state: GraphState) -> dict:
+    return {
+        "prompt_prefix": state["prompt_prefix"],
+        "conversation": _conversation_block(state),
         "selected_input": state["selected_input"]
-    })
-    state["response_text"] = response_text
+    }
+
+def _governor_args(state: GraphState, inputs: dict) -> dict:
+    # 모든 LLM 호출은 llm_governor를 거침 (rate limit, 캐릭터별 동시 호출 수, live > playground 우선순위)
+    memory = state.get("memory", {})
+    return {
+        "character_id": memory.get("character_id"),
+        "priority": memory.get("llm_priority", llm_governor.LIVE),
+        "tokens": llm_governor.estimate_tokens(*inputs.values()),
+    }
+
+def _cache_args(state: GraphState):
+    # (character_id, 프롬프트 fingerprint, 질문) - 같은 캐릭터/프롬프트의 같은 질문이면 응답 재사용
+    # 이전 대화 맥락이 있으면 같은 질문이라도 답이 달라지므로 캐시하지 않음 (character_id=None)
+    memory = state.get("memory", {})
+    character_id = None if memory.get("conversation") else memory.get("character_id")
+    return character_id, state.get("prompt_version", ""), state["selected_input"]
+
+def llm_response(state: GraphState) -> GraphState:
+    cache_args = _cache_args(state)
+    cached, vector = response_cache.match(*cache_args)
+    if cached is not None:
+        state["response_text"] = cached
+        return state
+    inputs = _llm_inputs(state)
+    state["response_text"] = llm_governor.call(llm_chain.invoke, inputs, **_governor_args(state, inputs))
+    response_cache.store(*cache_args, state["response_text"], vector=vector)
+    return state
+
+async def allm_response(state: GraphState) -> GraphState:
+    # 비동기 실행(arun_chat_graph)용: LLM 응답을 기다리는 동안 이벤트 루프를 막지 않음
+    cache_args = _cache_args(state)
+    cached, vector = await asyncio.to_thread(response_cache.match, *cache_args)
+    if cached is not None:
+        state["response_text"] = cached
+        return state
+    inputs = _llm_inputs(state)
+    state["response_text"] = await llm_governor.acall(llm_chain.ainvoke, inputs, **_governor_args(state, inputs))
+    await asyncio.to_thread(response_cache.store, *cache_args, state["response_text"], vector=vector)
     return state
 
 # 5️⃣ OutputParser node
@@ -84,17 +126,12 @@ def output_parser(state: GraphState) -> GraphState:
     return state
 
 # 5-2️⃣ Emotion 판단 node (신규)
-def emotion_node(state: GraphState) -> GraphState:
+def emotion_node(state: GraphState, classifier=None) -> GraphState:
     text = state.get("parsed_text", state.get("response_text", ""))
-    # 1. [감정: ...] 태그 우선 추출
-    match = re.search(r"\[감정: (.*?)\]", text)
-    if match:
-        emotion_tag = match.group(1)
-    else:
-        # 2. 태그 없으면 키워드 기반 분류
-        parser = EmotionOutputParser()
-        emotion_tag = parser.parse(text).emotion.value
-    state["emotion_tag"] = emotion_tag
+    # [감정: ...] 태그 우선, 없으면 키워드 가중치 점수 (태그/키워드를 한 번에 훑는 캐릭터별 분류기)
+    if classifier is None:
+        classifier = get_classifier(state.get("memory", {}).get("character_id"))
+    state["emotion_tag"] = classifier.classify(text)
     return state
 
 # 6️⃣ Memory update node
@@ -109,12 +146,14 @@ def memory_update(state: GraphState) -> GraphState:
 # 7️⃣ LangGraph 구성
 def build_chat_graph():
     builder = StateGraph(GraphState)
-    builder.add_node("load_instruction", instruction_loader)
-    builder.add_node("filter_input", situation_filter)
-    builder.add_node("llm_response", llm_response)
-    builder.add_node("parse_output", output_parser)
-    builder.add_node("emotion_node", emotion_node)
-    builder.add_node("update_memory", memory_update)
+    # 모든 노드는 traced_node로 감싸 node.<이름> 단계 지연 시간을 기록 (/chat/metrics)
+    builder.add_node("load_instruction", traced_node("load_instruction", instruction_loader))
+    builder.add_node("filter_input", traced_node("filter_input", situation_filter))
+    # invoke/stream은 llm_response, ainvoke/astream은 allm_response 사용
+    builder.add_node("llm_response", RunnableLambda(*traced_node("llm_response", llm_response, allm_response)))
+    builder.add_node("parse_output", traced_node("parse_output", output_parser))
+    builder.add_node("emotion_node", traced_node("emotion_node", emotion_node))
+    builder.add_node("update_memory", traced_node("update_memory", memory_update))
     builder.set_entry_point("load_instruction")
     builder.add_edge("load_instruction", "filter_input")
     builder.add_edge("filter_input", "llm_response")
@@ -124,14 +163,155 @@ def build_chat_graph():
     builder.add_edge("update_memory", END)
     return builder.compile()
 
-# 8️⃣ 실행 래퍼 (테스트용)
-from langchain_core.runnables import RunnableConfig
+# 8️⃣ 실행 래퍼
+# 그래프 구조는 요청마다 같으므로 한 번만 compile해서 재사용 (compile된 그래프는 동시 실행에 안전)
+_chat_graph = None
+
+def get_chat_graph():
+    global _chat_graph
+    if _chat_graph is None:
+        _chat_graph = build_chat_graph()
+    return _chat_graph
+
+def _graph_config() -> RunnableConfig:
+    return RunnableConfig(project_name="Superon", tags=["langgraph", "superon"])
 
 def run_chat_graph(memory=None):
-    graph = build_chat_graph()
     state = {"memory": memory or default_memory}
     steps = []
-    config = RunnableConfig(project_name="Superon", tags=["langgraph", "superon"])
-    for step in graph.stream(state, config=config):
+    for step in get_chat_graph().stream(state, config=_graph_config()):
+        steps.append(step)
+    return steps
+
+async def arun_chat_graph(memory=None):
+    state = {"memory": memory or default_memory}
+    steps = []
+    async for step in get_chat_graph().astream(state, config=_graph_config()):
         steps.append(step)
     return steps
+
+# 9️⃣ 스트리밍 실행 (LLM 토큰을 받는 대로 전달)
+# graph.astream은 노드 단위로만 결과를 주므로, LLM 앞/뒤 노드는 그대로 쓰고 LLM 호출만 토큰 스트리밍
+def prepare_state(memory=None) -> GraphState:
+    state = {"memory": memory or default_memory}
+    state = instruction_loader(state)
+    return situation_filter(state)
+
+async def aprepare_state(memory=None) -> GraphState:
+    # prefix 캐시 miss면 instruction_loader가 Supabase에서 profile을 조회하므로 이벤트 루프 밖에서 실행
+    return await asyncio.to_thread(prepare_state, memory)
+
+async def astream_llm_tokens(state: GraphState):
+    cache_args = _cache_args(state)
+    cached, vector = await asyncio.to_thread(response_cache.match, *cache_args)
+    if cached is not None:
+        yield cached
+        return
+    chunks = []
+    inputs = _llm_inputs(state)
+    async for chunk in llm_governor.astream(llm_chain.astream, inputs, **_governor_args(state, inputs)):
+        if chunk:
+            chunks.append(chunk)
+            yield chunk
+    await asyncio.to_thread(response_cache.store, *cache_args, "".join(chunks), vector=vector)
+
+def finalize_state(state: GraphState, response_text: str, classifier=None) -> GraphState:
+    state["response_text"] = response_text
+    state = output_parser(state)
+    state = emotion_node(state, classifier)
+    return memory_update(state)
+
+async def _aclassifier(state: GraphState):
+    # 분류기 캐시 miss면 get_classifier가 Supabase에서 profile을 조회하므로 이벤트 루프 밖에서
+    return await aget_classifier(state.get("memory", {}).get("character_id"))
+
+async def afinalize_state(state: GraphState, response_text: str) -> GraphState:
+    return finalize_state(state, response_text, await _aclassifier(state))
+
+# 🔟 배치 실행 (댓글이 몰릴 때 instruction/예시는 한 번만 보내고 K개 댓글에 한 번에 답변)
+batch_prompt_template = ChatPromptTemplate.from_template(
+    """{prompt_prefix}
+[실제 시청자 댓글]
+{numbered_comments}
+
+위 댓글 각각에 캐릭터로서 자연스럽게 답변하세요.
+반드시 댓글 번호 순서대로, 한 답변마다 아래 형식을 지키세요.
+[번호] 답변 내용 [감정: happy|sad|angry|neutral|surprise|disgust|fear]
+"""
+)
+batch_llm_chain = batch_prompt_template | llm | StrOutputParser()
+
+BATCH_ANSWER_RE = re.compile(r"^\s*\[(\d+)\]\s*(.*?)(?=^\s*\[\d+\]|\Z)", re.MULTILINE | re.DOTALL)
+
+def format_numbered_comments(comments) -> str:
+    lines = []
+    for i, comment in enumerate(comments, 1):
+        nickname = comment.get("nickname")
+        lines.append(f"[{i}] {nickname}: {comment['text']}" if nickname else f"[{i}] {comment['text']}")
+    return "\n".join(lines)
+
+def parse_batch_answers(text: str, count: int):
+    """'[번호] 답변 [감정: ...]' K개 파싱, 번호가 하나라도 빠지면 None (단건 호출로 대체)"""
+    answers = {}
+    for match in BATCH_ANSWER_RE.finditer(text or ""):
+        number = int(match.group(1))
+        answer = match.group(2).strip()
+        if 1 <= number <= count and answer and number not in answers:
+            answers[number] = answer
+    if len(answers) != count:
+        return None
+    return [answers[i] for i in range(1, count + 1)]
+
+def _answer_state(state: GraphState, comment, response_text: str, classifier=None) -> dict:
+    item = dict(state)
+    item["selected_comment"] = comment
+    item["selected_input"] = comment["text"]
+    item["response_text"] = response_text
+    item = emotion_node(output_parser(item), classifier)
+    return {"comment": comment, "response_text": response_text, "emotion_tag": item["emotion_tag"]}
+
+def _batch_inputs(state: GraphState, comments) -> dict:
+    return {
+        "prompt_prefix": state["prompt_prefix"],
+        "numbered_comments": format_numbered_comments(comments),
+    }
+
+async def arun_chat_batch(comments, memory=None):
+    """
+    comments: [{"text", "nickname", ...}] → [{"comment", "response_text", "emotion_tag"}] (입력 순서 유지)
+    캐시에 있는 댓글은 LLM 없이 답하고, 나머지는 한 번의 호출로 답변. 파싱 실패 시 댓글별 단건 호출.
+    """
+    state = await asyncio.to_thread(instruction_loader, {"memory": memory or default_memory})
+    responses = [None] * len(comments)
+    cache_args = []
+    vectors = []
+    pending = []
+    for i, comment in enumerate(comments):
+        args = _cache_args({**state, "selected_input": comment["text"]})
+        cache_args.append(args)
+        responses[i], vector = await asyncio.to_thread(response_cache.match, *args)
+        vectors.append(vector)
+        if responses[i] is None:
+            pending.append(i)
+
+    answers = None
+    if len(pending) > 1:
+        try:
+            inputs = _batch_inputs(state, [comments[i] for i in pending])
+            text = await llm_governor.acall(batch_llm_chain.ainvoke, inputs, **_governor_args(state, inputs))
+            answers = parse_batch_answers(text, len(pending))
+            if answers is None:
+                print(f"[chat_batch] 배치 응답 파싱 실패, 단건 호출로 대체: {text!r}")
+        except Exception as e:
+            print(f"[chat_batch] 배치 호출 실패, 단건 호출로 대체: {e}")
+    if answers is None:
+        single_inputs = [_llm_inputs({**state, "selected_input": comments[i]["text"]}) for i in pending]
+        answers = await asyncio.gather(*(
+            llm_governor.acall(llm_chain.ainvoke, inputs, **_governor_args(state, inputs)) for inputs in single_inputs
+        ))
+    for i, answer in zip(pending, answers):
+        responses[i] = answer
+        await asyncio.to_thread(response_cache.store, *cache_args[i], answer, vector=vectors[i])
+
+    classifier = await _aclassifier(state)
+    return [_answer_state(state, comment, response, classifier) for comment, response in zip(comments, responses)]
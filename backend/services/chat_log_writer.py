@@ -0,0 +1,173 @@
+"""
+chat_logs 백그라운드 writer (write-behind)
+
+응답 경로에서 supabase insert를 기다리지 않도록 row를 bounded queue에 넣고,
+별도 스레드가 N개 또는 T ms마다 한 번에 bulk insert 한다.
+- 실패 시 지수 backoff로 재시도, 재시도 한도를 넘으면 batch를 반씩 나눠 다시 insert
+  → 잘못된 row만 버리고 나머지는 저장 (row 하나 때문에 batch 전체를 잃지 않음)
+- queue가 가득 차면 새 row를 버리고 dropped 카운트 증가 (응답 경로는 절대 막지 않음)
+- 앱 shutdown 시 stop()으로 남은 row를 flush
+"""
+import os
+import time
+import queue
+import logging
+import threading
+from typing import Callable, List, Optional
+
+from backend.services.latency_metrics import stage
+
+BATCH_SIZE = int(os.getenv("CHAT_LOG_BATCH_SIZE", 50))
+FLUSH_INTERVAL_MS = int(os.getenv("CHAT_LOG_FLUSH_MS", 500))
+MAX_QUEUE = int(os.getenv("CHAT_LOG_QUEUE_SIZE", 5000))
+MAX_RETRIES = int(os.getenv("CHAT_LOG_MAX_RETRIES", 5))
+RETRY_BACKOFF = float(os.getenv("CHAT_LOG_RETRY_BACKOFF", 0.5))
+
+_STOP = object()
+
+
+def _supabase_insert(rows: List[dict]):
+    from backend.config.settings import supabase
+    supabase.table("chat_logs").insert(rows).execute()
+
+
+class ChatLogWriter:
+    def __init__(
+        self,
+        insert: Callable[[List[dict]], None] = _supabase_insert,
+        batch_size: int = BATCH_SIZE,
+        flush_interval_ms: int = FLUSH_INTERVAL_MS,
+        max_queue: int = MAX_QUEUE,
+        max_retries: int = MAX_RETRIES,
+        retry_backoff: float = RETRY_BACKOFF,
+    ):
+        self.insert = insert
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._stopping = False
+        self._stats_lock = threading.Lock()
+        self.stats = {"enqueued": 0, "written": 0, "batches": 0, "retries": 0, "dropped": 0, "failed": 0}
+
+    def _count(self, **deltas):
+        # enqueue(요청 thread들)와 writer thread가 같이 갱신
+        with self._stats_lock:
+            for key, value in deltas.items():
+                self.stats[key] += value
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name="chat-log-writer", daemon=True)
+            self._thread.start()
+
+    def enqueue(self, row):
+        """row 하나 또는 여러 개(list)를 넣고 바로 반환"""
+        rows = row if isinstance(row, list) else [row]
+        if self._thread is None or not self._thread.is_alive():
+            self.start()
+        for item in rows:
+            try:
+                self._queue.put_nowait(item)
+                self._count(enqueued=1)
+            except queue.Full:
+                self._count(dropped=1)
+                logging.error("[CHAT_LOG] queue가 가득 차서 chat log를 버립니다.")
+
+    def stop(self, timeout: float = 10.0):
+        """남은 row를 모두 쓰고 종료 (shutdown hook)"""
+        with self._lock:
+            thread = self._thread
+            if thread is None or not thread.is_alive():
+                return
+            self._stopping = True
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            logging.error("[CHAT_LOG] 종료 신호 전달 실패 (queue full)")
+        thread.join(timeout)
+        if thread.is_alive():
+            logging.error(f"[CHAT_LOG] {timeout}s 안에 flush하지 못했습니다. 남은 row: {self._queue.qsize()}")
+
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def _run(self):
+        while True:
+            batch, stop = self._collect()
+            if batch:
+                self._write(batch)
+            if stop:
+                return
+
+    def _collect(self):
+        """첫 row를 기다린 뒤 batch_size개가 모이거나 flush_interval이 지날 때까지 모음"""
+        item = self._queue.get()
+        if item is _STOP:
+            return [], True
+        batch = [item]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 and not self._stopping:
+                break
+            try:
+                item = self._queue.get(timeout=max(remaining, 0)) if not self._stopping else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _write(self, batch: List[dict]):
+        for attempt in range(self.max_retries + 1):
+            try:
+                with stage("chat_log.insert"):
+                    self.insert(batch)
+                self._count(written=len(batch), batches=1)
+                return
+            except Exception as e:
+                if attempt >= self.max_retries:
+                    logging.error(f"[CHAT_LOG] {len(batch)}개 chat log 저장 실패, 나눠서 다시 저장합니다: {e}")
+                    self._bisect(batch)
+                    return
+                self._count(retries=1)
+                delay = self.retry_backoff * (2 ** attempt)
+                logging.warning(f"[CHAT_LOG] chat log 저장 실패, {delay:.1f}s 후 재시도 ({attempt + 1}/{self.max_retries}): {e}")
+                time.sleep(delay)
+
+    def _bisect(self, batch: List[dict]):
+        """재시도 없이 반씩 나눠 insert, 혼자서도 실패하는 row만 버림"""
+        if len(batch) > 1:
+            middle = len(batch) // 2
+            for half in (batch[:middle], batch[middle:]):
+                try:
+                    with stage("chat_log.insert"):
+                        self.insert(half)
+                    self._count(written=len(half), batches=1)
+                except Exception:
+                    self._bisect(half)
+            return
+        self._count(failed=1)
+        logging.error(f"[CHAT_LOG] chat log 1개 저장 실패, 버립니다: {batch[0]}")
+
+chat_log_writer = ChatLogWriter()
+
+
+def enqueue(row):
+    chat_log_writer.enqueue(row)
+
+
+def start():
+    chat_log_writer.start()
+
+
+def stop(timeout: float = 10.0):
+    chat_log_writer.stop(timeout)
@@ -1,9 +1,17 @@
 import re
-from backend.models.schemas import AskPayload
+import json
+import base64
+import time
+from backend.models.schemas import AskPayload, AskBatchPayload
+from backend.services import comment_triage, conversation_memory, chat_log_writer, llm_governor
+from backend.services.latency_metrics import stage, record
 from fastapi import HTTPException
-from backend.services.chat_graph import run_chat_graph
+from backend.services.chat_graph import run_chat_graph, arun_chat_graph, arun_chat_batch, aprepare_state, astream_llm_tokens, afinalize_state
+from backend.services.sentence_stream import SentenceBuffer, find_emotion_tag
 from backend.config.settings import supabase
-from datetime import datetime
+from datetime import datetime, timedelta
+
+UUID_REGEX = re.compile(r'^[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}$')
 
 def clean_response_text(text: str) -> str:
     """
@@ -19,90 +27,273 @@ def clean_response_text(text: str) -> str:
     # Clean up any double spaces or leading/trailing spaces
     return ' '.join(text.split()).strip()
 
-def get_chat_logs(character_id: str = None, session_id: str = None, date: str = None):
-    query = supabase.table("chat_logs").select("id, character_id, session_id, viewer_id, question, response, emotion, timestamp")
+# /chat/logs에서 선택 가능한 컬럼 (그 외 컬럼명은 무시)
+CHAT_LOG_COLUMNS = ["id", "character_id", "session_id", "viewer_id", "question", "response", "clean_response", "emotion", "timestamp"]
+DEFAULT_CHAT_LOG_COLUMNS = ["id", "character_id", "session_id", "viewer_id", "question", "response", "emotion", "timestamp"]
+CHAT_LOGS_PAGE_SIZE = 200
+CHAT_LOGS_MAX_PAGE_SIZE = 1000
+EXPORT_PAGE_SIZE = 1000
+
+def encode_cursor(row: dict) -> str:
+    raw = json.dumps([row["timestamp"], row["id"]], ensure_ascii=False, default=str)
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+def decode_cursor(cursor: str):
+    try:
+        timestamp, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8"))
+        return str(timestamp), row_id
+    except Exception:
+        raise HTTPException(status_code=400, detail="잘못된 cursor 입니다.")
+
+def select_columns(fields: str = None) -> list:
+    if not fields:
+        return list(DEFAULT_CHAT_LOG_COLUMNS)
+    columns = [c for c in (f.strip() for f in fields.split(",")) if c in CHAT_LOG_COLUMNS]
+    # keyset cursor에 필요한 컬럼은 항상 포함
+    for required in ("id", "timestamp"):
+        if required not in columns:
+            columns.append(required)
+    return columns
+
+def query_chat_logs(character_id: str = None, session_id: str = None, date: str = None,
+                    limit: int = CHAT_LOGS_PAGE_SIZE, cursor: str = None, fields: str = None):
+    """
+    (timestamp desc, id desc) keyset 페이지 조회 → (rows, next_cursor)
+    next_cursor는 다음 페이지가 있을 때만 값이 있음
+    """
+    limit = max(1, min(int(limit or CHAT_LOGS_PAGE_SIZE), CHAT_LOGS_MAX_PAGE_SIZE))
+    query = supabase.table("chat_logs").select(", ".join(select_columns(fields)))
     if character_id:
         query = query.eq("character_id", character_id)
     if session_id:
         query = query.eq("session_id", session_id)
     if date:
-        query = query.gte("timestamp", f"{date}T00:00:00").lt("timestamp", f"{date}T23:59:59")
-    rows = query.order("timestamp", desc=True).execute()
-    return rows.data
-
-def build_prompt(instruction, examples, user_input):
-    prompt = instruction.strip() + "\n\n"
-    if examples:
-        prompt += "예시 문답:\n"
-        for qa in examples:
-            prompt += f"Q: {qa['user']}\nA: {qa['character']}\n"
-        prompt += "\n"
-    prompt += f"Q: {user_input}\nA:"
-    return prompt
+        # 다음 날 00:00 미만 (23:59:59.xxx 도 포함)
+        try:
+            next_day = (datetime.strptime(date, "%Y-%m-%d") + timedelta(days=1)).strftime("%Y-%m-%d")
+        except ValueError:
+            raise HTTPException(status_code=400, detail="date는 YYYY-MM-DD 형식이어야 합니다.")
+        query = query.gte("timestamp", f"{date}T00:00:00").lt("timestamp", f"{next_day}T00:00:00")
+    if cursor:
+        timestamp, row_id = decode_cursor(cursor)
+        query = query.or_(f'timestamp.lt."{timestamp}",and(timestamp.eq."{timestamp}",id.lt."{row_id}")')
+    rows = query.order("timestamp", desc=True).order("id", desc=True).limit(limit).execute().data or []
+    next_cursor = encode_cursor(rows[-1]) if len(rows) == limit else None
+    return rows, next_cursor
+
+def get_chat_logs(character_id: str = None, session_id: str = None, date: str = None,
+                  limit: int = CHAT_LOGS_PAGE_SIZE, cursor: str = None, fields: str = None):
+    rows, _ = query_chat_logs(character_id, session_id, date, limit, cursor, fields)
+    return rows
+
+def iter_chat_logs(character_id: str = None, session_id: str = None, date: str = None, fields: str = None):
+    """export용: keyset으로 페이지를 넘기며 row를 하나씩 yield (메모리에는 한 페이지만 유지)"""
+    cursor = None
+    while True:
+        rows, cursor = query_chat_logs(character_id, session_id, date, EXPORT_PAGE_SIZE, cursor, fields)
+        yield from rows
+        if not cursor:
+            return
+
+def _build_memory(payload: AskPayload, budget: int = None) -> dict:
+    # 실제 대화 이력이 있을 때만 memory에 포함
+    chat_log = [turn.dict() for turn in payload.history] if payload.history else []
+    # 이전 턴 전체 대신 요약 + 최근 턴만 (캐릭터별 토큰 예산 이내)
+    conversation = conversation_memory.build_context(payload.id, payload.session_id, chat_log, budget)
+    memory = {"chat_log": chat_log[-1:]} if chat_log else {}
+    if conversation:
+        memory["conversation"] = conversation
+    memory["character_id"] = payload.id  # 프롬프트 prefix/응답 캐시 키
+    # 실제 방송 세션(UUID)이면 live, PlaygroundTab 테스트는 playground 우선순위로 LLM 대기열 사용
+    memory["llm_priority"] = llm_governor.priority_for(payload.session_id)
+    if payload.room_id:
+        memory["room_id"] = payload.room_id
+    # playground처럼 profile(instruction, examples)을 직접 보내면 저장된 profile 대신 사용
+    # 프롬프트 조합은 chat_graph.instruction_loader에서 prompt_cache의 prefix로 처리
+    if payload.profile:
+        memory["profile"] = payload.profile
+    return memory
+
+async def _abuild_memory(payload: AskPayload) -> dict:
+    # 캐릭터별 토큰 예산 조회(Supabase)는 이벤트 루프 밖에서
+    return _build_memory(payload, await conversation_memory.aget_budget(payload.id))
+
+def _last_state(steps) -> dict:
+    # steps의 반환 구조를 디버깅용으로 출력
+    print('[ask] run_chat_graph steps:', steps)
+    if not steps or not isinstance(steps[-1], dict):
+        raise HTTPException(status_code=400, detail=f"LangGraph 실행 결과가 올바르지 않습니다: {steps}")
+    # LangGraph 반환이 {'update_memory': {...}} 형태일 때 마지막 노드의 value를 state로 사용
+    last_step = steps[-1]
+    if "state" in last_step:
+        last_state = last_step["state"]
+    else:
+        # 마지막 key의 value를 state로 간주
+        last_state = list(last_step.values())[-1] if last_step else {}
+    if not last_state:
+        raise HTTPException(status_code=400, detail=f"LangGraph state 없음: {steps[-1]}")
+    return last_state
+
+def _build_result(payload: AskPayload, last_state: dict):
+    """graph 결과 → (chat_logs에 저장할 row 또는 None, 응답 dict)"""
+    raw_response = last_state.get("response_text", "응답 생성 실패")
+    emotion = last_state.get("emotion_tag", "neutral")
+    # 댓글 선별기에서 고른 댓글이면 그 댓글을 질문으로 기록
+    selected = last_state.get("selected_comment") or {}
+    question = selected.get("text") or (payload.history[-1].content if payload.history else "")
+    viewer_id = selected.get("nickname") or payload.viewer_id
+    now = datetime.now().isoformat()
+
+    # Clean the response text for TTS
+    clean_text = clean_response_text(raw_response)
+
+    # supabase 저장 (실제 대화만)
+    row = None
+    if question and UUID_REGEX.match(payload.session_id):
+        row = {
+            "character_id": payload.id,
+            "session_id": payload.session_id,
+            "viewer_id": viewer_id,
+            "question": question,
+            "response": raw_response,  # Store raw response with formatting
+            "clean_response": clean_text,  # Store cleaned version for TTS
+            "emotion": emotion,
+            "timestamp": now,
+        }
+
+    # Prefix user question with 'Q:' for frontend display
+    user_question = question
+    user_question_prefixed = f"Q: {user_question}" if user_question and not user_question.strip().lower().startswith('q:') else user_question
+
+    # Return both raw and cleaned response, and prefixed question
+    return row, {
+        "response": raw_response,  # For display in UI
+        "clean_response": clean_text,  # For TTS
+        "emotion": emotion,
+        "user_question": user_question_prefixed,
+        "viewer": viewer_id,
+    }
+
+def _save_chat_log(row):
+    # row 하나 또는 여러 개(list), 백그라운드 writer가 모아서 bulk insert (응답은 기다리지 않음)
+    chat_log_writer.enqueue(row)
 
 def ask(payload: AskPayload):
+    # 단계별 지연 시간은 latency_metrics에 기록 (graph 안의 노드는 node.<이름>으로 따로 기록됨)
+    try:
+        with stage("ask.total"):
+            with stage("ask.build_memory"):
+                memory = _build_memory(payload)
+            with stage("ask.graph"):
+                steps = run_chat_graph(memory=memory)
+            with stage("ask.build_result"):
+                row, result = _build_result(payload, _last_state(steps))
+            if row:
+                with stage("ask.save_log"):
+                    _save_chat_log(row)
+        return result
+    except llm_governor.LLMDeadlineExceeded as e:
+        raise HTTPException(status_code=504, detail=f"질문 처리 시간 초과: {str(e)}")
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"질문 처리 실패: {str(e)}")
+
+async def aask(payload: AskPayload):
+    """ask의 비동기 버전: LLM 호출은 ainvoke"""
     try:
-        # 실제 대화 이력이 있을 때만 memory에 포함
-        chat_log = [turn.dict() for turn in payload.history] if payload.history else []
-        memory = {"chat_log": chat_log} if chat_log else {}
-
-        # profile에서 instruction/examples 추출
-        instruction = payload.profile.get("instruction", "") if payload.profile else ""
-        examples = payload.profile.get("examples", [])[:3] if payload.profile else []
-        user_input = payload.history[-1].content if payload.history else ""
-
-        # 프롬프트 조합 (instruction + 예시 + user_input)
-        prompt = build_prompt(instruction, examples, user_input)
-
-        # LangGraph 실행 (prompt를 memory에 포함)
-        memory["prompt"] = prompt
-        steps = run_chat_graph(memory=memory)
-        # steps의 반환 구조를 디버깅용으로 출력
-        print('[ask] run_chat_graph steps:', steps)
-        if not steps or not isinstance(steps[-1], dict):
-            raise HTTPException(status_code=400, detail=f"LangGraph 실행 결과가 올바르지 않습니다: {steps}")
-        # LangGraph 반환이 {'update_memory': {...}} 형태일 때 마지막 노드의 value를 state로 사용
-        last_step = steps[-1]
-        if "state" in last_step:
-            last_state = last_step["state"]
+        with stage("ask.total"):
+            with stage("ask.build_memory"):
+                memory = await _abuild_memory(payload)
+            with stage("ask.graph"):
+                steps = await arun_chat_graph(memory=memory)
+            with stage("ask.build_result"):
+                row, result = _build_result(payload, _last_state(steps))
+            if row:
+                with stage("ask.save_log"):
+                    _save_chat_log(row)
+        return result
+    except llm_governor.LLMDeadlineExceeded as e:
+        raise HTTPException(status_code=504, detail=f"질문 처리 시간 초과: {str(e)}")
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"질문 처리 실패: {str(e)}")
+
+async def astream_ask(payload: AskPayload):
+    """
+    스트리밍 버전 ask: (event, data) 를 순서대로 yield
+    - token: LLM 토큰
+    - sentence: 끝난 문장 (태그 제거, /tts/stream에 바로 전달 가능)
+    - emotion: [감정: ...] 태그가 파싱되는 즉시 한 번 (태그가 없으면 마지막에 키워드 분류 결과)
+    - done: ask()와 같은 응답 dict
+    """
+    started = time.perf_counter()
+    with stage("stream.prepare"):
+        state = await aprepare_state(await _abuild_memory(payload))
+    sentences = SentenceBuffer()
+    response_text = ""
+    emotion_sent = False
+    index = 0
+    async for token in astream_llm_tokens(state):
+        if not response_text:
+            record("stream.first_token", (time.perf_counter() - started) * 1000)
+        response_text += token
+        yield "token", {"text": token}
+        for sentence in sentences.feed(token):
+            yield "sentence", {"index": index, "text": sentence}
+            index += 1
+        if not emotion_sent:
+            emotion = find_emotion_tag(response_text)
+            if emotion:
+                emotion_sent = True
+                yield "emotion", {"emotion": emotion}
+    for sentence in sentences.flush():
+        yield "sentence", {"index": index, "text": sentence}
+        index += 1
+
+    with stage("stream.finalize"):
+        last_state = await afinalize_state(state, response_text)
+    if not emotion_sent:
+        yield "emotion", {"emotion": last_state.get("emotion_tag", "neutral")}
+    row, result = _build_result(payload, last_state)
+    if row:
+        _save_chat_log(row)
+    record("stream.total", (time.perf_counter() - started) * 1000)
+    yield "done", result
+
+async def aask_batch(payload: AskBatchPayload):
+    """
+    댓글 K개를 LLM 한 번으로 답변 (댓글이 답변 속도보다 빨리 쌓일 때)
+    room_id가 있으면 댓글 선별기에서 k개를 꺼내고, 없으면 payload.comments 사용
+    """
+    try:
+        k = max(1, min(payload.k, 20))
+        if payload.room_id:
+            comments = comment_triage.pick_comments(payload.room_id, k)
         else:
-            # 마지막 key의 value를 state로 간주
-            last_state = list(last_step.values())[-1] if last_step else {}
-        if not last_state:
-            raise HTTPException(status_code=400, detail=f"LangGraph state 없음: {steps[-1]}")
-            
-        raw_response = last_state.get("response_text", "응답 생성 실패")
-        emotion = last_state.get("emotion_tag", "neutral")
-        now = datetime.now().isoformat()
-        
-        # Clean the response text for TTS
-        clean_text = clean_response_text(raw_response)
-        
-        # supabase 저장 (실제 대화만)
-        UUID_REGEX = re.compile(r'^[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}$')
-        if payload.history and UUID_REGEX.match(payload.session_id):
-            supabase.table("chat_logs").insert({
-                "character_id": payload.id,
-                "session_id": payload.session_id,
-                "viewer_id": payload.viewer_id,
-                "question": payload.history[-1].content,
-                "response": raw_response,  # Store raw response with formatting
-                "clean_response": clean_text,  # Store cleaned version for TTS
-                "emotion": emotion,
-                "timestamp": now,
-            }).execute()
-            
-        # Prefix user question with 'Q:' for frontend display
-        user_question = payload.history[-1].content if payload.history else ''
-        user_question_prefixed = f"Q: {user_question}" if user_question and not user_question.strip().lower().startswith('q:') else user_question
-
-        # Return both raw and cleaned response, and prefixed question
-        return {
-            "response": raw_response,  # For display in UI
-            "clean_response": clean_text,  # For TTS
-            "emotion": emotion,
-            "user_question": user_question_prefixed
-        }
+            comments = [{"text": text, "nickname": payload.viewer_id} for text in payload.comments[:k]]
+        comments = [c for c in comments if c.get("text", "").strip()]
+        if not comments:
+            return {"answers": []}
+
+        memory = {"character_id": payload.id, "llm_priority": llm_governor.priority_for(payload.session_id)}
+        if payload.profile:
+            memory["profile"] = payload.profile
+        with stage("batch.graph"):
+            answers = await arun_chat_batch(comments, memory=memory)
 
+        rows, results = [], []
+        for answer in answers:
+            last_state = {
+                "response_text": answer["response_text"],
+                "emotion_tag": answer["emotion_tag"],
+                "selected_comment": answer["comment"],
+            }
+            row, result = _build_result(payload, last_state)
+            if row:
+                rows.append(row)
+            results.append(result)
+        if rows:
+            _save_chat_log(rows)
+        return {"answers": results}
+    except llm_governor.LLMDeadlineExceeded as e:
+        raise HTTPException(status_code=504, detail=f"질문 처리 시간 초과: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"질문 처리 실패: {str(e)}")
@@ -0,0 +1,317 @@
+"""
+라이브 댓글 선별 엔진 (상황판단 엔진)
+
+room별로 최근 댓글을 모아 점수를 매기고, LLM 한 번 호출할 때마다
+가장 답할 가치가 있는 댓글을 꺼내 준다.
+- 스팸/이모지만 있는 댓글/ㅋㅋㅋ류는 버림
+- 최근 window 안의 거의 같은 댓글은 중복으로 보고 기존 댓글 점수만 올림 (같은 질문이 많을수록 우선)
+- 질문, 선물한 시청자, 처음 채팅한 시청자는 가산점
+- 오래된 댓글은 시간에 비례해 감점, room별 큐 크기는 제한
+"""
+import os
+import re
+import math
+import time
+import heapq
+import itertools
+import threading
+import unicodedata
+from collections import deque
+from typing import Callable, Dict, List, Optional
+
+WINDOW_SEC = float(os.getenv("COMMENT_TRIAGE_WINDOW", 60))
+MAX_QUEUE = int(os.getenv("COMMENT_TRIAGE_QUEUE_SIZE", 50))
+DEDUP_THRESHOLD = float(os.getenv("COMMENT_TRIAGE_DEDUP_THRESHOLD", 0.8))
+# 한 시청자가 window 안에 이 개수보다 많이 쓰면 도배로 보고 버림
+FLOOD_LIMIT = int(os.getenv("COMMENT_TRIAGE_FLOOD_LIMIT", 5))
+# window 동안 떨어지는 점수 (오래된 댓글 감점)
+AGE_PENALTY = 2.0
+
+QUESTION_WORDS = [
+    "뭐", "뭔", "무슨", "어때", "어떻", "어떡", "알려", "몇", "왜", "어디", "누구", "언제", "얼마", "봐줘", "봐주세요",
+    "할까", "인가", "나요", "까요", "니?", "what", "how", "why", "where", "who", "when", "can you", "could you",
+]
+URL_RE = re.compile(r"(https?://|www\.|\.com\b|\.kr\b|\.net\b)", re.IGNORECASE)
+REPEAT_RE = re.compile(r"(.)\1{2,}")
+# ㅋㅋㅋ, ㅎㅎ, ㅠㅠ 등 (NFKC 정규화 후에는 조합형 자모 U+1100~U+11FF로 바뀜)
+JAMO_ONLY_RE = re.compile(r"^[\u1100-\u11ffㄱ-ㆎ\s]+$")
+
+
+def normalize(text: str) -> str:
+    text = unicodedata.normalize("NFKC", text or "").lower()
+    text = REPEAT_RE.sub(r"\1\1", text)
+    text = "".join(ch for ch in text if ch.isalnum() or ch.isspace() or ch == "?")
+    return " ".join(text.split())
+
+
+def _has_letters(text: str) -> bool:
+    return any(ch.isalnum() for ch in text)
+
+
+def _bigrams(text: str) -> frozenset:
+    compact = text.replace(" ", "")
+    if len(compact) < 2:
+        return frozenset([compact])
+    return frozenset(compact[i:i + 2] for i in range(len(compact) - 1))
+
+
+def _similarity(a: frozenset, b: frozenset) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def is_question(text: str) -> bool:
+    lower = text.lower()
+    return "?" in lower or any(word in lower for word in QUESTION_WORDS)
+
+
+class _Entry:
+    __slots__ = ("user_id", "nickname", "text", "normalized", "bigrams", "created_at", "intrinsic", "bonus", "duplicates", "version", "removed", "first_time")
+
+    def __init__(self, user_id, nickname, text, normalized, bigrams, created_at, base_score, first_time=False):
+        self.user_id = user_id
+        self.nickname = nickname
+        self.text = text
+        self.normalized = normalized
+        self.bigrams = bigrams
+        self.created_at = created_at
+        self.intrinsic = base_score
+        self.bonus = 0.0  # 중복 댓글로 받은 가산점
+        self.duplicates = 0
+        self.version = 0
+        self.removed = False
+        self.first_time = first_time  # 시청자의 첫 댓글이었는지 (선물로 다시 점수를 매겨도 유지)
+
+    @property
+    def base_score(self) -> float:
+        return self.intrinsic + self.bonus
+
+    def as_dict(self, now: float, rate: float) -> dict:
+        return {
+            "user_id": self.user_id,
+            "nickname": self.nickname,
+            "text": self.text,
+            "score": round(self.base_score - rate * (now - self.created_at), 3),
+            "duplicates": self.duplicates,
+            "created_at": self.created_at,
+        }
+
+
+class CommentTriage:
+    """한 room의 댓글 선별기 (리스너 스레드와 요청 처리 스레드에서 함께 쓰므로 lock으로 보호)"""
+
+    def __init__(
+        self,
+        window_sec: float = WINDOW_SEC,
+        max_queue: int = MAX_QUEUE,
+        dedup_threshold: float = DEDUP_THRESHOLD,
+        flood_limit: int = FLOOD_LIMIT,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.window_sec = window_sec
+        self.max_queue = max_queue
+        self.dedup_threshold = dedup_threshold
+        self.flood_limit = flood_limit
+        self.clock = clock
+        # 초당 감점; 모든 댓글이 같은 속도로 감점되므로 heap 키(base + rate*created_at)는 시간이 지나도 불변
+        self.rate = AGE_PENALTY / window_sec
+        self._heap = []
+        self._counter = itertools.count()
+        self._live: List[_Entry] = []
+        self._recent = deque()  # (ts, entry) - 중복 판정용 rolling window
+        self._user_recent: Dict[str, deque] = {}
+        self._seen_users = set()
+        self._gifters: Dict[str, int] = {}
+        self._lock = threading.RLock()
+        self.stats = {"submitted": 0, "queued": 0, "duplicates": 0, "dropped_spam": 0, "dropped_overflow": 0, "picked": 0}
+
+    # --- 입력 ---
+
+    def submit(self, user_id: str, nickname: str, text: str, ts: Optional[float] = None) -> Optional[float]:
+        """댓글 추가. 큐에 들어가면 점수, 버려지거나 중복이면 None"""
+        with self._lock:
+            return self._submit(user_id, nickname, text, ts)
+
+    def _submit(self, user_id: str, nickname: str, text: str, ts: Optional[float]) -> Optional[float]:
+        now = ts if ts is not None else self.clock()
+        self.stats["submitted"] += 1
+        self._prune(now)
+        user_id = str(user_id or nickname or "")
+        normalized = normalize(text)
+
+        if self._is_spam(user_id, text, normalized, now):
+            self.stats["dropped_spam"] += 1
+            return None
+
+        bigrams = _bigrams(normalized)
+        duplicate = self._find_duplicate(normalized, bigrams)
+        if duplicate is not None:
+            self.stats["duplicates"] += 1
+            if not duplicate.removed:
+                # 같은 말을 여러 명이 하면 그 댓글의 우선순위를 올림
+                duplicate.duplicates += 1
+                duplicate.bonus += 1.0 / duplicate.duplicates
+                self._rescore(duplicate)
+            return None
+
+        first_time = user_id not in self._seen_users
+        score = self._score(user_id, text, normalized, first_time=first_time)
+        self._seen_users.add(user_id)
+        entry = _Entry(user_id, nickname, text, normalized, bigrams, now, score, first_time)
+        self._recent.append((now, entry))
+        self._push(entry)
+        self._live.append(entry)
+        self.stats["queued"] += 1
+        self._enforce_bound()
+        return score
+
+    def record_gift(self, user_id: str, coin: int):
+        """선물한 시청자의 대기 중인 댓글과 이후 댓글에 가산점"""
+        user_id = str(user_id)
+        with self._lock:
+            self._gifters[user_id] = self._gifters.get(user_id, 0) + max(int(coin), 0)
+            for entry in self._live:
+                if entry.user_id == user_id and not entry.removed:
+                    entry.intrinsic = self._score(user_id, entry.text, entry.normalized, first_time=entry.first_time)
+                    self._rescore(entry)
+
+    # --- 출력 ---
+
+    def pop_best(self) -> Optional[dict]:
+        with self._lock:
+            now = self.clock()
+            while self._heap:
+                _, _, version, entry = heapq.heappop(self._heap)
+                if entry.removed or version != entry.version:
+                    continue
+                entry.removed = True
+                self._live.remove(entry)
+                if now - entry.created_at > self.window_sec:
+                    continue
+                self.stats["picked"] += 1
+                return entry.as_dict(now, self.rate)
+            return None
+
+    def pop_batch(self, k: int) -> List[dict]:
+        batch = []
+        with self._lock:
+            for _ in range(k):
+                item = self.pop_best()
+                if item is None:
+                    break
+                batch.append(item)
+        return batch
+
+    def peek(self, k: int = 10) -> List[dict]:
+        with self._lock:
+            now = self.clock()
+            live = [e for e in self._live if not e.removed and now - e.created_at <= self.window_sec]
+            live.sort(key=lambda e: e.base_score + self.rate * e.created_at, reverse=True)
+            return [e.as_dict(now, self.rate) for e in live[:k]]
+
+    def __len__(self):
+        with self._lock:
+            return sum(1 for e in self._live if not e.removed)
+
+    # --- 내부 ---
+
+    def _score(self, user_id: str, text: str, normalized: str, first_time: Optional[bool] = None) -> float:
+        score = 1.0
+        if is_question(text):
+            score += 2.0
+        coins = self._gifters.get(user_id, 0)
+        if coins:
+            score += 1.5 + math.log10(1 + coins)
+        if first_time is None:
+            first_time = user_id not in self._seen_users
+        if first_time:
+            score += 1.0
+        length = len(normalized)
+        if length < 4:
+            score -= 0.5
+        elif length > 150:
+            score -= 1.0
+        return score
+
+    def _is_spam(self, user_id: str, text: str, normalized: str, now: float) -> bool:
+        if not normalized or not _has_letters(normalized):
+            return True  # 빈 댓글, 이모지/기호만 있는 댓글
+        if JAMO_ONLY_RE.match(normalized):
+            return True  # ㅋㅋ, ㅎㅎ, ㅠㅠ
+        if URL_RE.search(text):
+            return True
+        recent = self._user_recent.setdefault(user_id, deque())
+        recent.append(now)
+        while recent and now - recent[0] > self.window_sec:
+            recent.popleft()
+        return len(recent) > self.flood_limit
+
+    def _find_duplicate(self, normalized: str, bigrams: frozenset) -> Optional[_Entry]:
+        for _, entry in reversed(self._recent):
+            if entry.normalized == normalized or _similarity(entry.bigrams, bigrams) >= self.dedup_threshold:
+                return entry
+        return None
+
+    def _push(self, entry: _Entry):
+        key = -(entry.base_score + self.rate * entry.created_at)
+        heapq.heappush(self._heap, (key, next(self._counter), entry.version, entry))
+
+    def _rescore(self, entry: _Entry):
+        entry.version += 1
+        self._push(entry)
+
+    def _enforce_bound(self):
+        live = [e for e in self._live if not e.removed]
+        while len(live) > self.max_queue:
+            worst = min(live, key=lambda e: e.base_score + self.rate * e.created_at)
+            worst.removed = True
+            live.remove(worst)
+            self.stats["dropped_overflow"] += 1
+        self._live = live
+        # 무효 항목이 쌓이지 않도록 heap 재구성
+        if len(self._heap) > 4 * max(self.max_queue, 1):
+            self._heap = [item for item in self._heap if not item[3].removed and item[2] == item[3].version]
+            heapq.heapify(self._heap)
+
+    def _prune(self, now: float):
+        while self._recent and now - self._recent[0][0] > self.window_sec:
+            self._recent.popleft()
+        for user_id in [u for u, q in self._user_recent.items() if not q or now - q[-1] > self.window_sec]:
+            del self._user_recent[user_id]
+
+
+# room별 선별기
+_rooms: Dict[str, CommentTriage] = {}
+_rooms_lock = threading.Lock()
+
+
+def get_triage(room_id: str) -> CommentTriage:
+    with _rooms_lock:
+        if room_id not in _rooms:
+            _rooms[room_id] = CommentTriage()
+        return _rooms[room_id]
+
+
+def submit_comment(room_id: str, user_id: str, nickname: str, text: str) -> Optional[float]:
+    return get_triage(room_id).submit(user_id, nickname, text)
+
+
+def record_gift(room_id: str, user_id: str, coin: int):
+    get_triage(room_id).record_gift(user_id, coin)
+
+
+def pick_comment(room_id: str) -> Optional[dict]:
+    triage = _rooms.get(room_id)
+    return triage.pop_best() if triage else None
+
+
+def pick_comments(room_id: str, k: int) -> List[dict]:
+    triage = _rooms.get(room_id)
+    return triage.pop_batch(k) if triage else []
+
+
+def reset_room(room_id: str):
+    """방송 종료 시 room의 선별기(대기 댓글, 본 시청자, 선물 기록)를 버림"""
+    with _rooms_lock:
+        _rooms.pop(room_id, None)
@@ -0,0 +1,240 @@
+"""
+대화 메모리 관리 (토큰 예산 기반)
+
+긴 방송에서 history 전체를 프롬프트에 넣으면 호출마다 프롬프트와 지연이 계속 늘어나므로
+- 최근 N턴은 그대로 유지
+- 그보다 오래된 턴은 요약(summary)으로 접고, 요약은 백그라운드에서 증분 갱신
+- 캐릭터별 토큰 예산(profile.memory_token_budget, 기본 MEMORY_TOKEN_BUDGET)을 넘지 않도록 자름
+  (요약도 예산에 포함, 요약만으로 예산을 넘으면 요약을 잘라냄)
+토큰 수는 tiktoken으로 세고, tiktoken을 쓸 수 없으면 UTF-8 byte 기반 근사치를 사용한다.
+"""
+import os
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+MEMORY_TOKEN_BUDGET = int(os.getenv("MEMORY_TOKEN_BUDGET", 1500))
+RECENT_TURNS = int(os.getenv("MEMORY_RECENT_TURNS", 6))
+SUMMARY_MODEL = os.getenv("MEMORY_SUMMARY_MODEL", "gpt-4o-mini")
+# 요약 자체의 최대 토큰 (예산의 일부)
+SUMMARY_MAX_TOKENS = int(os.getenv("MEMORY_SUMMARY_MAX_TOKENS", 300))
+MAX_SESSIONS = 500
+SUMMARY_HEADER = "Summary of earlier conversation:\n"
+
+_encoding = None
+_encoding_failed = False
+
+
+def count_tokens(text: str) -> int:
+    global _encoding, _encoding_failed
+    if not text:
+        return 0
+    if _encoding is None and not _encoding_failed:
+        try:
+            import tiktoken
+            _encoding = tiktoken.encoding_for_model("gpt-4o")
+        except Exception as e:
+            # tiktoken 미설치/인코딩 파일 다운로드 실패 시 근사치 사용
+            logging.warning(f"[MEMORY] tiktoken 사용 불가, 근사치로 계산: {e}")
+            _encoding_failed = True
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+    # 한글(3 byte)은 글자당 약 1토큰, 영문은 약 3글자당 1토큰으로 넉넉하게 계산
+    return max(1, len(text.encode("utf-8")) // 3)
+
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+    """앞에서부터 max_tokens 토큰까지만 남김"""
+    if max_tokens <= 0:
+        return ""
+    if count_tokens(text) <= max_tokens:
+        return text
+    if _encoding is not None:
+        return _encoding.decode(_encoding.encode(text)[:max_tokens])
+    # 근사치(byte // 3)와 같은 기준으로 자르고, 잘린 멀티바이트 글자는 버림
+    return text.encode("utf-8")[:max_tokens * 3].decode("utf-8", errors="ignore")
+
+
+def format_turn(turn: dict) -> str:
+    role = "User" if turn.get("role") == "user" else "AI"
+    return f"{role}: {turn.get('content', '')}"
+
+
+def _default_summarize(previous_summary: str, turns: List[dict]) -> str:
+    from langchain_openai import ChatOpenAI
+    llm = ChatOpenAI(model=SUMMARY_MODEL, temperature=0, max_tokens=SUMMARY_MAX_TOKENS)
+    conversation = "\n".join(format_turn(t) for t in turns)
+    prompt = (
+        "다음은 라이브 방송 캐릭터와 시청자의 대화 요약과 그 이후 대화입니다.\n"
+        "기존 요약에 새 대화 내용을 합쳐, 이후 대화에 필요한 사실(이름, 약속, 질문 주제, 감정)만 "
+        f"{SUMMARY_MAX_TOKENS}토큰 이내의 한국어로 다시 요약하세요.\n\n"
+        f"[기존 요약]\n{previous_summary or '(없음)'}\n\n[새 대화]\n{conversation}"
+    )
+    # 요약은 응답 경로가 아니므로 가장 낮은 우선순위로 LLM 대기열 사용
+    from backend.services import llm_governor
+    result = llm_governor.call(
+        llm.invoke, prompt, priority=llm_governor.BACKGROUND, tokens=llm_governor.estimate_tokens(prompt)
+    )
+    return result.content.strip()
+
+
+class _SessionMemory:
+    __slots__ = ("summary", "folded", "pending")
+
+    def __init__(self):
+        self.summary = ""
+        self.folded = 0  # 요약에 반영된 앞쪽 턴 수
+        self.pending = False  # 요약 작업 진행 중
+
+
+class ConversationMemory:
+    def __init__(
+        self,
+        recent_turns: int = RECENT_TURNS,
+        default_budget: int = MEMORY_TOKEN_BUDGET,
+        summarize: Optional[Callable[[str, List[dict]], str]] = None,
+        executor: Optional[ThreadPoolExecutor] = None,
+    ):
+        self.recent_turns = recent_turns
+        self.default_budget = default_budget
+        self.summarize = summarize or _default_summarize
+        self.executor = executor or ThreadPoolExecutor(max_workers=2, thread_name_prefix="memory-summary")
+        self._sessions: "OrderedDict[Tuple[str, str], _SessionMemory]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def build_context(
+        self,
+        character_id: str,
+        session_id: str,
+        history: List[dict],
+        budget: Optional[int] = None,
+    ) -> Tuple[str, List[dict]]:
+        """
+        history(마지막 턴은 현재 질문)의 이전 턴들 → (요약, 그대로 넣을 최근 턴 목록)
+        결과의 토큰 합은 budget 이하. 요약이 필요하면 백그라운드로 갱신하고 기다리지 않는다.
+        """
+        budget = budget or self.default_budget
+        previous = history[:-1] if history else []
+        key = (str(character_id), str(session_id))
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is None:
+                session = self._sessions[key] = _SessionMemory()
+            self._sessions.move_to_end(key)
+            while len(self._sessions) > MAX_SESSIONS:
+                self._sessions.popitem(last=False)
+            if session.folded > len(previous):
+                # 클라이언트가 history를 새로 시작함
+                session.summary, session.folded = "", 0
+            summary, folded = session.summary, session.folded
+
+        split = max(len(previous) - self.recent_turns, 0)
+        if split > folded:
+            self._schedule_summary(key, session, previous[folded:split], split)
+
+        # 요약(머리말 포함)이 예산을 넘으면 잘라서 예산 안에 맞춤
+        used = 0
+        if summary:
+            header = count_tokens(SUMMARY_HEADER)
+            summary = truncate_tokens(summary, budget - header)
+            used = header + count_tokens(summary) if summary else 0
+        # 요약에 아직 반영되지 않은 오래된 턴 + 최근 턴을 뒤에서부터 예산 안에서 채움
+        candidates = previous[folded:]
+        kept = []
+        for turn in reversed(candidates):
+            cost = count_tokens(format_turn(turn)) + 1
+            if used + cost > budget:
+                break
+            kept.append(turn)
+            used += cost
+        kept.reverse()
+        return summary, kept
+
+    def _schedule_summary(self, key, session: _SessionMemory, turns: List[dict], upto: int):
+        with self._lock:
+            if session.pending:
+                return
+            session.pending = True
+            previous_summary = session.summary
+
+        def _run():
+            try:
+                summary = self.summarize(previous_summary, turns)
+                with self._lock:
+                    # 요약 중에 history가 초기화됐으면 버림
+                    if session.summary == previous_summary and session.folded <= upto:
+                        session.summary = summary
+                        session.folded = upto
+            except Exception as e:
+                logging.error(f"[MEMORY] 대화 요약 실패 {key}: {e}")
+            finally:
+                with self._lock:
+                    session.pending = False
+
+        self.executor.submit(_run)
+
+    def reset(self, character_id: Optional[str] = None, session_id: Optional[str] = None):
+        with self._lock:
+            if character_id is None:
+                self._sessions.clear()
+                return
+            for key in [k for k in self._sessions if k[0] == str(character_id) and (session_id is None or k[1] == str(session_id))]:
+                del self._sessions[key]
+
+
+def format_context(summary: str, turns: List[dict]) -> str:
+    parts = []
+    if summary:
+        parts.append(f"{SUMMARY_HEADER}{summary}")
+    if turns:
+        parts.append("\n".join(format_turn(t) for t in turns))
+    return "\n\n".join(parts)
+
+
+def budget_for(profile: Optional[dict]) -> int:
+    try:
+        return int((profile or {}).get("memory_token_budget") or MEMORY_TOKEN_BUDGET)
+    except (TypeError, ValueError):
+        return MEMORY_TOKEN_BUDGET
+
+
+conversation_memory = ConversationMemory()
+_budgets: Dict[str, int] = {}
+
+
+def get_budget(character_id: Optional[str]) -> int:
+    """캐릭터별 토큰 예산 (profile.memory_token_budget, 한 번 조회 후 캐시)"""
+    if not character_id:
+        return MEMORY_TOKEN_BUDGET
+    if character_id not in _budgets:
+        try:
+            from backend.services.character_service import get_character_profile
+            _budgets[character_id] = budget_for(get_character_profile(character_id))
+        except Exception as e:
+            logging.error(f"[MEMORY] 캐릭터 profile 조회 실패, 기본 예산 사용: {e}")
+            return MEMORY_TOKEN_BUDGET
+    return _budgets[character_id]
+
+
+async def aget_budget(character_id: Optional[str]) -> int:
+    """get_budget의 async 버전: 캐시에 없으면 Supabase 조회를 이벤트 루프 밖에서"""
+    if not character_id or character_id in _budgets:
+        return get_budget(character_id)
+    return await asyncio.to_thread(get_budget, character_id)
+
+
+def invalidate_budget(character_id: str):
+    _budgets.pop(character_id, None)
+
+
+def build_context(character_id: Optional[str], session_id: Optional[str], history: List[dict], budget: Optional[int] = None) -> str:
+    """history → 프롬프트에 넣을 대화 맥락 문자열 (요약 + 최근 턴, 토큰 예산 이내)"""
+    if not history or len(history) < 2:
+        return ""
+    summary, turns = conversation_memory.build_context(
+        character_id or "", session_id or "", history, budget or get_budget(character_id)
+    )
+    return format_context(summary, turns)
@@ -0,0 +1,308 @@
+"""
+TikTok 라이브 이벤트 소스
+
+collector, run_tiktok_listener, /broadcast/status는 create_live_client()로 클라이언트를 만든다.
+- TIKTOK_EVENT_SOURCE=tiktok (기본): 실제 TikTokLiveClient
+- TIKTOK_EVENT_SOURCE=synthetic: 오프라인 부하 테스트용 SyntheticLiveClient
+  (댓글/선물/좋아요/입장 이벤트를 설정한 속도와 비율로 생성)
+
+SyntheticLiveClient는 우리 코드가 쓰는 TikTokLiveClient API(on, start, connect, run,
+disconnect, close, is_live)만 흉내 낸다. 핸들러는 이벤트 클래스 이름으로 매칭하므로
+TikTokLive.events.CommentEvent 등으로 등록한 핸들러가 그대로 호출된다.
+"""
+import os
+import time
+import random
+import asyncio
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+EVENT_SOURCE = os.getenv("TIKTOK_EVENT_SOURCE", "tiktok")
+# unique_text 지연 측정용 댓글 → 생성 시각 기록은 최근 N개만 유지 (장시간 부하 테스트에서도 메모리 일정)
+SENT_AT_MAX = int(os.getenv("SYNTHETIC_SENT_AT_MAX", 10000))
+
+
+def create_live_client(unique_id: Optional[str] = None, room_id: Optional[str] = None, source: Optional[str] = None):
+    source = source or EVENT_SOURCE
+    if source == "synthetic":
+        return SyntheticLiveClient(unique_id=unique_id, room_id=room_id, **synthetic_config_from_env())
+    if source != "tiktok":
+        raise ValueError(f"지원하지 않는 이벤트 소스: {source}")
+    from TikTokLive import TikTokLiveClient
+    if room_id is not None:
+        return TikTokLiveClient(room_id=int(room_id))
+    return TikTokLiveClient(unique_id=unique_id)
+
+
+# --- synthetic 이벤트 (TikTokLive 이벤트와 같은 이름/필드, collector 직렬화 결과도 동일한 모양) ---
+
+@dataclass
+class SyntheticUser:
+    id: int
+    nick_name: str
+
+    @property
+    def nickname(self) -> str:
+        return self.nick_name
+
+    @property
+    def unique_id(self) -> str:
+        return f"user{self.id}"
+
+
+@dataclass
+class SyntheticGift:
+    id: int
+    name: str
+    diamond_count: int
+    type: int  # 1이면 콤보(streak) 가능
+
+    @property
+    def streakable(self) -> bool:
+        return self.type == 1
+
+
+@dataclass
+class CommentEvent:
+    user_info: SyntheticUser
+    content: str
+    synthetic_sent_at: float = 0.0
+
+    @property
+    def user(self) -> SyntheticUser:
+        return self.user_info
+
+    @property
+    def comment(self) -> str:
+        return self.content
+
+
+@dataclass
+class GiftEvent:
+    from_user: SyntheticUser
+    m_gift: SyntheticGift
+    repeat_count: int = 1
+    repeat_end: int = 0
+    synthetic_sent_at: float = 0.0
+
+    @property
+    def user(self) -> SyntheticUser:
+        return self.from_user
+
+    @property
+    def gift(self) -> SyntheticGift:
+        return self.m_gift
+
+    @property
+    def streaking(self) -> bool:
+        return self.m_gift.streakable and not bool(self.repeat_end)
+
+
+@dataclass
+class LikeEvent:
+    user: SyntheticUser
+    count: int = 1
+    total: int = 0
+    synthetic_sent_at: float = 0.0
+
+
+@dataclass
+class JoinEvent:
+    user: SyntheticUser
+    count: int = 0
+    synthetic_sent_at: float = 0.0
+
+
+DEFAULT_MIX = {"comment": 0.6, "like": 0.25, "join": 0.1, "gift": 0.05}
+
+SAMPLE_COMMENTS = [
+    "안녕하세요!", "오늘 운세 봐주세요", "이름이 뭐예요?", "ㅋㅋㅋㅋ", "사주오빠 최고",
+    "연애운 알려줘", "몇 살이에요?", "🔥🔥🔥", "어디서 방송해요?", "노래 불러줘",
+    "what's your name?", "tell my fortune", "hello from LA", "오늘 날씨 어때?",
+]
+
+SAMPLE_GIFTS = [
+    SyntheticGift(id=5655, name="Rose", diamond_count=1, type=1),
+    SyntheticGift(id=5269, name="TikTok", diamond_count=1, type=1),
+    SyntheticGift(id=6064, name="GG", diamond_count=1, type=1),
+    SyntheticGift(id=5879, name="Doughnut", diamond_count=30, type=1),
+    SyntheticGift(id=6104, name="Cap", diamond_count=99, type=2),
+    SyntheticGift(id=5585, name="Confetti", diamond_count=100, type=2),
+    SyntheticGift(id=6267, name="Corgi", diamond_count=299, type=2),
+    SyntheticGift(id=7312, name="Lion", diamond_count=29999, type=2),
+]
+
+
+def parse_mix(text: Optional[str]) -> Dict[str, float]:
+    """"comment=0.6,gift=0.05,..." → dict"""
+    if not text:
+        return dict(DEFAULT_MIX)
+    mix = {}
+    for part in text.split(","):
+        if "=" in part:
+            kind, weight = part.split("=", 1)
+            mix[kind.strip()] = float(weight)
+    return mix or dict(DEFAULT_MIX)
+
+
+def synthetic_config_from_env() -> dict:
+    return {
+        "rate": float(os.getenv("SYNTHETIC_EVENT_RATE", 20)),
+        "mix": parse_mix(os.getenv("SYNTHETIC_EVENT_MIX")),
+        "max_events": int(os.getenv("SYNTHETIC_MAX_EVENTS", 0)) or None,
+        "duration": float(os.getenv("SYNTHETIC_DURATION", 0)) or None,
+        "seed": int(os.getenv("SYNTHETIC_EVENT_SEED")) if os.getenv("SYNTHETIC_EVENT_SEED") else None,
+        "unique_text": os.getenv("SYNTHETIC_UNIQUE_TEXT", "false").lower() in ("1", "true", "yes"),
+    }
+
+
+class SyntheticEventGenerator:
+    """
+    설정한 비율(mix)로 이벤트를 만드는 generator.
+    콤보 선물은 repeat_count 1..N 업데이트 후 repeat_end 이벤트까지 이어서 만든다.
+    """
+
+    def __init__(
+        self,
+        mix: Optional[Dict[str, float]] = None,
+        viewers: int = 200,
+        seed: Optional[int] = None,
+        unique_text: bool = False,
+    ):
+        self.mix = mix or dict(DEFAULT_MIX)
+        self.kinds = [kind for kind in self.mix if kind in ("comment", "like", "join", "gift")]
+        self.weights = [self.mix[kind] for kind in self.kinds]
+        self.users = [SyntheticUser(id=1000 + i, nick_name=f"viewer{i}") for i in range(viewers)]
+        self.random = random.Random(seed)
+        self.unique_text = unique_text  # 벤치마크에서 메시지별 지연 측정용
+        self.seq = 0
+        self.total_likes = 0
+        self._streak: List = []
+
+    def next_event(self):
+        if self._streak:
+            return self._streak.pop(0)
+        self.seq += 1
+        user = self.random.choice(self.users)
+        kind = self.random.choices(self.kinds, weights=self.weights)[0]
+        if kind == "comment":
+            text = self.random.choice(SAMPLE_COMMENTS)
+            if self.unique_text:
+                text = f"{text} #{self.seq}"
+            return CommentEvent(user_info=user, content=text)
+        if kind == "like":
+            count = self.random.randint(1, 15)
+            self.total_likes += count
+            return LikeEvent(user=user, count=count, total=self.total_likes)
+        if kind == "join":
+            return JoinEvent(user=user, count=len(self.users))
+        gift = self.random.choice(SAMPLE_GIFTS)
+        if not gift.streakable:
+            return GiftEvent(from_user=user, m_gift=gift, repeat_count=1, repeat_end=1)
+        streak_len = self.random.randint(1, 20)
+        events = [GiftEvent(from_user=user, m_gift=gift, repeat_count=n, repeat_end=0) for n in range(1, streak_len + 1)]
+        events.append(GiftEvent(from_user=user, m_gift=gift, repeat_count=streak_len, repeat_end=1))
+        self._streak = events[1:]
+        return events[0]
+
+
+class SyntheticLiveClient:
+    def __init__(
+        self,
+        unique_id: Optional[str] = None,
+        room_id: Optional[str] = None,
+        rate: float = 20.0,
+        mix: Optional[Dict[str, float]] = None,
+        max_events: Optional[int] = None,
+        duration: Optional[float] = None,
+        seed: Optional[int] = None,
+        unique_text: bool = False,
+    ):
+        self.unique_id = unique_id
+        self.room_id = room_id or f"synthetic-{unique_id}"
+        self.rate = rate  # 초당 이벤트 수, 0 이하면 최대 속도
+        self.max_events = max_events
+        self.duration = duration
+        self.generator = SyntheticEventGenerator(mix=mix, seed=seed, unique_text=unique_text)
+        self.emitted = 0
+        self.sent_at: "OrderedDict[str, float]" = OrderedDict()  # unique_text일 때 댓글 → 생성 시각 (최근 SENT_AT_MAX개)
+        self._handlers: Dict[str, List[Callable]] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._connected = False
+
+    def on(self, event_cls):
+        name = event_cls if isinstance(event_cls, str) else event_cls.__name__
+
+        def decorator(handler):
+            self._handlers.setdefault(name, []).append(handler)
+            return handler
+        return decorator
+
+    async def is_live(self, *args, **kwargs) -> bool:
+        return True
+
+    async def connect(self, *args, **kwargs):
+        """TikTokLiveClient.connect처럼 연결이 끝날 때까지 대기"""
+        await self.start()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+    async def start(self, *args, **kwargs):
+        self._connected = True
+        self._task = asyncio.create_task(self._produce())
+        logging.info(f"[Synthetic] started: unique_id={self.unique_id}, rate={self.rate}/s")
+        return self._task
+
+    def run(self, *args, **kwargs):
+        asyncio.get_event_loop().run_until_complete(self.connect())
+
+    async def disconnect(self, *args, **kwargs):
+        self._connected = False
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def close(self):
+        await self.disconnect()
+
+    @property
+    def connected(self) -> bool:
+        return self._connected
+
+    async def _produce(self):
+        interval = 1.0 / self.rate if self.rate > 0 else 0.0
+        started = time.monotonic()
+        try:
+            while self._connected:
+                if self.max_events is not None and self.emitted >= self.max_events:
+                    break
+                if self.duration is not None and time.monotonic() - started >= self.duration:
+                    break
+                if interval:
+                    delay = started + self.emitted * interval - time.monotonic()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                elif self.emitted % 200 == 0:
+                    await asyncio.sleep(0)
+                event = self.generator.next_event()
+                event.synthetic_sent_at = time.time()
+                if self.generator.unique_text and isinstance(event, CommentEvent):
+                    self.sent_at[event.content] = event.synthetic_sent_at
+                    while len(self.sent_at) > SENT_AT_MAX:
+                        self.sent_at.popitem(last=False)
+                self.emitted += 1
+                for handler in self._handlers.get(type(event).__name__, []):
+                    try:
+                        await handler(event)
+                    except Exception as e:
+                        logging.error(f"[Synthetic] handler error: {e}")
+        finally:
+            self._connected = False
+            logging.info(f"[Synthetic] finished: {self.emitted} events")
@@ -0,0 +1,237 @@
+"""
+TikTok 선물 이벤트 처리
+
+- 콤보(streak) 선물은 streak가 끝날 때(repeat_end)까지 기다렸다가 한 번만 전송
+  (timeout으로 먼저 내보낸 콤보는 누적 개수를 잠시 기억해 늦게 온 이벤트는 새로 늘어난 개수만 전송)
+- 콤보가 아닌 선물은 같은 유저/같은 선물을 짧은 시간 창(window) 안에서 묶어서 전송
+- diamond → gift_level_N 매핑은 캐릭터별 정렬된 tier 테이블에서 이진 탐색으로 조회
+"""
+import os
+import time
+import asyncio
+import logging
+from bisect import bisect_right
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+# streak 종료 이벤트가 유실됐을 때 강제로 내보내기까지 기다리는 시간(초)
+COMBO_TIMEOUT = float(os.getenv("GIFT_COMBO_TIMEOUT", 3.0))
+# 콤보가 아닌 선물을 묶는 시간 창(초), 0이면 바로 전송
+GROUP_WINDOW = float(os.getenv("GIFT_GROUP_WINDOW", 1.0))
+# timeout으로 내보낸 콤보의 누적 개수를 기억하는 최대 개수 (기억 기간은 combo_timeout)
+FLUSHED_MAX = int(os.getenv("GIFT_FLUSHED_MAX", 1024))
+
+# (최소 diamond, motion_tag) - 기존 if/elif 기준과 동일
+DEFAULT_GIFT_TIERS = [
+    (0, "gift_level_1"),
+    (10, "gift_level_2"),
+    (50, "gift_level_3"),
+    (100, "gift_level_4"),
+    (500, "gift_level_5"),
+    (1000, "gift_level_6"),
+    (5000, "gift_level_7"),
+]
+
+
+class GiftTierTable:
+    """정렬된 (threshold, motion_tag) 테이블, lookup은 bisect로 O(log n)"""
+
+    def __init__(self, tiers: List[Tuple[int, str]]):
+        if not tiers:
+            tiers = DEFAULT_GIFT_TIERS
+        tiers = sorted((int(threshold), str(tag)) for threshold, tag in tiers)
+        self.thresholds = [threshold for threshold, _ in tiers]
+        self.tags = [tag for _, tag in tiers]
+
+    def lookup(self, coin: int) -> str:
+        idx = bisect_right(self.thresholds, coin) - 1
+        return self.tags[max(idx, 0)]
+
+    @classmethod
+    def from_profile(cls, profile: Optional[dict]) -> "GiftTierTable":
+        """
+        캐릭터 profile의 gift_tiers 필드로 테이블 생성. 허용 형식:
+        - [{"min_coin": 0, "motion_tag": "gift_level_1"}, ...]
+        - [[0, "gift_level_1"], ...]
+        - {"gift_level_1": 0, ...}
+        """
+        raw = (profile or {}).get("gift_tiers")
+        tiers = []
+        try:
+            if isinstance(raw, dict):
+                tiers = [(threshold, tag) for tag, threshold in raw.items()]
+            elif isinstance(raw, list):
+                for item in raw:
+                    if isinstance(item, dict):
+                        tiers.append((item["min_coin"], item["motion_tag"]))
+                    else:
+                        tiers.append((item[0], item[1]))
+        except (KeyError, IndexError, TypeError, ValueError) as e:
+            logging.warning(f"[GIFT] gift_tiers 형식 오류, 기본 테이블 사용: {e}")
+            tiers = []
+        return cls(tiers)
+
+
+DEFAULT_TIER_TABLE = GiftTierTable(DEFAULT_GIFT_TIERS)
+
+# 캐릭터별 tier 테이블 캐시
+_tier_tables: Dict[str, GiftTierTable] = {}
+
+
+def get_tier_table(character_id: Optional[str] = None) -> GiftTierTable:
+    if not character_id:
+        return DEFAULT_TIER_TABLE
+    if character_id not in _tier_tables:
+        try:
+            from backend.services.character_service import get_character_profile
+            _tier_tables[character_id] = GiftTierTable.from_profile(get_character_profile(character_id))
+        except Exception as e:
+            logging.error(f"[GIFT] 캐릭터 gift_tiers 조회 실패, 기본 테이블 사용: {e}")
+            return DEFAULT_TIER_TABLE
+    return _tier_tables[character_id]
+
+
+def invalidate_tier_table(character_id: str):
+    _tier_tables.pop(character_id, None)
+
+
+def gift_from_event(event) -> dict:
+    """TikTokLive GiftEvent → 처리용 dict"""
+    gift = getattr(event, "gift", None)
+    user = getattr(event, "user", None)
+    try:
+        coin = int(getattr(gift, "diamond_count", 1))
+    except (TypeError, ValueError):
+        coin = 1
+    repeat_count = getattr(event, "repeat_count", None) or getattr(gift, "repeat_count", None) or 1
+    return {
+        "user_id": str(getattr(user, "id", "") or getattr(user, "unique_id", "") or getattr(user, "nickname", "")),
+        "user_nickname": getattr(user, "nickname", ""),
+        "gift_id": str(getattr(gift, "id", "") or getattr(gift, "name", "")),
+        "gift_name": getattr(gift, "name", ""),
+        "gift_coin": coin,
+        "repeat_count": int(repeat_count),
+        "streakable": bool(getattr(gift, "streakable", False)),
+        "repeat_end": bool(getattr(event, "repeat_end", False)),
+    }
+
+
+class GiftComboProcessor:
+    """
+    선물 이벤트를 모아서 콤보/그룹당 하나의 gift 메시지만 emit으로 전달한다.
+    emit은 동기 함수(예: ws_relay.publish를 감싼 함수)이며, 타이머는 현재 이벤트 루프에 건다.
+    """
+
+    def __init__(
+        self,
+        emit: Callable[[dict], None],
+        tier_table: Optional[GiftTierTable] = None,
+        combo_timeout: float = COMBO_TIMEOUT,
+        group_window: float = GROUP_WINDOW,
+    ):
+        self.emit = emit
+        self.tier_table = tier_table or DEFAULT_TIER_TABLE
+        self.combo_timeout = combo_timeout
+        self.group_window = group_window
+        self._pending: Dict[Tuple[str, str], dict] = {}
+        self._timers: Dict[Tuple[str, str], asyncio.TimerHandle] = {}
+        # key → (timeout으로 내보낸 누적 repeat_count, 시각)
+        self._flushed: "OrderedDict[Tuple[str, str], Tuple[int, float]]" = OrderedDict()
+
+    def push(self, gift: dict):
+        key = (gift["user_id"], gift["gift_id"])
+        pending = self._pending.get(key)
+        if gift["streakable"]:
+            # 콤보 선물의 repeat_count는 누적값이므로 최댓값을 유지
+            if pending is None:
+                base = self._flushed_base(key, gift)
+                if base is None:
+                    return
+                pending = self._pending[key] = dict(gift, flushed_count=base)
+            else:
+                pending["repeat_count"] = max(pending["repeat_count"], gift["repeat_count"])
+            if gift["repeat_end"]:
+                pending["repeat_end"] = True
+                self._flush(key)
+            else:
+                self._arm(key, self.combo_timeout, restart=True)
+            return
+        if self.group_window <= 0:
+            self.emit(self._build_message(gift))
+            return
+        if pending is None:
+            self._pending[key] = dict(gift)
+            self._arm(key, self.group_window, restart=False)
+        else:
+            pending["repeat_count"] += gift["repeat_count"]
+
+    def flush_all(self):
+        for key in list(self._pending.keys()):
+            self._flush(key)
+
+    def _arm(self, key, delay: float, restart: bool):
+        timer = self._timers.get(key)
+        if timer is not None:
+            if not restart:
+                return
+            timer.cancel()
+        loop = asyncio.get_event_loop()
+        self._timers[key] = loop.call_later(delay, self._flush, key)
+
+    def _flushed_base(self, key, gift: dict) -> Optional[int]:
+        """
+        timeout으로 이미 내보낸 콤보에 늦게 온 이벤트면 이미 보낸 누적 개수, 처음이면 0,
+        새로 늘어난 개수가 없으면 None (전송하지 않음)
+        """
+        flushed = self._flushed.pop(key, None)
+        if flushed is None or time.monotonic() - flushed[1] > self.combo_timeout:
+            return 0
+        count = flushed[0]
+        if gift["repeat_count"] < count:
+            # 누적값이 줄었으면 같은 유저의 새 콤보
+            return 0
+        if gift["repeat_count"] == count:
+            if not gift["repeat_end"]:
+                self._flushed[key] = flushed
+            return None
+        return count
+
+    def _remember_flushed(self, key, count: int):
+        now = time.monotonic()
+        self._flushed[key] = (count, now)
+        while self._flushed:
+            oldest_key, (_, flushed_at) = next(iter(self._flushed.items()))
+            if len(self._flushed) <= FLUSHED_MAX and now - flushed_at <= self.combo_timeout:
+                break
+            self._flushed.pop(oldest_key)
+
+    def _flush(self, key):
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        gift = self._pending.pop(key, None)
+        if gift is None:
+            return
+        base = gift.pop("flushed_count", 0)
+        if gift["streakable"] and not gift["repeat_end"]:
+            # repeat_end 없이 (timeout/종료로) 내보냄 → 같은 콤보의 늦은 이벤트에 대비해 누적값 기억
+            self._remember_flushed(key, gift["repeat_count"])
+        if base:
+            gift["repeat_count"] -= base
+        try:
+            self.emit(self._build_message(gift))
+        except Exception as e:
+            logging.error(f"[GIFT] gift 메시지 전송 실패: {e}")
+
+    def _build_message(self, gift: dict) -> dict:
+        total_coin = gift["gift_coin"] * gift["repeat_count"]
+        return {
+            "type": "gift",
+            "gift_name": gift["gift_name"],
+            "gift_coin": gift["gift_coin"],
+            "repeat_count": gift["repeat_count"],
+            "total_coin": total_coin,
+            "user_nickname": gift["user_nickname"],
+            # 콤보 전체 diamond 합계 기준으로 tier 결정
+            "motion_tag": self.tier_table.lookup(total_coin),
+        }
@@ -0,0 +1,167 @@
+"""
+단계별 지연 시간 측정 (LangGraph 노드 + chat_service 단계)
+
+- stage(name): 구간 시간을 재서 전역 histogram과 현재 요청의 trace에 기록
+- traced_node(name, func, afunc): build_chat_graph에 등록하는 노드를 감싸서 node.<name>으로 기록
+- trace(): 요청 하나의 단계별 시간(ms)을 모으는 context (contextvars라 async/스레드 노드에도 전달됨)
+- snapshot(): 단계별 count/avg/p50/p95/p99/max (/chat/metrics)
+histogram은 0.1ms ~ 약 3분 구간의 로그 스케일 bucket이라 요청 수와 관계없이 메모리가 일정하다.
+"""
+import math
+import time
+import functools
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+MIN_MS = 0.1
+# bucket 경계가 2^(1/4)배(약 19%)씩 커짐 → 백분위 추정 오차도 bucket 폭 이내
+BUCKETS_PER_DOUBLING = 4
+BUCKET_COUNT = 84
+
+_current: contextvars.ContextVar[Optional[Dict[str, float]]] = contextvars.ContextVar("latency_trace", default=None)
+
+
+def _bucket_upper(index: int) -> float:
+    return MIN_MS * 2 ** (index / BUCKETS_PER_DOUBLING)
+
+
+class LatencyHistogram:
+    def __init__(self):
+        self.counts: List[int] = [0] * (BUCKET_COUNT + 1)  # 마지막 칸은 overflow
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    def observe(self, ms: float):
+        if ms <= MIN_MS:
+            index = 0
+        else:
+            index = min(BUCKET_COUNT, math.ceil(math.log2(ms / MIN_MS) * BUCKETS_PER_DOUBLING))
+        self.counts[index] += 1
+        self.count += 1
+        self.total += ms
+        self.min = min(self.min, ms)
+        self.max = max(self.max, ms)
+
+    def percentile(self, pct: float) -> float:
+        """bucket 안에서는 선형 보간, 결과는 관측된 min/max 범위로 자름"""
+        if not self.count:
+            return 0.0
+        rank = pct / 100.0 * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            if not count:
+                continue
+            if seen + count >= rank:
+                lower = _bucket_upper(index - 1) if index else 0.0
+                upper = _bucket_upper(index) if index < BUCKET_COUNT else self.max
+                value = lower + (upper - lower) * max(rank - seen, 0) / count
+                return min(max(value, self.min), self.max)
+            seen += count
+        return self.max
+
+    def summary(self) -> dict:
+        return {
+            "count": self.count,
+            "avg_ms": round(self.total / self.count, 2) if self.count else 0.0,
+            "p50_ms": round(self.percentile(50), 2),
+            "p95_ms": round(self.percentile(95), 2),
+            "p99_ms": round(self.percentile(99), 2),
+            "max_ms": round(self.max, 2),
+        }
+
+
+class LatencyMetrics:
+    def __init__(self):
+        self._histograms: Dict[str, LatencyHistogram] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage: str, ms: float):
+        with self._lock:
+            histogram = self._histograms.get(stage)
+            if histogram is None:
+                histogram = self._histograms[stage] = LatencyHistogram()
+            histogram.observe(ms)
+
+    def snapshot(self, prefix: Optional[str] = None) -> Dict[str, dict]:
+        with self._lock:
+            return {
+                name: histogram.summary()
+                for name, histogram in sorted(self._histograms.items())
+                if prefix is None or name.startswith(prefix)
+            }
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+
+
+metrics = LatencyMetrics()
+
+
+def record(name: str, ms: float):
+    metrics.observe(name, ms)
+    timings = _current.get()
+    if timings is not None:
+        # 같은 단계가 여러 번이면(배치 등) 합산
+        timings[name] = round(timings.get(name, 0.0) + ms, 2)
+
+
+@contextmanager
+def stage(name: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, (time.perf_counter() - started) * 1000)
+
+
+@contextmanager
+def trace():
+    """요청 하나의 단계별 시간을 모음: with trace() as timings: ... → {stage: ms}"""
+    timings: Dict[str, float] = {}
+    token = _current.set(timings)
+    try:
+        yield timings
+    finally:
+        try:
+            _current.reset(token)
+        except ValueError:
+            # 스트리밍 generator가 다른 context에서 닫힌 경우 (클라이언트 연결 끊김 등)
+            pass
+
+
+def traced_node(name: str, func, afunc=None):
+    """LangGraph 노드 함수를 감싸 node.<name> 단계로 기록 (afunc가 있으면 (sync, async) 쌍 반환)"""
+    stage_name = f"node.{name}"
+
+    @functools.wraps(func)
+    def _sync(state):
+        with stage(stage_name):
+            return func(state)
+
+    if afunc is None:
+        return _sync
+
+    @functools.wraps(afunc)
+    async def _async(state):
+        with stage(stage_name):
+            return await afunc(state)
+
+    return _sync, _async
+
+
+def server_timing(timings: Dict[str, float]) -> str:
+    """Server-Timing 헤더 값 (브라우저 개발자 도구 Network 탭에 단계별로 표시됨)"""
+    return ", ".join(f"{name};dur={ms}" for name, ms in timings.items())
+
+
+def snapshot(prefix: Optional[str] = None) -> Dict[str, dict]:
+    return metrics.snapshot(prefix)
+
+
+def reset():
+    metrics.reset()
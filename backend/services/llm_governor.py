@@ -0,0 +1,414 @@
+"""
+LLM 호출 governor (프로세스 전체 공유)
+
+chat_graph, rag/chain, 대화 요약 등 모든 LLM 호출이 같은 governor를 통과한다.
+- token bucket: 분당 요청 수(LLM_RPM), 분당 토큰 수(LLM_TPM, 0이면 제한 없음)
+- 전체 동시 호출 수(LLM_MAX_CONCURRENCY), 캐릭터별 동시 호출 수(LLM_PER_CHARACTER_CONCURRENCY)
+- 요청별 deadline: 대기 + 호출 시간이 넘으면 LLMDeadlineExceeded (async 호출은 취소됨)
+- 우선순위: live(실제 방송) > playground(테스트) > background(요약 등), 같은 우선순위는 먼저 온 순서
+동기 코드(스레드)와 async 코드에서 모두 사용할 수 있고, 대기열 길이/대기 시간을 stats()로 노출한다.
+"""
+import os
+import time
+import asyncio
+import threading
+import itertools
+from contextlib import contextmanager, asynccontextmanager
+from typing import Dict, List, Optional
+
+LIVE = "live"
+PLAYGROUND = "playground"
+BACKGROUND = "background"
+PRIORITIES = {LIVE: 0, PLAYGROUND: 1, BACKGROUND: 2}
+
+MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", 16))
+PER_CHARACTER_CONCURRENCY = int(os.getenv("LLM_PER_CHARACTER_CONCURRENCY", 4))
+RPM = float(os.getenv("LLM_RPM", 500))
+TPM = float(os.getenv("LLM_TPM", 0))
+DEADLINE_S = float(os.getenv("LLM_DEADLINE_S", 30))
+# 토큰 bucket용 호출당 예상 출력 토큰
+EXPECTED_OUTPUT_TOKENS = int(os.getenv("LLM_EXPECTED_OUTPUT_TOKENS", 300))
+
+
+class LLMDeadlineExceeded(TimeoutError):
+    pass
+
+
+class TokenBucket:
+    """rate_per_min만큼 분당 채워지고 최대 capacity까지 쌓이는 bucket (rate 0이면 제한 없음)"""
+
+    def __init__(self, rate_per_min: float, capacity: Optional[float] = None, clock=time.monotonic):
+        self.rate = rate_per_min / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_min
+        self.clock = clock
+        self.tokens = self.capacity
+        self.updated = clock()
+
+    @property
+    def unlimited(self) -> bool:
+        return self.rate <= 0
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, cost: float) -> float:
+        """cost만큼 꺼낼 수 있을 때까지 남은 초 (0이면 바로 가능)"""
+        if self.unlimited:
+            return 0.0
+        self._refill()
+        cost = min(cost, self.capacity)  # capacity보다 큰 요청이 영원히 못 나가지 않도록
+        if self.tokens >= cost:
+            return 0.0
+        return (cost - self.tokens) / self.rate
+
+    def take(self, cost: float):
+        if not self.unlimited:
+            self.tokens -= min(cost, self.capacity)
+
+
+class _Waiter:
+    __slots__ = ("rank", "priority", "character_id", "tokens", "enqueued", "granted", "event", "loop", "future")
+
+    def __init__(self, rank, priority, character_id, tokens, enqueued):
+        self.rank = rank
+        self.priority = priority
+        self.character_id = character_id
+        self.tokens = tokens
+        self.enqueued = enqueued
+        self.granted = False
+        self.event: Optional[threading.Event] = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.future: Optional[asyncio.Future] = None
+
+    def wake(self):
+        if self.event is not None:
+            self.event.set()
+        elif self.loop is not None and not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(_resolve, self.future)
+
+
+def _resolve(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
+
+
+class _Stat:
+    __slots__ = ("count", "total", "max")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, value: float):
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def as_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "avg_ms": round(self.total / self.count * 1000, 1) if self.count else 0.0,
+            "max_ms": round(self.max * 1000, 1),
+        }
+
+
+class LLMGovernor:
+    def __init__(
+        self,
+        max_concurrency: int = MAX_CONCURRENCY,
+        per_character: int = PER_CHARACTER_CONCURRENCY,
+        rpm: float = RPM,
+        tpm: float = TPM,
+        deadline: float = DEADLINE_S,
+        clock=time.monotonic,
+    ):
+        self.max_concurrency = max_concurrency
+        self.per_character = per_character
+        self.deadline = deadline
+        self.clock = clock
+        self.requests = TokenBucket(rpm, clock=clock)
+        self.tokens = TokenBucket(tpm, clock=clock)
+        self.character_limits: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._waiters: List[_Waiter] = []
+        self._seq = itertools.count()
+        self._active = 0
+        self._active_by_character: Dict[str, int] = {}
+        self._wait_stats: Dict[str, _Stat] = {p: _Stat() for p in PRIORITIES}
+        self._wait_by_character: Dict[str, _Stat] = {}
+        self._counters = {"granted": 0, "timeouts": 0, "deadline_exceeded": 0, "cancelled": 0}
+        # rate limit 때문에 멈춘 대기열을 다시 확인할 시각 (release/취소에서 계산된 delay를 잃지 않도록)
+        self._retry_at: Optional[float] = None
+
+    def set_character_limit(self, character_id: str, limit: Optional[int]):
+        with self._lock:
+            if limit is None:
+                self.character_limits.pop(character_id, None)
+            else:
+                self.character_limits[character_id] = limit
+            self._dispatch()
+
+    # 대기열 처리 (lock 안에서 호출) ------------------------------------------------
+    def _character_full(self, character_id: Optional[str]) -> bool:
+        if not character_id:
+            return False
+        limit = self.character_limits.get(character_id, self.per_character)
+        return limit > 0 and self._active_by_character.get(character_id, 0) >= limit
+
+    def _dispatch(self) -> float:
+        """
+        우선순위 순서로 슬롯을 나눠 줌. 반환값은 rate limit 때문에 다시 확인해야 하는 초 (없으면 0)
+        캐릭터 한도에 걸린 요청은 건너뛰지만, rate limit에 걸리면 뒤 요청이 앞지르지 않도록 멈춤
+        """
+        for waiter in list(self._waiters):
+            if self.max_concurrency > 0 and self._active >= self.max_concurrency:
+                return 0.0
+            if self._character_full(waiter.character_id):
+                continue
+            delay = max(self.requests.wait_time(1), self.tokens.wait_time(waiter.tokens))
+            if delay > 0:
+                self._schedule_retry(delay)
+                return delay
+            self.requests.take(1)
+            self.tokens.take(waiter.tokens)
+            self._waiters.remove(waiter)
+            self._active += 1
+            if waiter.character_id:
+                self._active_by_character[waiter.character_id] = self._active_by_character.get(waiter.character_id, 0) + 1
+            waiter.granted = True
+            waited = self.clock() - waiter.enqueued
+            self._wait_stats[waiter.priority].add(waited)
+            if waiter.character_id:
+                self._wait_by_character.setdefault(waiter.character_id, _Stat()).add(waited)
+            self._counters["granted"] += 1
+            waiter.wake()
+        return 0.0
+
+    def _schedule_retry(self, delay: float):
+        """
+        delay 뒤에 대기열을 다시 처리하는 timer (lock 안에서 호출)
+        동시 호출 한도 때문에 잠들어 있던 요청은 자기 deadline까지 깨어나지 않으므로, 누가 dispatch를 하든 timer가 이어받음
+        """
+        retry_at = self.clock() + delay
+        if self._retry_at is not None and self._retry_at <= retry_at:
+            return
+        self._retry_at = retry_at
+        timer = threading.Timer(delay, self._retry)
+        timer.daemon = True
+        timer.start()
+
+    def _retry(self):
+        with self._lock:
+            if self._retry_at is not None and self.clock() + 0.001 < self._retry_at:
+                return  # 더 이른 timer가 새로 잡힘
+            self._retry_at = None
+            self._dispatch()
+
+    def _enqueue(self, character_id, priority, tokens) -> _Waiter:
+        if priority not in PRIORITIES:
+            raise ValueError(f"알 수 없는 우선순위: {priority}")
+        waiter = _Waiter((PRIORITIES[priority], next(self._seq)), priority, character_id, tokens, self.clock())
+        self._waiters.append(waiter)
+        self._waiters.sort(key=lambda w: w.rank)
+        return waiter
+
+    def _abandon(self, waiter: _Waiter, counter: str):
+        """대기 중 timeout/취소: 대기열에서 빼고, 그 사이 이미 슬롯을 받았으면 반납"""
+        with self._lock:
+            if waiter.granted:
+                self._release_locked(waiter.character_id)
+            elif waiter in self._waiters:
+                self._waiters.remove(waiter)
+            self._counters[counter] += 1
+            self._dispatch()
+
+    def _release_locked(self, character_id: Optional[str]):
+        self._active -= 1
+        if character_id:
+            left = self._active_by_character.get(character_id, 1) - 1
+            if left > 0:
+                self._active_by_character[character_id] = left
+            else:
+                self._active_by_character.pop(character_id, None)
+
+    def release(self, character_id: Optional[str]):
+        with self._lock:
+            self._release_locked(character_id)
+            self._dispatch()
+
+    # 동기 ----------------------------------------------------------------------
+    def acquire(self, character_id: Optional[str] = None, priority: str = LIVE,
+                tokens: int = 0, timeout: Optional[float] = None) -> float:
+        """슬롯을 받을 때까지 대기 → deadline(clock 기준) 반환, timeout 안에 못 받으면 LLMDeadlineExceeded"""
+        timeout = self.deadline if timeout is None else timeout
+        deadline = self.clock() + timeout
+        with self._lock:
+            waiter = self._enqueue(character_id, priority, tokens)
+            waiter.event = threading.Event()
+            delay = self._dispatch()
+        while not waiter.granted:
+            remaining = deadline - self.clock()
+            if remaining <= 0:
+                self._abandon(waiter, "timeouts")
+                raise LLMDeadlineExceeded(f"LLM 대기열에서 {timeout:.1f}s 안에 차례가 오지 않았습니다.")
+            waiter.event.wait(min(remaining, delay) if delay > 0 else remaining)
+            waiter.event.clear()
+            with self._lock:
+                delay = self._dispatch() if not waiter.granted else 0.0
+        return deadline
+
+    @contextmanager
+    def slot(self, character_id: Optional[str] = None, priority: str = LIVE,
+             tokens: int = 0, timeout: Optional[float] = None):
+        deadline = self.acquire(character_id, priority, tokens, timeout)
+        try:
+            yield deadline
+        finally:
+            self.release(character_id)
+
+    def call(self, fn, *args, character_id: Optional[str] = None, priority: str = LIVE,
+             tokens: int = 0, timeout: Optional[float] = None, **kwargs):
+        """
+        동기 호출. 대기 시간만 deadline으로 자르고, 이미 시작된 호출은 끊을 수 없으므로
+        호출이 deadline을 넘기면 결과를 버리고 LLMDeadlineExceeded
+        """
+        with self.slot(character_id, priority, tokens, timeout) as deadline:
+            result = fn(*args, **kwargs)
+        if self.clock() > deadline:
+            with self._lock:
+                self._counters["deadline_exceeded"] += 1
+            raise LLMDeadlineExceeded("LLM 호출이 deadline을 넘었습니다.")
+        return result
+
+    # async -----------------------------------------------------------------------
+    async def aacquire(self, character_id: Optional[str] = None, priority: str = LIVE,
+                       tokens: int = 0, timeout: Optional[float] = None) -> float:
+        timeout = self.deadline if timeout is None else timeout
+        deadline = self.clock() + timeout
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            waiter = self._enqueue(character_id, priority, tokens)
+            waiter.loop = loop
+            waiter.future = loop.create_future()
+            delay = self._dispatch()
+        try:
+            while not waiter.granted:
+                remaining = deadline - self.clock()
+                if remaining <= 0:
+                    raise asyncio.TimeoutError
+                try:
+                    await asyncio.wait_for(asyncio.shield(waiter.future), min(remaining, delay) if delay > 0 else remaining)
+                except asyncio.TimeoutError:
+                    pass
+                with self._lock:
+                    delay = self._dispatch() if not waiter.granted else 0.0
+        except asyncio.TimeoutError:
+            self._abandon(waiter, "timeouts")
+            raise LLMDeadlineExceeded(f"LLM 대기열에서 {timeout:.1f}s 안에 차례가 오지 않았습니다.")
+        except asyncio.CancelledError:
+            self._abandon(waiter, "cancelled")
+            raise
+        return deadline
+
+    @asynccontextmanager
+    async def aslot(self, character_id: Optional[str] = None, priority: str = LIVE,
+                    tokens: int = 0, timeout: Optional[float] = None):
+        deadline = await self.aacquire(character_id, priority, tokens, timeout)
+        try:
+            yield deadline
+        finally:
+            self.release(character_id)
+
+    async def acall(self, coro_fn, *args, character_id: Optional[str] = None, priority: str = LIVE,
+                    tokens: int = 0, timeout: Optional[float] = None, **kwargs):
+        """async 호출. 남은 deadline 안에 끝나지 않으면 호출을 취소하고 LLMDeadlineExceeded"""
+        async with self.aslot(character_id, priority, tokens, timeout) as deadline:
+            try:
+                return await asyncio.wait_for(coro_fn(*args, **kwargs), max(deadline - self.clock(), 0.001))
+            except asyncio.TimeoutError:
+                with self._lock:
+                    self._counters["deadline_exceeded"] += 1
+                raise LLMDeadlineExceeded("LLM 호출이 deadline을 넘어 취소했습니다.")
+
+    async def astream(self, agen_fn, *args, character_id: Optional[str] = None, priority: str = LIVE,
+                      tokens: int = 0, timeout: Optional[float] = None, **kwargs):
+        """async generator 호출 (토큰 스트리밍). 스트림이 끝날 때까지 슬롯을 잡고, 청크 사이에도 deadline 적용"""
+        async with self.aslot(character_id, priority, tokens, timeout) as deadline:
+            agen = agen_fn(*args, **kwargs)
+            try:
+                while True:
+                    try:
+                        chunk = await asyncio.wait_for(agen.__anext__(), max(deadline - self.clock(), 0.001))
+                    except StopAsyncIteration:
+                        return
+                    except asyncio.TimeoutError:
+                        with self._lock:
+                            self._counters["deadline_exceeded"] += 1
+                        raise LLMDeadlineExceeded("LLM 스트림이 deadline을 넘어 취소했습니다.")
+                    yield chunk
+            finally:
+                await agen.aclose()
+
+    # stats -----------------------------------------------------------------------
+    def stats(self) -> dict:
+        with self._lock:
+            queued = {p: 0 for p in PRIORITIES}
+            queued_by_character: Dict[str, int] = {}
+            now = self.clock()
+            oldest = {p: 0.0 for p in PRIORITIES}
+            for waiter in self._waiters:
+                queued[waiter.priority] += 1
+                oldest[waiter.priority] = max(oldest[waiter.priority], now - waiter.enqueued)
+                if waiter.character_id:
+                    queued_by_character[waiter.character_id] = queued_by_character.get(waiter.character_id, 0) + 1
+            return {
+                "active": self._active,
+                "max_concurrency": self.max_concurrency,
+                "active_by_character": dict(self._active_by_character),
+                "queued": queued,
+                "queued_by_character": queued_by_character,
+                "oldest_wait_ms": {p: round(v * 1000, 1) for p, v in oldest.items()},
+                "wait": {p: s.as_dict() for p, s in self._wait_stats.items()},
+                "wait_by_character": {c: s.as_dict() for c, s in self._wait_by_character.items()},
+                "rate_limit": {
+                    "rpm": self.requests.rate * 60,
+                    "requests_available": None if self.requests.unlimited else round(self.requests.tokens, 1),
+                    "tpm": self.tokens.rate * 60,
+                    "tokens_available": None if self.tokens.unlimited else round(self.tokens.tokens, 1),
+                },
+                **self._counters,
+            }
+
+
+def estimate_tokens(*texts: str) -> int:
+    """TPM bucket용 예상 토큰 (입력 토큰 + 예상 출력 토큰)"""
+    from backend.services.conversation_memory import count_tokens
+    return sum(count_tokens(t) for t in texts if t) + EXPECTED_OUTPUT_TOKENS
+
+
+def priority_for(session_id: Optional[str]) -> str:
+    """실제 방송 세션(UUID)이면 live, 그 외(PlaygroundTab 등)는 playground"""
+    from backend.services.chat_service import UUID_REGEX
+    return LIVE if session_id and UUID_REGEX.match(str(session_id)) else PLAYGROUND
+
+
+governor = LLMGovernor()
+
+
+def call(fn, *args, **kwargs):
+    return governor.call(fn, *args, **kwargs)
+
+
+async def acall(coro_fn, *args, **kwargs):
+    return await governor.acall(coro_fn, *args, **kwargs)
+
+
+def astream(agen_fn, *args, **kwargs):
+    return governor.astream(agen_fn, *args, **kwargs)
+
+
+def stats() -> dict:
+    return governor.stats()
@@ -0,0 +1,154 @@
+"""
+캐릭터별 프롬프트 prefix 캐시
+
+instruction/예시 문답(chat_graph)과 Jinja 캐릭터 템플릿(rag/chain)은 캐릭터가 같으면 매번 같으므로
+한 번 렌더링해서 버전(내용 해시)과 함께 보관한다.
+- prefix는 항상 프롬프트 맨 앞, 질문 등 매번 바뀌는 부분은 맨 뒤에 붙임
+  → 같은 캐릭터의 요청은 앞부분이 byte 단위로 동일해서 OpenAI prompt caching이 적용됨
+- 캐릭터 profile 저장 시 rebuild(), 수정 시 invalidate()
+  (다른 worker는 character_service가 ws_relay control 메시지 "profile_updated"를 받아 invalidate)
+"""
+import hashlib
+import logging
+import threading
+from typing import Dict, Optional, Tuple
+
+# 예시 문답은 앞에서부터 최대 개수만 사용 (기존 ask()와 동일)
+MAX_EXAMPLES = 3
+
+
+class PromptPrefix:
+    __slots__ = ("text", "version", "instruction", "examples")
+
+    def __init__(self, text: str, instruction: str = "", examples: str = ""):
+        self.text = text
+        self.version = hashlib.sha1(text.encode("utf-8")).hexdigest()[:12]
+        self.instruction = instruction
+        self.examples = examples
+
+
+def format_examples(examples) -> str:
+    """예시 Q&A를 Q/A 쌍으로 포맷 (배열/문자열 모두 허용)"""
+    if not examples:
+        return "(예시 없음)"
+    if isinstance(examples, str):
+        return examples
+    lines = []
+    for qa in examples:
+        user = qa.get('user') or qa.get('input') or ''
+        character = qa.get('character') or qa.get('output') or ''
+        if user and character:
+            lines.append(f"Q: {user}\nA: {character}")
+    return "\n".join(lines)
+
+
+def render_chat_prefix(profile: Optional[dict]) -> PromptPrefix:
+    profile = profile or {}
+    instruction = str(profile.get("instruction", "") or "")
+    examples = profile.get("examples", []) or []
+    if isinstance(examples, list):
+        examples = examples[:MAX_EXAMPLES]
+    formatted = format_examples(examples)
+    text = f"[캐릭터 설명]\n{instruction}\n\n[예시 문답]\n{formatted}\n"
+    return PromptPrefix(text, instruction=instruction, examples=formatted)
+
+
+_lock = threading.Lock()
+_chat_prefixes: Dict[str, PromptPrefix] = {}
+# profile을 요청에 직접 담아 보내는 경우(playground) 내용 해시 → prefix
+_adhoc_prefixes: Dict[str, PromptPrefix] = {}
+_MAX_ADHOC = 64
+_rag_prefixes: Dict[str, Tuple[str, PromptPrefix]] = {}
+
+EMPTY_CHAT_PREFIX = render_chat_prefix(None)
+
+
+def get_chat_prefix(character_id: Optional[str] = None, profile: Optional[dict] = None) -> PromptPrefix:
+    """
+    chat_graph용 prefix.
+    - profile을 직접 받으면(playground) 그 내용으로 만든 prefix (같은 내용이면 같은 객체 재사용)
+    - character_id만 있으면 저장된 profile로 만든 캐시 사용 (없으면 한 번 조회해서 생성)
+    """
+    if profile:
+        key = hashlib.sha1(repr((profile.get("instruction"), profile.get("examples"))).encode("utf-8")).hexdigest()
+        with _lock:
+            prefix = _adhoc_prefixes.get(key)
+        if prefix is None:
+            prefix = render_chat_prefix(profile)
+            with _lock:
+                if len(_adhoc_prefixes) >= _MAX_ADHOC:
+                    _adhoc_prefixes.pop(next(iter(_adhoc_prefixes)))
+                _adhoc_prefixes[key] = prefix
+        return prefix
+    if not character_id:
+        return EMPTY_CHAT_PREFIX
+    with _lock:
+        prefix = _chat_prefixes.get(character_id)
+    if prefix is not None:
+        return prefix
+    try:
+        from backend.services.character_service import get_character_profile
+        return rebuild(character_id, get_character_profile(character_id))
+    except Exception as e:
+        logging.error(f"[PROMPT_CACHE] 캐릭터 profile 조회 실패, 빈 prefix 사용: {e}")
+        return EMPTY_CHAT_PREFIX
+
+
+def rebuild(character_id: str, profile: Optional[dict]) -> PromptPrefix:
+    """profile 저장 직후 호출: chat prefix를 새로 렌더링 (rag prefix는 다음 체인 로드 때 다시 렌더링)"""
+    prefix = render_chat_prefix(profile)
+    with _lock:
+        previous = _chat_prefixes.get(character_id)
+        _chat_prefixes[character_id] = prefix
+        _rag_prefixes.pop(character_id, None)
+    if previous is None or previous.version != prefix.version:
+        logging.info(f"[PROMPT_CACHE] {character_id} prefix version={prefix.version}")
+    return prefix
+
+
+def invalidate(character_id: Optional[str] = None):
+    with _lock:
+        if character_id is None:
+            _chat_prefixes.clear()
+            _adhoc_prefixes.clear()
+            _rag_prefixes.clear()
+        else:
+            _chat_prefixes.pop(character_id, None)
+            _rag_prefixes.pop(character_id, None)
+
+
+# --- rag/chain 캐릭터 템플릿 ---
+
+_INPUT_MARKER = "\x00INPUT\x00"
+_CONTEXT_MARKER = "\x00CONTEXT\x00"
+
+
+def get_rag_prefix(character_id: str, jinja_env, template_file: str, render_kwargs: dict) -> PromptPrefix:
+    """
+    Jinja 템플릿을 한 번만 렌더링해서 PromptTemplate 문자열로 반환.
+    렌더링 결과의 중괄호는 escape하고 {context}(검색된 문서), {input} 자리만 변수로 남긴다 (변수는 템플릿 맨 끝).
+    """
+    source_key = hashlib.sha1(repr((template_file, sorted(render_kwargs.items(), key=lambda kv: kv[0]))).encode("utf-8")).hexdigest()
+    with _lock:
+        cached = _rag_prefixes.get(character_id)
+    if cached is not None and cached[0] == source_key:
+        return cached[1]
+    rendered = jinja_env.get_template(template_file).render(input=_INPUT_MARKER, context=_CONTEXT_MARKER, **render_kwargs)
+    text = (
+        rendered.replace("{", "{{").replace("}", "}}")
+        .replace(_CONTEXT_MARKER, "{context}")
+        .replace(_INPUT_MARKER, "{input}")
+    )
+    prefix = PromptPrefix(text)
+    with _lock:
+        _rag_prefixes[character_id] = (source_key, prefix)
+    return prefix
+
+
+def stats() -> dict:
+    with _lock:
+        return {
+            "chat": {cid: p.version for cid, p in _chat_prefixes.items()},
+            "adhoc": len(_adhoc_prefixes),
+            "rag": {cid: p.version for cid, (_, p) in _rag_prefixes.items()},
+        }
@@ -0,0 +1,208 @@
+"""
+캐릭터별 LLM 응답 캐시
+
+라이브 시청자는 같은 질문("이름이 뭐예요", "운세 봐주세요")을 반복하므로
+같은(또는 거의 같은) 질문이면 LLM을 호출하지 않고 이전 응답을 재사용한다.
+- 1차: 정규화한 질문 텍스트로 정확히 일치 조회
+- 2차: 임베딩 cosine 유사도가 threshold 이상인 가장 가까운 질문 (RESPONSE_CACHE_SEMANTIC=true일 때만, 기본 off)
+  임베딩은 RAG와 같은 모델/질문 batcher(rag.chain.get_cached_embeddings) 사용
+  → 한국어 질문이면 RAG_EMBEDDING_MODEL을 다국어 모델로 설정한 뒤 켤 것
+  miss일 때 조회에서 만든 벡터를 store에 그대로 넘겨 같은 질문을 두 번 임베딩하지 않음 (match → store(vector=...))
+- 캐릭터 + 프롬프트 prefix 버전(prompt_cache) 단위로 분리, TTL/LRU 크기 제한
+- 캐릭터 profile이 바뀌면 invalidate(character_id)
+"""
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from backend.services.comment_triage import normalize
+
+CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+SEMANTIC_ENABLED = os.getenv("RESPONSE_CACHE_SEMANTIC", "false").lower() in ("1", "true", "yes")
+SIMILARITY_THRESHOLD = float(os.getenv("RESPONSE_CACHE_THRESHOLD", 0.92))
+TTL_SEC = float(os.getenv("RESPONSE_CACHE_TTL", 600))
+MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_SIZE", 200))  # 캐릭터당
+
+
+def cache_key_text(text: str) -> str:
+    return normalize(text).replace("?", "").strip()
+
+
+def default_embed(text: str) -> List[float]:
+    # 모델을 따로 올리지 않고 RAG 체인의 임베딩(질문 micro-batching 포함) 공유
+    from backend.rag.chain import get_cached_embeddings
+    return get_cached_embeddings().embed_query(text)
+
+
+class _CacheEntry:
+    __slots__ = ("response", "created_at", "vector", "hits")
+
+    def __init__(self, response: str, created_at: float, vector):
+        self.response = response
+        self.created_at = created_at
+        self.vector = vector
+        self.hits = 0
+
+
+class ResponseCache:
+    def __init__(
+        self,
+        max_entries: int = MAX_ENTRIES,
+        ttl_sec: float = TTL_SEC,
+        threshold: float = SIMILARITY_THRESHOLD,
+        embed: Optional[Callable[[str], List[float]]] = None,
+        semantic: bool = SEMANTIC_ENABLED,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.max_entries = max_entries
+        self.ttl_sec = ttl_sec
+        self.threshold = threshold
+        self.embed = embed or default_embed
+        self.semantic = semantic
+        self.clock = clock
+        # character_id → fingerprint → OrderedDict(key_text → entry) (LRU 순서)
+        self._entries: Dict[str, Dict[str, OrderedDict]] = {}
+        self._stats: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    # --- 조회/저장 ---
+
+    def lookup(self, character_id: str, fingerprint: str, text: str) -> Optional[str]:
+        return self.match(character_id, fingerprint, text)[0]
+
+    def match(self, character_id: str, fingerprint: str, text: str) -> Tuple[Optional[str], Optional[np.ndarray]]:
+        """(캐시된 응답 또는 None, 유사도 비교에 쓴 질문 벡터 또는 None) - miss면 벡터를 store(vector=...)에 넘김"""
+        key = cache_key_text(text)
+        if not key:
+            return None, None
+        now = self.clock()
+        with self._lock:
+            bucket = self._bucket(character_id, fingerprint)
+            entry = bucket.get(key)
+            if entry is not None and now - entry.created_at <= self.ttl_sec:
+                bucket.move_to_end(key)
+                entry.hits += 1
+                self._count(character_id, "exact_hits")
+                return entry.response, None
+            if entry is not None:
+                del bucket[key]
+            candidates = [(k, e.vector) for k, e in bucket.items() if e.vector is not None]
+        vector = None
+        if self.semantic and candidates:
+            vector = self._vector(text)
+            if vector is not None:
+                # 정규화된 벡터끼리의 내적 = cosine 유사도
+                scores = np.stack([v for _, v in candidates]) @ vector
+                best = int(np.argmax(scores))
+                best_key, best_score = candidates[best][0], float(scores[best])
+                if best_score >= self.threshold:
+                    with self._lock:
+                        bucket = self._bucket(character_id, fingerprint)
+                        entry = bucket.get(best_key)
+                        if entry is not None and now - entry.created_at <= self.ttl_sec:
+                            bucket.move_to_end(best_key)
+                            entry.hits += 1
+                            self._count(character_id, "semantic_hits")
+                            return entry.response, vector
+        with self._lock:
+            self._count(character_id, "misses")
+        return None, vector
+
+    def store(self, character_id: str, fingerprint: str, text: str, response: str, vector=None):
+        key = cache_key_text(text)
+        if not key or not response:
+            return
+        if not self.semantic:
+            vector = None
+        elif vector is None:
+            vector = self._vector(text)
+        with self._lock:
+            bucket = self._bucket(character_id, fingerprint)
+            bucket[key] = _CacheEntry(response, self.clock(), vector)
+            bucket.move_to_end(key)
+            while len(bucket) > self.max_entries:
+                bucket.popitem(last=False)
+                self._count(character_id, "evictions")
+
+    def invalidate(self, character_id: Optional[str] = None):
+        with self._lock:
+            if character_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(character_id, None)
+
+    def stats(self, character_id: Optional[str] = None) -> dict:
+        with self._lock:
+            ids = [character_id] if character_id else sorted(set(self._stats) | set(self._entries))
+            result = {}
+            for cid in ids:
+                counts = dict(self._stats.get(cid, {}))
+                hits = counts.get("exact_hits", 0) + counts.get("semantic_hits", 0)
+                total = hits + counts.get("misses", 0)
+                result[cid] = {
+                    "exact_hits": counts.get("exact_hits", 0),
+                    "semantic_hits": counts.get("semantic_hits", 0),
+                    "misses": counts.get("misses", 0),
+                    "evictions": counts.get("evictions", 0),
+                    "hit_rate": round(hits / total, 4) if total else None,
+                    "entries": sum(len(b) for b in self._entries.get(cid, {}).values()),
+                }
+            return result
+
+    # --- 내부 ---
+
+    def _bucket(self, character_id: str, fingerprint: str) -> OrderedDict:
+        return self._entries.setdefault(character_id, {}).setdefault(fingerprint, OrderedDict())
+
+    def _count(self, character_id: str, name: str):
+        counts = self._stats.setdefault(character_id, {})
+        counts[name] = counts.get(name, 0) + 1
+
+    def _vector(self, text: str):
+        try:
+            return _normalize_vector(self.embed(text))
+        except Exception as e:
+            logging.warning(f"[RESPONSE_CACHE] 임베딩 실패, 정확히 일치하는 질문만 사용: {e}")
+            return None
+
+
+def _normalize_vector(vector) -> Optional[np.ndarray]:
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = float(np.linalg.norm(vector))
+    if not norm:
+        return None
+    return vector / norm
+
+
+response_cache = ResponseCache()
+
+
+def lookup(character_id: Optional[str], fingerprint: str, text: str) -> Optional[str]:
+    if not CACHE_ENABLED or not character_id:
+        return None
+    return response_cache.lookup(character_id, fingerprint, text)
+
+
+def match(character_id: Optional[str], fingerprint: str, text: str) -> Tuple[Optional[str], Optional[np.ndarray]]:
+    if not CACHE_ENABLED or not character_id:
+        return None, None
+    return response_cache.match(character_id, fingerprint, text)
+
+
+def store(character_id: Optional[str], fingerprint: str, text: str, response: str, vector=None):
+    if not CACHE_ENABLED or not character_id:
+        return
+    response_cache.store(character_id, fingerprint, text, response, vector=vector)
+
+
+def invalidate(character_id: Optional[str] = None):
+    response_cache.invalidate(character_id)
+
+
+def stats(character_id: Optional[str] = None) -> dict:
+    return response_cache.stats(character_id)
@@ -0,0 +1,57 @@
+"""
+LLM 토큰 스트림 → 문장 단위 분리
+
+스트리밍 응답(/chat/ask/stream)에서 끝난 문장부터 바로 TTS(/tts/stream)로 보낼 수 있도록
+토큰을 모아 문장이 끝날 때마다 꺼내 준다.
+- 문장 끝: . ! ? … ~ 와 그 뒤 공백, 또는 줄바꿈
+- [감정: ...] 같은 태그가 닫히기 전에는 문장을 자르지 않음 (태그는 TTS용 텍스트에서 제거)
+"""
+import re
+from typing import List, Optional
+
+SENTENCE_END_RE = re.compile(r"[.!?…~。]+[\"')\]]*\s+|\n+")
+EMOTION_TAG_RE = re.compile(r"\[감정:\s*(.*?)\]")
+# 너무 짧은 조각(예: "네.")은 다음 문장과 합쳐서 TTS 호출 수를 줄임
+MIN_SENTENCE_CHARS = 4
+
+
+def clean_sentence(text: str) -> str:
+    # chat_service.clean_response_text와 같은 규칙 (대괄호 태그, 앞의 A: 제거)
+    text = re.sub(r"\[.*?\]", "", text)
+    text = re.sub(r"^[aA]:\s*", "", text.strip())
+    return " ".join(text.split()).strip()
+
+
+def find_emotion_tag(text: str) -> Optional[str]:
+    match = EMOTION_TAG_RE.search(text)
+    return match.group(1).strip() if match else None
+
+
+class SentenceBuffer:
+    def __init__(self, min_chars: int = MIN_SENTENCE_CHARS):
+        self.min_chars = min_chars
+        self._buffer = ""
+
+    def feed(self, token: str) -> List[str]:
+        """토큰 추가 후 완성된 문장(TTS용으로 정리된 텍스트) 목록 반환"""
+        self._buffer += token
+        sentences = []
+        start = 0
+        for match in SENTENCE_END_RE.finditer(self._buffer):
+            end = match.end()
+            candidate = self._buffer[start:end]
+            if candidate.count("[") > candidate.count("]"):
+                continue  # 태그가 아직 열려 있으면 다음 문장 끝까지 합침
+            cleaned = clean_sentence(candidate)
+            if len(cleaned) < self.min_chars:
+                continue  # 짧으면 다음 문장과 합침
+            sentences.append(cleaned)
+            start = end
+        self._buffer = self._buffer[start:]
+        return sentences
+
+    def flush(self) -> List[str]:
+        """스트림 종료 시 남은 텍스트"""
+        rest = clean_sentence(self._buffer)
+        self._buffer = ""
+        return [rest] if rest else []
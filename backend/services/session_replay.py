@@ -0,0 +1,299 @@
+"""
+아카이브된 방송 이벤트 리플레이
+
+MongoDB(batch worker가 아카이브한 컬렉션) 또는 JSONL 파일의 이벤트를
+라이브 이벤트와 같은 경로로 다시 흘려보낸다.
+- "ws": CommentEvent/GiftEvent → (gift 콤보 처리) → ws_relay.publish (run_tiktok_listener와 동일)
+- "redis": collector와 같은 Redis 버퍼 키로 rpush (batch worker로 아카이브 가능)
+  redis.asyncio로, 다음 이벤트를 기다리기 전이나 REDIS_BATCH_SIZE개마다 한 번에 rpush (이벤트 루프를 막지 않음)
+
+속도: speed=1.0 실시간, speed=N N배속, speed<=0 최대 속도
+"""
+import os
+import json
+import time
+import uuid
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Iterable, List, Optional
+
+from backend.services import ws_relay, comment_triage
+from backend.services.gift_processor import GiftComboProcessor, get_tier_table
+
+REPLAY_DIR = os.getenv("REPLAY_DIR", os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "replays")))
+
+# 실행 중/완료된 리플레이 (replay_id → SessionReplay)
+active_replays = {}
+MAX_FINISHED_REPLAYS = 50
+REDIS_BATCH_SIZE = int(os.getenv("REPLAY_REDIS_BATCH_SIZE", 200))
+
+
+def load_events_from_mongo(room_id: str, session_id: str) -> List[dict]:
+    from pymongo import MongoClient
+    client = MongoClient(os.getenv("MONGO_URI", "mongodb://localhost:27017/"))
+    try:
+        collection = client[os.getenv("MONGO_DB", "superon")][os.getenv("MONGO_BROADCAST_COLLECTION", "broadcast_logs")]
+        events = list(collection.find({"room_id": room_id, "session_id": session_id}, {"_id": 0}).sort("timestamp", 1))
+    finally:
+        client.close()
+    logging.info(f"[REPLAY] Loaded {len(events)} events from MongoDB: room_id={room_id}, session_id={session_id}")
+    return events
+
+
+def load_events_from_jsonl(path: str) -> List[dict]:
+    events = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                events.append(json.loads(line))
+    events.sort(key=lambda e: e.get("timestamp", ""))
+    logging.info(f"[REPLAY] Loaded {len(events)} events from {path}")
+    return events
+
+
+def resolve_replay_file(file_name: str) -> str:
+    """API에서 받은 파일명은 REPLAY_DIR 안의 파일만 허용"""
+    # symlink도 실제 경로 기준으로 확인
+    path = os.path.realpath(os.path.join(REPLAY_DIR, file_name))
+    if os.path.dirname(path) != os.path.realpath(REPLAY_DIR):
+        raise ValueError(f"REPLAY_DIR 밖의 파일은 사용할 수 없습니다: {file_name}")
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"리플레이 파일 없음: {file_name}")
+    return path
+
+
+def _parse_timestamp(value) -> Optional[float]:
+    if isinstance(value, datetime):
+        return value.timestamp()
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return datetime.fromisoformat(str(value)).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+def _user_of(data: dict) -> dict:
+    return data.get("user_info") or data.get("user") or data.get("from_user") or {}
+
+
+def comment_from_archived(data: dict) -> dict:
+    """아카이브된 CommentEvent → 라이브와 같은 WebSocket 메시지"""
+    user = _user_of(data)
+    return {
+        "user": user.get("nick_name") or user.get("nickname") or "",
+        "comment": data.get("content") or data.get("comment") or "",
+    }
+
+
+def gift_from_archived(data: dict) -> dict:
+    """아카이브된 GiftEvent → gift_processor.gift_from_event와 같은 형태"""
+    user = _user_of(data)
+    gift = data.get("m_gift") or data.get("gift") or {}
+    try:
+        coin = int(gift.get("diamond_count", 1))
+    except (TypeError, ValueError):
+        coin = 1
+    return {
+        "user_id": str(user.get("id") or user.get("nick_name") or ""),
+        "user_nickname": user.get("nick_name") or user.get("nickname") or "",
+        "gift_id": str(gift.get("id") or gift.get("name") or ""),
+        "gift_name": gift.get("name", ""),
+        "gift_coin": coin,
+        "repeat_count": int(data.get("repeat_count") or 1),
+        # ExtendedGift.streakable == (type == 1)
+        "streakable": gift.get("type") == 1,
+        "repeat_end": bool(data.get("repeat_end")),
+    }
+
+
+class SessionReplay:
+    def __init__(
+        self,
+        events: List[dict],
+        target_room_id: str,
+        speed: float = 1.0,
+        targets: Iterable[str] = ("ws",),
+        target_session_id: Optional[str] = None,
+        character_id: Optional[str] = None,
+    ):
+        self.replay_id = str(uuid.uuid4())
+        self.events = events
+        self.target_room_id = target_room_id
+        self.target_session_id = target_session_id or f"replay-{self.replay_id}"
+        self.speed = speed
+        self.targets = set(targets)
+        self.character_id = character_id
+        self.state = "pending"
+        self.sent = 0
+        self.max_lag_ms = 0.0
+        self.started_at = None
+        self.finished_at = None
+        self.error = None
+        self._task: Optional[asyncio.Task] = None
+        self._redis = None
+        self._redis_buffer: List[str] = []
+
+    def status(self) -> dict:
+        elapsed = None
+        if self.started_at:
+            elapsed = (self.finished_at or time.time()) - self.started_at
+        return {
+            "replay_id": self.replay_id,
+            "state": self.state,
+            "target_room_id": self.target_room_id,
+            "target_session_id": self.target_session_id,
+            "speed": self.speed,
+            "targets": sorted(self.targets),
+            "total": len(self.events),
+            "sent": self.sent,
+            "elapsed_sec": elapsed,
+            "events_per_sec": (self.sent / elapsed) if elapsed else None,
+            "max_lag_ms": self.max_lag_ms,
+            "error": self.error,
+        }
+
+    def start(self) -> asyncio.Task:
+        self._task = asyncio.create_task(self.run())
+        return self._task
+
+    def cancel(self):
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+
+    async def run(self):
+        self.state = "running"
+        self.started_at = time.time()
+        # 캐릭터 gift_tiers 조회(Supabase)는 thread에서
+        tier_table = await asyncio.to_thread(get_tier_table, self.character_id)
+        gift_processor = GiftComboProcessor(
+            emit=lambda gift_msg: ws_relay.publish(self.target_room_id, gift_msg),
+            tier_table=tier_table,
+        )
+        if "redis" in self.targets:
+            self._redis = ws_relay.get_async_redis_client()
+        redis_key = f"broadcast:{self.target_room_id}:{self.target_session_id}:events"
+
+        first_ts = None
+        clock_start = time.monotonic()
+        try:
+            for event in self.events:
+                ts = _parse_timestamp(event.get("timestamp"))
+                if self.speed > 0 and ts is not None:
+                    if first_ts is None:
+                        first_ts = ts
+                    # 시작 시각 기준으로 예약해서 누적 오차가 생기지 않게 함
+                    due = clock_start + (ts - first_ts) / self.speed
+                    delay = due - time.monotonic()
+                    if delay > 0:
+                        await self._flush_redis(redis_key)
+                        await asyncio.sleep(delay)
+                    else:
+                        self.max_lag_ms = max(self.max_lag_ms, -delay * 1000)
+                elif self.sent % 500 == 0:
+                    # 최대 속도 모드에서도 이벤트 루프를 양보
+                    await asyncio.sleep(0)
+                self._dispatch(event, gift_processor)
+                self.sent += 1
+                if len(self._redis_buffer) >= REDIS_BATCH_SIZE:
+                    await self._flush_redis(redis_key)
+            await self._flush_redis(redis_key)
+            self.state = "completed"
+        except asyncio.CancelledError:
+            self.state = "cancelled"
+        except Exception as e:
+            logging.error(f"[REPLAY] 리플레이 실패: {e}", exc_info=True)
+            self.state = "failed"
+            self.error = str(e)
+        finally:
+            gift_processor.flush_all()
+            if self._redis is not None:
+                # 취소/실패 시에도 이미 보낸 것으로 센 이벤트는 버퍼에 남기지 않음
+                try:
+                    await self._flush_redis(redis_key)
+                    await self._redis.aclose()
+                except Exception as e:
+                    logging.error(f"[REPLAY] Redis 버퍼 전송 실패: {e}")
+                self._redis = None
+            self.finished_at = time.time()
+            logging.info(f"[REPLAY] {self.replay_id} {self.state}: {self.sent}/{len(self.events)} events")
+
+    async def _flush_redis(self, redis_key: str):
+        if self._redis is None or not self._redis_buffer:
+            return
+        batch, self._redis_buffer = self._redis_buffer, []
+        await self._redis.rpush(redis_key, *batch)
+
+    def _dispatch(self, event: dict, gift_processor: GiftComboProcessor):
+        event_type = event.get("event_type")
+        data = event.get("data") or {}
+        if "ws" in self.targets and isinstance(data, dict):
+            if event_type == "CommentEvent":
+                chat = comment_from_archived(data)
+                ws_relay.publish(self.target_room_id, chat)
+                user = _user_of(data)
+                comment_triage.submit_comment(self.target_room_id, str(user.get("id") or ""), chat["user"], chat["comment"])
+            elif event_type == "GiftEvent":
+                gift = gift_from_archived(data)
+                gift_processor.push(gift)
+                if not gift["streakable"] or gift["repeat_end"]:
+                    comment_triage.record_gift(self.target_room_id, gift["user_id"], gift["gift_coin"] * gift["repeat_count"])
+        if self._redis is not None:
+            replayed = {
+                "event_type": event_type,
+                "timestamp": datetime.now(timezone.utc).isoformat(),
+                "original_timestamp": str(event.get("timestamp")),
+                "data": data,
+            }
+            self._redis_buffer.append(json.dumps(replayed, ensure_ascii=False, default=str))
+
+
+def start_replay(events: List[dict], **kwargs) -> SessionReplay:
+    """현재 이벤트 루프에서 리플레이 시작 후 registry에 등록"""
+    # 끝난 리플레이 기록은 최근 MAX_FINISHED_REPLAYS개만 유지
+    finished = [rid for rid, r in active_replays.items() if r.state not in ("pending", "running")]
+    for rid in finished[:max(0, len(finished) - MAX_FINISHED_REPLAYS + 1)]:
+        del active_replays[rid]
+    replay = SessionReplay(events, **kwargs)
+    active_replays[replay.replay_id] = replay
+    replay.start()
+    return replay
+
+
+# 터미널에서 직접 실행: python -m backend.services.session_replay --room_id <id> --session_id <id> --speed 10
+# (다른 프로세스의 WebSocket으로 보내려면 WS_RELAY_ENABLED=true 필요)
+if __name__ == "__main__":
+    import argparse
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--room_id", help="아카이브된 방송 room_id (MongoDB)")
+    parser.add_argument("--session_id", help="아카이브된 방송 session_id (MongoDB)")
+    parser.add_argument("--jsonl", help="MongoDB 대신 읽을 JSONL 파일 경로")
+    parser.add_argument("--target_room_id", help="이벤트를 보낼 room_id (기본: room_id)")
+    parser.add_argument("--speed", type=float, default=1.0, help="1=실시간, N=N배속, 0=최대 속도")
+    parser.add_argument("--targets", default="ws", help="쉼표 구분: ws,redis")
+    args = parser.parse_args()
+
+    if args.jsonl:
+        events = load_events_from_jsonl(args.jsonl)
+    elif args.room_id and args.session_id:
+        events = load_events_from_mongo(args.room_id, args.session_id)
+    else:
+        parser.error("--jsonl 또는 --room_id/--session_id가 필요합니다.")
+
+    async def _main():
+        await ws_relay.start()
+        replay = SessionReplay(
+            events,
+            target_room_id=args.target_room_id or args.room_id or "replay",
+            speed=args.speed,
+            targets=[t.strip() for t in args.targets.split(",") if t.strip()],
+        )
+        await replay.run()
+        await ws_relay.stop()
+        print(json.dumps(replay.status(), ensure_ascii=False, indent=2))
+
+    asyncio.run(_main())
@@ -3,13 +3,16 @@ import sys
 import json
 import asyncio
 from datetime import datetime, timezone
-from TikTokLive import TikTokLiveClient
 from TikTokLive.events import Event
 import redis
 from dotenv import load_dotenv
 
 load_dotenv()
 
+# subprocess로 직접 실행될 때도 backend 패키지를 import할 수 있도록
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from backend.services.event_sources import create_live_client
+
 # 환경 변수 또는 설정에서 Redis 연결 정보 로드
 def get_redis_client():
     return redis.Redis(
@@ -34,19 +37,19 @@ logging.basicConfig(
 )
 
 class TikTokLiveEventCollector:
-    def __init__(self, room_id_or_unique_id: str, session_id: str):
+    def __init__(self, room_id_or_unique_id: str, session_id: str, source: str = None):
         self.session_id = session_id
         self.redis_client = get_redis_client()
         # Determine if input is numeric room_id or unique_id
         if room_id_or_unique_id.isdigit():
             self.room_id = room_id_or_unique_id
             self.unique_id = None
-            self.client = TikTokLiveClient(room_id=int(self.room_id))
+            self.client = create_live_client(room_id=self.room_id, source=source)
             logging.info(f"[Collector] Connecting using numeric room_id={self.room_id}")
         else:
             self.unique_id = room_id_or_unique_id
             self.room_id = None
-            self.client = TikTokLiveClient(unique_id=self.unique_id)
+            self.client = create_live_client(unique_id=self.unique_id, source=source)
             logging.info(f"[Collector] Connecting using unique_id={self.unique_id}")
         self._running = False
         self._setup_event_listeners()
@@ -220,12 +223,13 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--room_id", required=True, help="TikTok account name (unique_id) or numeric room_id")
     parser.add_argument("--session_id", required=True)
+    parser.add_argument("--source", default=None, help="이벤트 소스: tiktok(기본) | synthetic")
     args = parser.parse_args()
 
     logging.info(f"[Collector] CLI started with id={args.room_id}, session_id={args.session_id}")
     print(f"[Collector] CLI started with id={args.room_id}, session_id={args.session_id}")
 
-    collector = TikTokLiveEventCollector(room_id_or_unique_id=args.room_id, session_id=args.session_id)
+    collector = TikTokLiveEventCollector(room_id_or_unique_id=args.room_id, session_id=args.session_id, source=args.source)
     print(f"[Collector] Started with PID {os.getpid()}")
 
     def handle_sigterm(signum, frame):
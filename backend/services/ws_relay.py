@@ -0,0 +1,342 @@
+"""
+WebSocket room 메시지 릴레이
+
+- 기본(단일 worker): 같은 프로세스의 websocket_clients로 바로 전송
+- WS_RELAY_ENABLED=true: 리스너가 Redis 채널(ws:room:{room_id})로 발행하고,
+  각 uvicorn worker는 자신에게 연결된 소켓이 필요로 하는 room 채널만 구독해서 전달
+  → 대시보드가 어느 worker에 붙어 있든 다른 worker의 리스너 메시지를 받을 수 있음
+"""
+import os
+import json
+import uuid
+import socket
+import asyncio
+import logging
+import traceback
+from typing import Callable, Dict, Optional
+
+RELAY_ENABLED = os.getenv("WS_RELAY_ENABLED", "false").lower() in ("1", "true", "yes")
+CHANNEL_PREFIX = os.getenv("WS_RELAY_CHANNEL_PREFIX", "ws:room:")
+CONTROL_CHANNEL = os.getenv("WS_RELAY_CONTROL_CHANNEL", "ws:control")
+LISTENER_KEY_PREFIX = "ws:listener:"
+LISTENER_TTL = int(os.getenv("WS_RELAY_LISTENER_TTL", 60))
+# 소켓 하나에 보내는 최대 시간 (넘으면 느린 클라이언트로 보고 연결 목록에서 제거)
+SEND_TIMEOUT = float(os.getenv("WS_RELAY_SEND_TIMEOUT", 5))
+
+# 모든 room 메시지를 받는 레거시 구독 키
+ALL_ROOMS = "_all"
+
+# 이 worker에 연결된 websocket 목록 (room_id별로 관리)
+websocket_clients = {}  # {room_id: set([WebSocket, ...])}
+
+# 이 worker를 구분하는 값 (리스너 소유권 표시용)
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+_main_loop: Optional[asyncio.AbstractEventLoop] = None
+_redis = None
+_pubsub = None
+_subscriber_task: Optional[asyncio.Task] = None
+_owned_listeners = set()
+_control_handlers: Dict[str, Callable] = {}
+
+
+def get_redis_client():
+    import redis
+    return redis.Redis(
+        host=os.getenv("REDIS_HOST", "localhost"),
+        port=int(os.getenv("REDIS_PORT", 6379)),
+        db=int(os.getenv("REDIS_DB", 0)),
+        username=os.getenv("REDIS_USERNAME"),
+        password=os.getenv("REDIS_PASSWORD"),
+        decode_responses=True,
+    )
+
+
+def get_async_redis_client():
+    import redis.asyncio as aioredis
+    return aioredis.Redis(
+        host=os.getenv("REDIS_HOST", "localhost"),
+        port=int(os.getenv("REDIS_PORT", 6379)),
+        db=int(os.getenv("REDIS_DB", 0)),
+        username=os.getenv("REDIS_USERNAME"),
+        password=os.getenv("REDIS_PASSWORD"),
+        decode_responses=True,
+    )
+
+
+def room_channel(room_id: str) -> str:
+    return f"{CHANNEL_PREFIX}{room_id}"
+
+
+def _sync_redis():
+    global _redis
+    if _redis is None:
+        _redis = get_redis_client()
+    return _redis
+
+
+# --- 앱 lifecycle ---
+
+async def start():
+    """앱 startup 시 호출: 메인 이벤트 루프를 기록하고, 릴레이 모드면 구독 루프 시작"""
+    global _main_loop, _pubsub, _subscriber_task
+    _main_loop = asyncio.get_running_loop()
+    if not RELAY_ENABLED or _subscriber_task is not None:
+        return
+    _pubsub = get_async_redis_client().pubsub(ignore_subscribe_messages=True)
+    # control 채널은 항상 구독 (구독이 하나도 없으면 get_message가 바로 반환됨)
+    await _pubsub.subscribe(CONTROL_CHANNEL)
+    for room_id in list(websocket_clients.keys()):
+        await _subscribe_room(room_id)
+    _subscriber_task = asyncio.create_task(_subscriber_loop())
+    logging.info(f"[WS_RELAY] Redis relay started (worker={WORKER_ID})")
+
+
+async def stop():
+    """앱 shutdown 시 호출"""
+    global _pubsub, _subscriber_task
+    if _subscriber_task is not None:
+        _subscriber_task.cancel()
+        try:
+            await asyncio.wait_for(_subscriber_task, timeout=3.0)
+        except (asyncio.CancelledError, asyncio.TimeoutError, Exception):
+            pass
+        _subscriber_task = None
+    if _pubsub is not None:
+        try:
+            await _pubsub.aclose()
+        except Exception:
+            pass
+        _pubsub = None
+    for unique_id in list(_owned_listeners):
+        await arelease_listener(unique_id)
+
+
+# --- 소켓 등록 ---
+
+async def register(room_id: str, websocket):
+    if room_id not in websocket_clients:
+        websocket_clients[room_id] = set()
+        if RELAY_ENABLED and _pubsub is not None:
+            await _subscribe_room(room_id)
+    websocket_clients[room_id].add(websocket)
+
+
+async def unregister(room_id: str, websocket):
+    clients = websocket_clients.get(room_id)
+    if clients is None:
+        return
+    clients.discard(websocket)
+    if not clients:
+        del websocket_clients[room_id]
+        if RELAY_ENABLED and _pubsub is not None:
+            await _unsubscribe_room(room_id)
+
+
+async def _subscribe_room(room_id: str):
+    if room_id == ALL_ROOMS:
+        await _pubsub.psubscribe(f"{CHANNEL_PREFIX}*")
+    else:
+        await _pubsub.subscribe(room_channel(room_id))
+
+
+async def _unsubscribe_room(room_id: str):
+    try:
+        if room_id == ALL_ROOMS:
+            await _pubsub.punsubscribe(f"{CHANNEL_PREFIX}*")
+        else:
+            await _pubsub.unsubscribe(room_channel(room_id))
+    except Exception as e:
+        logging.warning(f"[WS_RELAY] unsubscribe 실패: {room_id}: {e}")
+
+
+# --- 메시지 발행 ---
+
+def publish(room_id: str, message: dict):
+    """
+    room 메시지 발행. 어느 스레드/이벤트 루프에서 호출해도 안전하다.
+    (run_tiktok_listener는 별도 스레드의 자체 루프에서 돈다)
+    """
+    if RELAY_ENABLED:
+        try:
+            _sync_redis().publish(room_channel(room_id), json.dumps(message, ensure_ascii=False))
+            return
+        except Exception as e:
+            logging.error(f"[WS_RELAY] Redis publish 실패, 로컬 전송으로 대체: {e}")
+    _dispatch_local([room_id, ALL_ROOMS], message)
+
+
+def _dispatch_local(room_ids, message: dict):
+    if _main_loop is None or _main_loop.is_closed():
+        return
+    coro = _send_local(room_ids, message)
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    if running is _main_loop:
+        _main_loop.create_task(coro)
+    else:
+        asyncio.run_coroutine_threadsafe(coro, _main_loop)
+
+
+async def _send_local(room_ids, message: dict):
+    # 느린 소켓 하나 때문에 나머지 소켓 전송이 밀리지 않도록 동시에 보냄
+    targets = [(room_id, ws) for room_id in room_ids for ws in list(websocket_clients.get(room_id, set()))]
+    if not targets:
+        return
+    results = await asyncio.gather(
+        *(asyncio.wait_for(ws.send_json(message), SEND_TIMEOUT) for _, ws in targets),
+        return_exceptions=True,
+    )
+    for (room_id, ws), result in zip(targets, results):
+        if isinstance(result, Exception):
+            print(f"WebSocket 전송 중 예외 (room={room_id}): {result!r}")
+            await unregister(room_id, ws)
+
+
+async def _subscriber_loop():
+    while True:
+        try:
+            msg = await _pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+            await _refresh_owned_listeners()
+            if msg is None:
+                continue
+            channel = msg.get("channel", "")
+            data = json.loads(msg["data"])
+            if channel == CONTROL_CHANNEL:
+                await _handle_control(data)
+            elif msg["type"] == "pmessage":
+                # 패턴 구독은 _all 소켓 전용, room 소켓은 room 채널 구독으로 받음 (중복 방지)
+                await _send_local([ALL_ROOMS], data)
+            elif channel.startswith(CHANNEL_PREFIX):
+                await _send_local([channel[len(CHANNEL_PREFIX):]], data)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logging.error(f"[WS_RELAY] 구독 루프 예외: {e}")
+            await asyncio.sleep(1.0)
+
+
+# --- 리스너 소유권 / control 메시지 ---
+
+def claim_listener(unique_id: str) -> bool:
+    """여러 worker에서 같은 room 리스너가 중복 실행되지 않도록 소유권 획득"""
+    if not RELAY_ENABLED:
+        return True
+    try:
+        acquired = _sync_redis().set(f"{LISTENER_KEY_PREFIX}{unique_id}", WORKER_ID, nx=True, ex=LISTENER_TTL)
+    except Exception as e:
+        logging.error(f"[WS_RELAY] 리스너 소유권 확인 실패, 로컬 기준으로 진행: {e}")
+        return True
+    if acquired:
+        _owned_listeners.add(unique_id)
+    return bool(acquired)
+
+
+# 키가 만료된 뒤 다른 worker가 가져간 소유권을 지우지 않도록 값 비교와 삭제를 한 번에
+_RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+def release_listener(unique_id: str):
+    _owned_listeners.discard(unique_id)
+    if not RELAY_ENABLED:
+        return
+    try:
+        _sync_redis().eval(_RELEASE_SCRIPT, 1, f"{LISTENER_KEY_PREFIX}{unique_id}", WORKER_ID)
+    except Exception as e:
+        logging.error(f"[WS_RELAY] 리스너 소유권 해제 실패: {e}")
+
+
+def listener_owner(unique_id: str) -> Optional[str]:
+    if not RELAY_ENABLED:
+        return None
+    try:
+        return _sync_redis().get(f"{LISTENER_KEY_PREFIX}{unique_id}")
+    except Exception:
+        return None
+
+
+# async 핸들러용: 동기 Redis 호출을 이벤트 루프 밖(thread)에서 실행 (릴레이 모드가 아니면 바로 반환)
+
+async def aclaim_listener(unique_id: str) -> bool:
+    if not RELAY_ENABLED:
+        return claim_listener(unique_id)
+    return await asyncio.to_thread(claim_listener, unique_id)
+
+
+async def arelease_listener(unique_id: str):
+    if not RELAY_ENABLED:
+        return release_listener(unique_id)
+    await asyncio.to_thread(release_listener, unique_id)
+
+
+async def alistener_owner(unique_id: str) -> Optional[str]:
+    if not RELAY_ENABLED:
+        return None
+    return await asyncio.to_thread(listener_owner, unique_id)
+
+
+_last_refresh = 0.0
+
+
+async def _refresh_owned_listeners():
+    # 소유 중인 리스너 키의 TTL을 주기적으로 연장 (worker가 죽으면 자연 만료)
+    global _last_refresh
+    now = asyncio.get_running_loop().time()
+    if not _owned_listeners or now - _last_refresh < LISTENER_TTL / 3:
+        return
+    _last_refresh = now
+    # 동기 Redis 호출은 구독 루프(이벤트 루프) 밖에서
+    await asyncio.to_thread(_expire_owned_listeners, list(_owned_listeners))
+
+
+def _expire_owned_listeners(unique_ids):
+    try:
+        client = _sync_redis()
+    except Exception as e:
+        logging.warning(f"[WS_RELAY] 리스너 TTL 연장 실패: {e}")
+        return
+    for unique_id in unique_ids:
+        try:
+            client.expire(f"{LISTENER_KEY_PREFIX}{unique_id}", LISTENER_TTL)
+        except Exception as e:
+            logging.warning(f"[WS_RELAY] 리스너 TTL 연장 실패: {unique_id}: {e}")
+
+
+def on_control(action: str, handler: Callable):
+    """control 메시지 핸들러 등록 (handler(data)는 코루틴 함수)"""
+    _control_handlers[action] = handler
+
+
+def send_control(action: str, **data) -> bool:
+    """다른 worker에게 control 메시지 전송 (예: 다른 worker가 소유한 리스너 종료)"""
+    if not RELAY_ENABLED:
+        return False
+    try:
+        _sync_redis().publish(CONTROL_CHANNEL, json.dumps({"action": action, **data}, ensure_ascii=False))
+        return True
+    except Exception as e:
+        logging.error(f"[WS_RELAY] control 메시지 전송 실패: {e}")
+        return False
+
+
+async def asend_control(action: str, **data) -> bool:
+    if not RELAY_ENABLED:
+        return False
+    return await asyncio.to_thread(send_control, action, **data)
+
+
+async def _handle_control(data: dict):
+    handler = _control_handlers.get(data.get("action"))
+    if handler is None:
+        return
+    try:
+        await handler(data)
+    except Exception:
+        logging.error(f"[WS_RELAY] control 처리 실패: {traceback.format_exc()}")
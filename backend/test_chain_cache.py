@@ -0,0 +1,58 @@
+import threading
+import time
+from backend.rag.chain_cache import ChainCache
+
+class FakeIndex:
+    def __init__(self, ntotal, d=4):
+        self.ntotal = ntotal
+        self.d = d
+
+class FakeStore:
+    def __init__(self, ntotal):
+        self.index = FakeIndex(ntotal)
+        self.docstore = None
+
+def test_lru_evicts_oldest_by_count():
+    cache = ChainCache(max_entries=2, max_bytes=10**9)
+    cache.put("a", "chain-a")
+    cache.put("b", "chain-b")
+    assert cache.get("a") == "chain-a"  # a가 최근 사용
+    cache.put("c", "chain-c")
+    assert "b" not in cache and "a" in cache and "c" in cache
+    stats = cache.stats()
+    assert stats["evictions"] == 1 and stats["hits"] == 1
+
+def test_byte_limit_and_pinning():
+    cache = ChainCache(max_entries=10, max_bytes=1000)
+    cache.put("live", "chain-live", FakeStore(40))  # 40*4*4 = 640 bytes
+    cache.pin("live", owner="session-1")
+    cache.put("other", "chain-other", FakeStore(40))
+    # 한도 초과지만 live는 pin 되어 있으므로 other가 제거됨
+    assert "live" in cache and "other" not in cache
+    cache.unpin(owner="session-1")
+    cache.put("next", "chain-next", FakeStore(40))
+    assert "live" not in cache and "next" in cache
+
+def test_mapped_index_vectors_not_counted():
+    cache = ChainCache(max_entries=10, max_bytes=10**9)
+    cache.put("a", "chain-a", FakeStore(100), mapped=True)
+    assert cache.stats()["bytes"] == 0
+
+def test_get_or_load_loads_once():
+    cache = ChainCache(max_entries=10, max_bytes=10**9)
+    calls = []
+
+    def loader():
+        calls.append(1)
+        time.sleep(0.05)
+        cache.put("a", "chain-a")
+        return "chain-a"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_load("a", loader))) for _ in range(5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert results == ["chain-a"] * 5
+    assert len(calls) == 1
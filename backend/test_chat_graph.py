@@ -1,4 +1,4 @@
-from backend.services.chat_graph import run_chat_graph
+from backend.services.chat_graph import run_chat_graph, parse_batch_answers
 from dotenv import load_dotenv
 import os
 
@@ -14,3 +14,42 @@ def test_chat_graph_basic():
     assert "emotion_tag" in node_result
     assert node_result["response_text"].strip() != ""
     assert node_result["emotion_tag"] in ["happy", "sad", "angry", "neutral", "surprise", "disgust", "fear"]
+
+def test_parse_batch_answers():
+    text = "[1] 저는 사주오빠예요! [감정: happy]\n[2] 오늘은\n조심하세요. [감정: fear]"
+    assert parse_batch_answers(text, 2) == ["저는 사주오빠예요! [감정: happy]", "오늘은\n조심하세요. [감정: fear]"]
+    # 번호가 빠지면 None → 단건 호출로 대체
+    assert parse_batch_answers("[1] 안녕하세요 [감정: happy]", 2) is None
+
+def test_aprepare_state_loads_profile_off_event_loop(monkeypatch):
+    import asyncio
+    import threading
+    from backend.services import chat_graph, prompt_cache
+    threads = []
+
+    def get_chat_prefix(character_id, profile):
+        threads.append(threading.current_thread())
+        return prompt_cache.EMPTY_CHAT_PREFIX
+
+    monkeypatch.setattr(chat_graph.prompt_cache, "get_chat_prefix", get_chat_prefix)
+    state = asyncio.run(chat_graph.aprepare_state({"character_id": "c1", "chat_log": [{"content": "안녕"}]}))
+    assert state["selected_input"] == "안녕"
+    assert threads and threads[0] is not threading.main_thread()
+
+def test_afinalize_state_loads_classifier_off_event_loop(monkeypatch):
+    import asyncio
+    import threading
+    from backend.rag.parsers import emotion_classifier
+    from backend.services import chat_graph
+    threads = []
+
+    def get_classifier(character_id):
+        threads.append(threading.current_thread())
+        return emotion_classifier.classifier_from_profile({"emotion_keywords": {"fear": ["귀신"]}})
+
+    monkeypatch.setattr(emotion_classifier, "get_classifier", get_classifier)
+    monkeypatch.setattr(emotion_classifier, "_classifiers", {})
+    state = {"memory": {"character_id": "c1"}}
+    state = asyncio.run(chat_graph.afinalize_state(state, "귀신이 나올 것 같아"))
+    assert state["emotion_tag"] == "fear" and state["memory"]["last_response"] == "귀신이 나올 것 같아"
+    assert threads and threads[0] is not threading.main_thread()
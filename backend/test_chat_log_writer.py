@@ -0,0 +1,65 @@
+import time
+from backend.services.chat_log_writer import ChatLogWriter
+
+class FakeInsert:
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.batches = []
+
+    def __call__(self, rows):
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("supabase down")
+        self.batches.append(list(rows))
+
+def test_rows_are_batched_by_size_and_flushed_on_stop():
+    insert = FakeInsert()
+    writer = ChatLogWriter(insert=insert, batch_size=10, flush_interval_ms=5000)
+    writer.enqueue([{"n": i} for i in range(25)])
+    writer.stop(timeout=5)
+    assert [len(b) for b in insert.batches] == [10, 10, 5]
+    assert writer.stats["written"] == 25
+
+def test_partial_batch_is_written_after_interval():
+    insert = FakeInsert()
+    writer = ChatLogWriter(insert=insert, batch_size=100, flush_interval_ms=50)
+    writer.enqueue({"n": 1})
+    deadline = time.time() + 2
+    while not insert.batches and time.time() < deadline:
+        time.sleep(0.01)
+    assert insert.batches == [[{"n": 1}]]
+    writer.stop(timeout=5)
+
+def test_retry_with_backoff_then_success():
+    insert = FakeInsert(failures=2)
+    writer = ChatLogWriter(insert=insert, batch_size=5, flush_interval_ms=10, retry_backoff=0.01)
+    writer.enqueue([{"n": i} for i in range(3)])
+    writer.stop(timeout=5)
+    assert insert.batches == [[{"n": 0}, {"n": 1}, {"n": 2}]]
+    assert writer.stats["retries"] == 2
+
+def test_full_queue_drops_instead_of_blocking():
+    insert = FakeInsert()
+    writer = ChatLogWriter(insert=insert, max_queue=2, flush_interval_ms=10)
+    writer.start()
+    writer._queue.put_nowait({"n": "filler"})
+    writer._queue.put_nowait({"n": "filler"})
+    started = time.time()
+    writer.enqueue([{"n": i} for i in range(100)])
+    assert time.time() - started < 0.5
+    writer.stop(timeout=5)
+
+def test_bad_row_is_dropped_and_rest_of_batch_is_written():
+    written = []
+
+    def insert(rows):
+        if any(row.get("bad") for row in rows):
+            raise RuntimeError("invalid row")
+        written.extend(rows)
+
+    writer = ChatLogWriter(insert=insert, batch_size=10, flush_interval_ms=10, max_retries=1, retry_backoff=0.01)
+    rows = [{"n": i, "bad": i == 6} for i in range(10)]
+    writer.enqueue(rows)
+    writer.stop(timeout=5)
+    assert sorted(row["n"] for row in written) == [n for n in range(10) if n != 6]
+    assert writer.stats["written"] == 9 and writer.stats["failed"] == 1
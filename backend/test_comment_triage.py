@@ -0,0 +1,73 @@
+from backend.services.comment_triage import CommentTriage
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+def make_triage(**kwargs):
+    clock = FakeClock()
+    return CommentTriage(clock=clock, **kwargs), clock
+
+def test_drops_spam_and_emoji_only():
+    triage, _ = make_triage()
+    assert triage.submit("u1", "a", "🔥🔥🔥") is None
+    assert triage.submit("u2", "b", "ㅋㅋㅋㅋㅋ") is None
+    assert triage.submit("u3", "c", "follow me www.spam.com") is None
+    assert len(triage) == 0
+
+def test_question_beats_plain_comment():
+    triage, _ = make_triage()
+    triage.submit("u1", "a", "방송 잘 보고 있어요")
+    triage.submit("u2", "b", "오늘 운세 봐주세요?")
+    assert triage.pop_best()["text"] == "오늘 운세 봐주세요?"
+    assert triage.pop_best()["text"] == "방송 잘 보고 있어요"
+    assert triage.pop_best() is None
+
+def test_near_duplicates_are_merged_and_boosted():
+    triage, _ = make_triage()
+    triage.submit("u1", "a", "이름이 뭐예요?")
+    triage.submit("u2", "b", "지금 어디서 방송해요?")
+    assert triage.submit("u3", "c", "이름이 뭐예요??") is None
+    assert triage.submit("u4", "d", "이름이 뭐예요") is None
+    assert len(triage) == 2
+    best = triage.pop_best()
+    assert best["text"] == "이름이 뭐예요?"
+    assert best["duplicates"] == 2
+
+def test_gifter_and_first_time_boost():
+    triage, _ = make_triage()
+    triage.submit("regular", "r", "안녕하세요 반가워요")
+    triage.submit("regular", "r", "노래 불러줘")
+    triage.submit("gifter", "g", "오늘 기분 좋네요")
+    triage.record_gift("gifter", 500)
+    assert triage.pop_best()["user_id"] == "gifter"
+
+def test_old_comments_expire_and_queue_is_bounded():
+    triage, clock = make_triage(window_sec=10, max_queue=3)
+    for i in range(5):
+        triage.submit(f"u{i}", f"n{i}", f"서로 다른 질문 번호 {i} 입니다")
+    assert len(triage) == 3
+    clock.now += 11
+    assert triage.pop_best() is None
+
+def test_flood_from_one_user_is_dropped():
+    triage, _ = make_triage(flood_limit=2)
+    assert triage.submit("u1", "a", "첫 번째 메시지") is not None
+    assert triage.submit("u1", "a", "두 번째 다른 메시지") is not None
+    assert triage.submit("u1", "a", "세 번째 또 다른 메시지") is None
+
+def test_gift_keeps_first_time_bonus():
+    triage, _ = make_triage()
+    first = triage.submit("newbie", "n", "오늘 기분 좋네요")
+    triage.record_gift("newbie", 0)
+    assert triage.peek(1)[0]["score"] == first
+
+def test_reset_room_drops_room_state():
+    from backend.services import comment_triage
+    comment_triage.submit_comment("room-reset", "u1", "a", "방송 잘 보고 있어요")
+    comment_triage.reset_room("room-reset")
+    assert "room-reset" not in comment_triage._rooms
+    assert comment_triage.pick_comment("room-reset") is None
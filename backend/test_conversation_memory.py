@@ -0,0 +1,70 @@
+from concurrent.futures import ThreadPoolExecutor
+from backend.services.conversation_memory import ConversationMemory, count_tokens, format_turn
+
+def make_history(n):
+    return [{"role": "user" if i % 2 == 0 else "ai", "content": f"메시지 번호 {i} 입니다"} for i in range(n)]
+
+def make_memory(**kwargs):
+    calls = []
+
+    def summarize(previous, turns):
+        calls.append(len(turns))
+        return f"{previous}+{len(turns)}" if previous else f"summary:{len(turns)}"
+
+    # 요약 작업을 바로 끝내기 위해 worker 1개 executor 사용 후 shutdown으로 대기
+    executor = ThreadPoolExecutor(max_workers=1)
+    return ConversationMemory(summarize=summarize, executor=executor, **kwargs), calls, executor
+
+def test_short_history_is_kept_verbatim():
+    memory, calls, _ = make_memory(recent_turns=6)
+    summary, turns = memory.build_context("c1", "s1", make_history(4))
+    assert summary == "" and len(turns) == 3 and calls == []
+
+def test_old_turns_are_folded_incrementally():
+    memory, calls, executor = make_memory(recent_turns=4)
+    history = make_history(11)
+    memory.build_context("c1", "s1", history)
+    executor.submit(lambda: None).result()  # 요약 작업 완료 대기
+    summary, turns = memory.build_context("c1", "s1", history)
+    assert summary == "summary:6"
+    assert turns == history[6:10]
+    history += make_history(2)
+    memory.build_context("c1", "s1", history)
+    executor.submit(lambda: None).result()
+    summary, _ = memory.build_context("c1", "s1", history)
+    assert summary == "summary:6+2"
+    assert calls == [6, 2]
+
+def test_budget_limits_recent_turns():
+    memory, _, _ = make_memory(recent_turns=20)
+    history = make_history(21)
+    budget = sum(count_tokens(format_turn(t)) + 1 for t in history[15:20])
+    summary, turns = memory.build_context("c1", "s1", history, budget=budget)
+    assert turns == history[15:20]
+
+def test_long_summary_is_truncated_to_budget():
+    from backend.services.conversation_memory import SUMMARY_HEADER, format_context
+    memory, _, executor = make_memory(recent_turns=2)
+    memory.summarize = lambda previous, turns: "아주 긴 요약 " * 500
+    history = make_history(9)
+    memory.build_context("c1", "s1", history)
+    executor.submit(lambda: None).result()
+    summary, turns = memory.build_context("c1", "s1", history, budget=100)
+    assert summary and turns == []
+    assert count_tokens(SUMMARY_HEADER) + count_tokens(summary) <= 100
+    assert count_tokens(format_context(summary, turns)) <= 101
+
+def test_aget_budget_looks_up_profile_off_event_loop(monkeypatch):
+    import asyncio
+    import threading
+    from backend.services import conversation_memory
+    threads = []
+
+    def get_budget(character_id):
+        threads.append(threading.current_thread())
+        return 42
+
+    monkeypatch.setattr(conversation_memory, "get_budget", get_budget)
+    monkeypatch.setattr(conversation_memory, "_budgets", {})
+    assert asyncio.run(conversation_memory.aget_budget("c1")) == 42
+    assert threads[0] is not threading.main_thread()
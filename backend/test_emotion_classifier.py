@@ -0,0 +1,49 @@
+from backend.rag.parsers.emotion_classifier import classifier_from_profile, default_classifier
+from backend.rag.parsers.emotion_parser import EmotionOutputParser, EmotionCategory
+
+def test_tag_wins_over_keywords():
+    assert default_classifier.classify("너무 슬퍼요 ㅠㅠ [감정: happy]") == "happy"
+    assert default_classifier.classify("좋아요 [감정:  Sad ]") == "sad"
+
+def test_unknown_tag_falls_back_to_keywords():
+    assert default_classifier.classify("짜증나고 화나 [감정: 모름]") == "angry"
+
+def test_cased_keywords_and_tag_share_one_pattern():
+    classifier = classifier_from_profile({"emotion_keywords": {"happy": ["LOL"]}})
+    assert classifier.classify("lol 무서워 Lol [감정: 모름]") == "happy"
+    assert classifier.classify("LOL [감정: FEAR]") == "fear"
+    assert classifier.scores("lol [감정: fear] 불안") == {"happy": 1.0, "fear": 1.0}
+    assert default_classifier.tag("[감정 없음] 좋아 [감정: 모름] [감정:angry]") == "angry"
+
+def test_weighted_scoring_instead_of_first_match():
+    # 기존 규칙은 happy가 먼저 걸렸지만 sad 키워드가 더 많음
+    assert default_classifier.classify("좋아하던 친구가 떠나서 슬퍼, 눈물이 나") == "sad"
+    assert default_classifier.classify("그냥 그래요") == "neutral"
+
+def test_character_keywords_and_batch():
+    classifier = classifier_from_profile({"emotion_keywords": {"happy": ["대박"], "fear": {"귀신": 3.0}}})
+    assert classifier.classify_batch(["대박이다", "귀신 나올 것 같아 좋아", "평범한 날"]) == ["happy", "fear", "neutral"]
+    assert classifier_from_profile({}) is default_classifier
+
+def test_output_parser_uses_classifier():
+    assert EmotionOutputParser().parse("헉 깜짝이야").emotion == EmotionCategory.surprise
+
+def test_async_parse_loads_profile_off_event_loop(monkeypatch):
+    import asyncio
+    import threading
+    from backend.rag.parsers import emotion_classifier
+    threads = []
+
+    def get_classifier(character_id):
+        threads.append(threading.current_thread())
+        return classifier_from_profile({"emotion_keywords": {"happy": ["대박"]}})
+
+    monkeypatch.setattr(emotion_classifier, "get_classifier", get_classifier)
+    monkeypatch.setattr(emotion_classifier, "_classifiers", {})
+    result = asyncio.run(EmotionOutputParser(character_id="c1").aparse("대박이다"))
+    assert result.emotion == EmotionCategory.happy
+    assert threads and threads[0] is not threading.main_thread()
+    # 캐시에 있으면 스레드 없이 바로
+    emotion_classifier._classifiers["c2"] = default_classifier
+    assert asyncio.run(emotion_classifier.aget_classifier("c2")) is default_classifier
+    assert len(threads) == 1
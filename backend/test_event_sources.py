@@ -0,0 +1,68 @@
+import asyncio
+import time
+from collections import Counter
+from backend.services import event_sources
+from backend.services.event_sources import SyntheticEventGenerator, SyntheticLiveClient, parse_mix, create_live_client
+
+def describe(event):
+    return (type(event).__name__, event.user.id, getattr(event, "content", None), getattr(event, "count", None),
+            getattr(event, "repeat_count", None), getattr(event, "repeat_end", None))
+
+def test_same_seed_gives_same_events():
+    first = SyntheticEventGenerator(seed=7)
+    second = SyntheticEventGenerator(seed=7)
+    other = SyntheticEventGenerator(seed=8)
+    a = [describe(first.next_event()) for _ in range(300)]
+    assert a == [describe(second.next_event()) for _ in range(300)]
+    assert a != [describe(other.next_event()) for _ in range(300)]
+
+def test_event_mix_follows_weights():
+    generator = SyntheticEventGenerator(mix={"comment": 0.7, "like": 0.2, "join": 0.1}, seed=1)
+    counts = Counter(type(generator.next_event()).__name__ for _ in range(5000))
+    assert abs(counts["CommentEvent"] / 5000 - 0.7) < 0.03
+    assert abs(counts["LikeEvent"] / 5000 - 0.2) < 0.03
+    assert abs(counts["JoinEvent"] / 5000 - 0.1) < 0.03
+    assert "GiftEvent" not in counts
+
+def test_streak_gifts_end_with_repeat_end():
+    generator = SyntheticEventGenerator(mix={"gift": 1.0}, seed=3)
+    events = [generator.next_event() for _ in range(500)]
+    streak = []
+    for event in events:
+        if not event.gift.streakable:
+            assert event.repeat_count == 1 and event.repeat_end == 1
+            continue
+        streak.append(event)
+        if event.repeat_end:
+            counts = [e.repeat_count for e in streak]
+            assert counts[:-1] == list(range(1, len(counts))) and counts[-1] == counts[-2]
+            assert len({e.user.id for e in streak}) == 1
+            streak = []
+
+def test_parse_mix():
+    assert parse_mix(None) == event_sources.DEFAULT_MIX
+    assert parse_mix("comment=0.9, gift = 0.1") == {"comment": 0.9, "gift": 0.1}
+    assert parse_mix("garbage") == event_sources.DEFAULT_MIX
+
+def test_live_client_rate_handlers_and_bounded_sent_at(monkeypatch):
+    monkeypatch.setattr(event_sources, "SENT_AT_MAX", 5)
+    client = SyntheticLiveClient(unique_id="u", rate=200, max_events=40, seed=5, unique_text=True,
+                                 mix={"comment": 1.0})
+    comments = []
+
+    @client.on("CommentEvent")
+    async def on_comment(event):
+        comments.append(event.content)
+
+    started = time.monotonic()
+    asyncio.run(client.connect())
+    elapsed = time.monotonic() - started
+    assert client.emitted == 40 and len(comments) == 40
+    # 초당 200개 → 40개는 약 0.2초
+    assert 0.15 < elapsed < 1.0
+    assert list(client.sent_at) == comments[-5:]
+    assert not client.connected
+
+def test_create_live_client_synthetic():
+    client = create_live_client(unique_id="u", source="synthetic")
+    assert isinstance(client, SyntheticLiveClient) and client.room_id == "synthetic-u"
@@ -0,0 +1,84 @@
+import asyncio
+from backend.services.gift_processor import GiftComboProcessor, GiftTierTable, DEFAULT_TIER_TABLE
+
+def make_gift(repeat_count=1, repeat_end=False, streakable=True, coin=1, user_id="u1", gift_id="rose"):
+    return {
+        "user_id": user_id,
+        "user_nickname": user_id,
+        "gift_id": gift_id,
+        "gift_name": gift_id,
+        "gift_coin": coin,
+        "repeat_count": repeat_count,
+        "streakable": streakable,
+        "repeat_end": repeat_end,
+    }
+
+def test_tier_lookup_matches_legacy_thresholds():
+    assert DEFAULT_TIER_TABLE.lookup(1) == "gift_level_1"
+    assert DEFAULT_TIER_TABLE.lookup(9) == "gift_level_1"
+    assert DEFAULT_TIER_TABLE.lookup(10) == "gift_level_2"
+    assert DEFAULT_TIER_TABLE.lookup(499) == "gift_level_4"
+    assert DEFAULT_TIER_TABLE.lookup(5000) == "gift_level_7"
+
+def test_tier_table_from_profile():
+    table = GiftTierTable.from_profile({"gift_tiers": {"big": 100, "small": 0}})
+    assert table.lookup(99) == "small"
+    assert table.lookup(100) == "big"
+    # 형식이 잘못되면 기본 테이블
+    assert GiftTierTable.from_profile({"gift_tiers": [{"x": 1}]}).lookup(10) == "gift_level_2"
+
+def test_streak_emits_once_with_total_count():
+    async def run():
+        sent = []
+        processor = GiftComboProcessor(emit=sent.append, combo_timeout=5)
+        for count in range(1, 15):
+            processor.push(make_gift(repeat_count=count))
+        processor.push(make_gift(repeat_count=15, repeat_end=True))
+        return sent
+    sent = asyncio.run(run())
+    assert len(sent) == 1
+    assert sent[0]["repeat_count"] == 15
+    assert sent[0]["motion_tag"] == "gift_level_2"
+
+def test_streak_timeout_flushes_without_end_event():
+    async def run():
+        sent = []
+        processor = GiftComboProcessor(emit=sent.append, combo_timeout=0.05)
+        processor.push(make_gift(repeat_count=3))
+        await asyncio.sleep(0.1)
+        return sent
+    sent = asyncio.run(run())
+    assert [msg["repeat_count"] for msg in sent] == [3]
+
+def test_non_streakable_gifts_grouped_in_window():
+    async def run():
+        sent = []
+        processor = GiftComboProcessor(emit=sent.append, group_window=0.05)
+        processor.push(make_gift(streakable=False, coin=100))
+        processor.push(make_gift(streakable=False, coin=100))
+        processor.push(make_gift(streakable=False, coin=10, user_id="u2"))
+        await asyncio.sleep(0.1)
+        return sent
+    sent = asyncio.run(run())
+    assert sorted(msg["repeat_count"] for msg in sent) == [1, 2]
+    assert {msg["motion_tag"] for msg in sent} == {"gift_level_2", "gift_level_4"}
+
+def test_late_repeat_end_after_timeout_sends_only_new_taps():
+    async def run():
+        sent = []
+        processor = GiftComboProcessor(emit=sent.append, combo_timeout=0.1)
+        for count in range(1, 4):
+            processor.push(make_gift(repeat_count=count))
+        await asyncio.sleep(0.15)
+        # timeout 이후 같은 누적값의 repeat_end → 다시 보내지 않음
+        processor.push(make_gift(repeat_count=3, repeat_end=True))
+        processor.push(make_gift(repeat_count=3, user_id="u2"))
+        await asyncio.sleep(0.15)
+        # 늘어난 개수만 전송
+        processor.push(make_gift(repeat_count=5, repeat_end=True, user_id="u2"))
+        # repeat_end로 끝난 뒤에는 새 콤보로 처리
+        processor.push(make_gift(repeat_count=2))
+        await asyncio.sleep(0.15)
+        return sent
+    sent = asyncio.run(run())
+    assert [(msg["user_nickname"], msg["repeat_count"]) for msg in sent] == [("u1", 3), ("u2", 3), ("u2", 2), ("u1", 2)]
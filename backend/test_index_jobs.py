@@ -0,0 +1,122 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from backend.rag import index_jobs, vector_index
+from backend.rag.chain_cache import ChainCache
+from backend.rag.index_jobs import IndexJobQueue, IndexJobConflict
+
+def wait_done(queue, job_id, timeout=5):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        status = queue.status(job_id)
+        if status["status"] in (index_jobs.SUCCEEDED, index_jobs.FAILED):
+            return status
+        time.sleep(0.01)
+    raise AssertionError("job did not finish")
+
+def served(base):
+    with open(os.path.join(vector_index.current_path(base), "index.faiss")) as f:
+        return f.read()
+
+def fake_worker(release=None):
+    def worker(character_id, world_text, profile, base, build_id):
+        staging = vector_index.version_path(base, build_id)
+        os.makedirs(staging)
+        index_jobs._write_progress(staging, "embed", 0.5)
+        if release is not None:
+            release.wait(5)
+        with open(os.path.join(staging, "index.faiss"), "w") as f:
+            f.write(world_text)
+        os.remove(os.path.join(staging, index_jobs.PROGRESS_FILE))
+        return {"added": 1}
+    return worker
+
+@pytest.fixture
+def legacy(tmp_path):
+    base = tmp_path / "c1"
+    base.mkdir()
+    (base / "index.faiss").write_text("old")
+    return str(base)
+
+def test_build_publishes_new_version_and_activates(tmp_path, legacy):
+    release = threading.Event()
+    activated = []
+    queue = IndexJobQueue(str(tmp_path), ThreadPoolExecutor(1), fake_worker(release), activated.append)
+    job = queue.submit("c1", "new", {})
+    time.sleep(0.05)
+    status = queue.status(job.job_id)
+    assert status["status"] == index_jobs.RUNNING and status["progress"] == 0.5
+    # 빌드 중에는 이전 인덱스 그대로, 같은 캐릭터의 두 번째 job은 거절
+    assert served(legacy) == "old"
+    with pytest.raises(IndexJobConflict):
+        queue.submit("c1", "again", {})
+    release.set()
+    status = wait_done(queue, job.job_id)
+    assert status["status"] == index_jobs.SUCCEEDED and status["stats"] == {"added": 1}
+    assert served(legacy) == "new"
+    assert vector_index.current_version(legacy) == job.job_id
+    assert activated == ["c1"]
+    assert queue.latest("c1")["job_id"] == job.job_id
+
+def test_other_worker_sees_lock_and_status(tmp_path, legacy):
+    release = threading.Event()
+    queue = IndexJobQueue(str(tmp_path), ThreadPoolExecutor(1), fake_worker(release), lambda cid: None)
+    # 다른 API worker: 같은 저장소, 별도 registry
+    other = IndexJobQueue(str(tmp_path), ThreadPoolExecutor(1), fake_worker(), lambda cid: None)
+    job = queue.submit("c1", "new", {})
+    time.sleep(0.05)
+    with pytest.raises(IndexJobConflict) as conflict:
+        other.submit("c1", "again", {})
+    assert conflict.value.job_id == job.job_id
+    assert other.latest("c1")["status"] == index_jobs.RUNNING
+    assert other.status(job.job_id)["progress"] == 0.5
+    release.set()
+    wait_done(queue, job.job_id)
+    assert other.status(job.job_id)["status"] == index_jobs.SUCCEEDED
+    # 끝난 뒤에는 다른 worker도 빌드 가능
+    second = other.submit("c1", "newer", {})
+    wait_done(other, second.job_id)
+    assert served(legacy) == "newer"
+
+def test_publish_is_atomic_and_keeps_previous_version(tmp_path, legacy):
+    queue = IndexJobQueue(str(tmp_path), ThreadPoolExecutor(1), fake_worker(), lambda cid: None)
+    stop = threading.Event()
+    missing = []
+
+    def reader():
+        while not stop.is_set():
+            if not os.path.exists(os.path.join(vector_index.current_path(legacy), "index.faiss")):
+                missing.append(True)
+
+    thread = threading.Thread(target=reader)
+    thread.start()
+    ids = [wait_done(queue, queue.submit("c1", f"v{i}", {}).job_id)["job_id"] for i in range(4)]
+    stop.set()
+    thread.join()
+    assert not missing
+    assert served(legacy) == "v3"
+    assert sorted(os.listdir(vector_index.versions_dir(legacy))) == sorted(ids[-2:])
+    assert not os.path.exists(legacy)  # 예전 방식 디렉터리는 두 세대 뒤 삭제
+
+def test_failed_build_keeps_previous_index(tmp_path, legacy):
+    def worker(character_id, world_text, profile, base, build_id):
+        os.makedirs(vector_index.version_path(base, build_id))
+        raise RuntimeError("embedding failed")
+
+    queue = IndexJobQueue(str(tmp_path), ThreadPoolExecutor(1), worker, lambda cid: None)
+    job = queue.submit("c1", "new", {})
+    status = wait_done(queue, job.job_id)
+    assert status["status"] == index_jobs.FAILED and "embedding failed" in status["error"]
+    assert served(legacy) == "old"
+    assert not os.path.exists(vector_index.version_path(legacy, job.job_id))
+    # 실패한 뒤에는 다시 빌드 가능
+    assert queue.submit("c1", "new", {}).job_id
+
+def test_chain_cache_drops_entry_when_version_changes():
+    cache = ChainCache()
+    cache.put("c1", "chain-v1", version="v1")
+    assert cache.get("c1", "v1") == "chain-v1"
+    assert cache.get_or_load("c1", lambda: cache.put("c1", "chain-v2", version="v2"), version="v2") == "chain-v2"
+    assert cache.stats()["stale"] == 1
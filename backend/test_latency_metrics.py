@@ -0,0 +1,58 @@
+import time
+import asyncio
+import pytest
+from backend.services.latency_metrics import LatencyHistogram, LatencyMetrics, metrics, stage, trace, traced_node, server_timing
+
+def test_histogram_percentiles_within_bucket_error():
+    histogram = LatencyHistogram()
+    for ms in range(1, 1001):
+        histogram.observe(float(ms))
+    summary = histogram.summary()
+    assert summary["count"] == 1000
+    assert summary["p50_ms"] == pytest.approx(500, rel=0.2)
+    assert summary["p95_ms"] == pytest.approx(950, rel=0.2)
+    assert summary["p99_ms"] == pytest.approx(990, rel=0.2)
+    assert summary["max_ms"] == 1000
+
+def test_single_value_percentile_is_exact():
+    histogram = LatencyHistogram()
+    histogram.observe(42.0)
+    assert histogram.percentile(50) == 42.0
+    assert histogram.percentile(99) == 42.0
+
+def test_trace_collects_stages_and_nodes():
+    metrics.reset()
+
+    def node(state):
+        time.sleep(0.01)
+        return state
+
+    async def anode(state):
+        await asyncio.sleep(0.01)
+        return state
+
+    sync_node = traced_node("sample", node)
+    _, async_node = traced_node("sample_async", node, anode)
+
+    async def scenario():
+        with trace() as timings:
+            with stage("ask.build_memory"):
+                pass
+            sync_node({})
+            await async_node({})
+        return timings
+
+    timings = asyncio.run(scenario())
+    assert set(timings) == {"ask.build_memory", "node.sample", "node.sample_async"}
+    assert timings["node.sample"] >= 9
+    assert metrics.snapshot("node.")["node.sample"]["count"] == 1
+    assert "node.sample;dur=" in server_timing(timings)
+
+def test_stage_outside_trace_only_updates_histogram():
+    local = LatencyMetrics()
+    local.observe("ask.total", 5.0)
+    local.observe("ask.total", 15.0)
+    assert local.snapshot()["ask.total"]["count"] == 2
+    with stage("no.trace"):
+        pass
+    assert "no.trace" in metrics.snapshot()
@@ -0,0 +1,121 @@
+import time
+import asyncio
+import threading
+import pytest
+from backend.services.llm_governor import LLMGovernor, LLMDeadlineExceeded, TokenBucket, LIVE, PLAYGROUND
+
+def test_token_bucket_refills_over_time():
+    now = [0.0]
+    bucket = TokenBucket(60, capacity=2, clock=lambda: now[0])
+    assert bucket.wait_time(1) == 0
+    bucket.take(1)
+    bucket.take(1)
+    assert bucket.wait_time(1) == pytest.approx(1.0)
+    now[0] = 1.0
+    assert bucket.wait_time(1) == 0
+
+def test_per_character_cap_and_live_priority():
+    async def scenario():
+        governor = LLMGovernor(max_concurrency=1, per_character=1, rpm=0)
+        order = []
+        gate = asyncio.Event()
+
+        async def work(name):
+            order.append(name)
+            await gate.wait()
+            return name
+
+        first = asyncio.create_task(governor.acall(work, "first", character_id="a"))
+        await asyncio.sleep(0.01)
+        playground = asyncio.create_task(governor.acall(work, "playground", character_id="b", priority=PLAYGROUND))
+        live = asyncio.create_task(governor.acall(work, "live", character_id="c", priority=LIVE))
+        await asyncio.sleep(0.01)
+        stats = governor.stats()
+        assert stats["active"] == 1
+        assert stats["queued"] == {"live": 1, "playground": 1, "background": 0}
+        gate.set()
+        await asyncio.gather(first, playground, live)
+        return order
+
+    assert asyncio.run(scenario()) == ["first", "live", "playground"]
+
+def test_async_deadline_cancels_call():
+    async def scenario():
+        governor = LLMGovernor(rpm=0, deadline=0.05)
+        cancelled = []
+
+        async def slow():
+            try:
+                await asyncio.sleep(1)
+            except asyncio.CancelledError:
+                cancelled.append(True)
+                raise
+
+        with pytest.raises(LLMDeadlineExceeded):
+            await governor.acall(slow, character_id="a")
+        return governor, cancelled
+
+    governor, cancelled = asyncio.run(scenario())
+    assert cancelled == [True]
+    assert governor.stats()["active"] == 0
+    assert governor.stats()["deadline_exceeded"] == 1
+
+def test_sync_wait_times_out_and_frees_queue():
+    governor = LLMGovernor(max_concurrency=1, rpm=0)
+    release = threading.Event()
+    worker = threading.Thread(target=governor.call, args=(release.wait,))
+    worker.start()
+    time.sleep(0.02)
+    with pytest.raises(LLMDeadlineExceeded):
+        governor.call(lambda: None, timeout=0.05)
+    assert governor.stats()["queued"]["live"] == 0
+    release.set()
+    worker.join(2)
+    assert governor.call(lambda: "ok") == "ok"
+    assert governor.stats()["active"] == 0
+
+def test_rate_limit_delays_calls():
+    governor = LLMGovernor(rpm=600)  # 초당 10회
+    governor.requests.tokens = 0
+    started = time.monotonic()
+    governor.call(lambda: None)
+    assert time.monotonic() - started >= 0.08
+
+def test_rate_limited_waiter_is_woken_after_release():
+    # 동시 호출 한도로 대기 → release 시점에는 rate limit에 걸림 → deadline이 아니라 bucket이 찰 때 들어가야 함
+    governor = LLMGovernor(max_concurrency=1, rpm=600, deadline=3)  # 초당 10회
+    governor.requests.tokens = 1
+    release = threading.Event()
+    worker = threading.Thread(target=governor.call, args=(release.wait,))
+    worker.start()
+    time.sleep(0.02)
+    granted = []
+
+    def second():
+        started = time.monotonic()
+        governor.call(lambda: None)
+        granted.append(time.monotonic() - started)
+
+    waiter = threading.Thread(target=second)
+    waiter.start()
+    time.sleep(0.05)
+    release.set()
+    waiter.join(5)
+    worker.join(2)
+    assert granted and granted[0] < 1.0
+
+def test_async_rate_limited_waiter_is_woken_after_release():
+    async def scenario():
+        governor = LLMGovernor(max_concurrency=1, rpm=600, deadline=3)
+        governor.requests.tokens = 1
+        gate = asyncio.Event()
+        first = asyncio.create_task(governor.acall(gate.wait))
+        await asyncio.sleep(0.01)
+        started = time.monotonic()
+        second = asyncio.create_task(governor.acall(asyncio.sleep, 0))
+        await asyncio.sleep(0.05)
+        gate.set()
+        await asyncio.gather(first, second)
+        return time.monotonic() - started
+
+    assert asyncio.run(scenario()) < 1.0
@@ -0,0 +1,35 @@
+import os
+from jinja2 import Environment, FileSystemLoader
+from backend.services import prompt_cache
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(__file__), "templates", "character")
+
+def test_chat_prefix_is_stable_and_versioned():
+    prompt_cache.invalidate()
+    profile = {"instruction": "너는 사주오빠야", "examples": [{"user": "안녕", "character": "반가워"}]}
+    first = prompt_cache.rebuild("c1", profile)
+    assert prompt_cache.get_chat_prefix("c1") is first
+    assert first.text.startswith("[캐릭터 설명]\n너는 사주오빠야")
+    assert "Q: 안녕\nA: 반가워" in first.text
+    # 같은 내용을 playground에서 보내도 prefix는 byte 단위로 동일
+    assert prompt_cache.get_chat_prefix("c1", profile).text == first.text
+    updated = prompt_cache.rebuild("c1", {**profile, "instruction": "너는 점술가야"})
+    assert updated.version != first.version
+    assert prompt_cache.get_chat_prefix("c1") is updated
+
+def test_rag_prefix_escapes_braces_and_keeps_input_last():
+    prompt_cache.invalidate()
+    env = Environment(loader=FileSystemLoader(TEMPLATE_DIR))
+    kwargs = {"name": "사주오빠", "style": "{친근함}", "perspective": "", "tone": "", "world": "world", "profile": {}}
+    prefix = prompt_cache.get_rag_prefix("c1", env, "character_prompt_template_en.j2", kwargs)
+    assert "{{친근함}}" in prefix.text
+    assert prefix.text.rstrip().endswith('"{input}"')
+    assert "\n{context}\n" in prefix.text
+    assert prompt_cache.get_rag_prefix("c1", env, "character_prompt_template_en.j2", kwargs) is prefix
+
+def test_rag_prefix_keeps_context_slot():
+    from jinja2 import DictLoader
+    prompt_cache.invalidate()
+    env = Environment(loader=DictLoader({"t.j2": "{{ name }} {a}\n[참고]\n{{ context }}\n[입력]\n{{ input }}"}))
+    prefix = prompt_cache.get_rag_prefix("c2", env, "t.j2", {"name": "사주오빠"})
+    assert prefix.text == "사주오빠 {{a}}\n[참고]\n{context}\n[입력]\n{input}"
@@ -0,0 +1,84 @@
+import asyncio
+import threading
+import time
+import pytest
+from langchain_core.embeddings import Embeddings
+from backend.rag.query_batcher import MicroBatchEmbeddings
+
+class RecordingEmbeddings(Embeddings):
+    def __init__(self, delay=0.02, fail=False):
+        self.delay = delay
+        self.fail = fail
+        self.batches = []
+
+    def embed_documents(self, texts):
+        self.batches.append(len(texts))
+        time.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("model error")
+        return [[float(len(t)), float(i)] for i, t in enumerate(texts)]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+def test_concurrent_queries_share_batches_and_get_own_rows():
+    model = RecordingEmbeddings()
+    batcher = MicroBatchEmbeddings(model, max_batch=64, max_wait_ms=5)
+    texts = ["q" * n for n in range(1, 17)]
+    results = {}
+
+    def ask(text):
+        results[text] = batcher.embed_query(text)
+
+    threads = [threading.Thread(target=ask, args=(t,)) for t in texts]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert all(results[t][0] == len(t) for t in texts)
+    assert sum(model.batches) == len(texts)
+    assert len(model.batches) < len(texts)
+
+def test_single_query_is_not_delayed():
+    model = RecordingEmbeddings(delay=0)
+    batcher = MicroBatchEmbeddings(model, max_wait_ms=500)
+    started = time.perf_counter()
+    assert batcher.embed_query("hello")[0] == 5
+    assert time.perf_counter() - started < 0.2
+
+def test_errors_reach_every_waiter():
+    batcher = MicroBatchEmbeddings(RecordingEmbeddings(fail=True))
+    with pytest.raises(RuntimeError):
+        batcher.embed_query("hello")
+    # worker는 계속 살아 있음
+    batcher.embeddings.fail = False
+    assert batcher.embed_query("hi")[0] == 2
+
+def test_async_queries():
+    batcher = MicroBatchEmbeddings(RecordingEmbeddings())
+
+    async def main():
+        return await asyncio.gather(*(batcher.aembed_query("x" * n) for n in range(1, 9)))
+
+    vectors = asyncio.run(main())
+    assert [v[0] for v in vectors] == list(range(1, 9))
+
+def test_cancelled_waiter_does_not_break_batch():
+    model = RecordingEmbeddings(delay=0.05)
+    batcher = MicroBatchEmbeddings(model, max_wait_ms=5)
+
+    async def main():
+        # 첫 질문이 임베딩되는 동안 나머지가 쌓이고, 그중 하나는 기다리다 취소됨
+        first = asyncio.ensure_future(batcher.aembed_query("a"))
+        await asyncio.sleep(0.01)
+        tasks = [asyncio.ensure_future(batcher.aembed_query("b" * n)) for n in range(1, 5)]
+        await asyncio.sleep(0)
+        tasks[0].cancel()
+        results = await asyncio.wait_for(asyncio.gather(first, *tasks[1:]), 2)
+        return results
+
+    results = asyncio.run(main())
+    assert [r[0] for r in results] == [1, 2, 3, 4]
+    assert batcher._worker.is_alive()
+    # 동기 호출도 계속 동작
+    assert batcher.embed_query("hello")[0] == 5
@@ -0,0 +1,110 @@
+import threading
+from backend.rag import chain
+
+def test_import_does_not_load_models():
+    assert chain._embedding_model is None
+    assert chain._llm is None
+
+def test_splitter_is_created_once_across_threads():
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(chain.get_splitter())) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len({id(s) for s in results}) == 1
+    assert chain.splitter is results[0]
+
+def _fake_chain(monkeypatch, tmp_path, character_id, reply):
+    from langchain_core.documents import Document
+    from langchain_core.embeddings import Embeddings
+    from langchain_core.language_models import GenericFakeChatModel
+    from langchain_core.messages import AIMessage
+    from langchain_core.prompts import PromptTemplate
+    from backend.rag import vector_index
+    from backend.rag.chain_cache import character_chains
+
+    class FakeEmbeddings(Embeddings):
+        def embed_documents(self, texts):
+            return [[float(len(t)), 1.0] for t in texts]
+
+        def embed_query(self, text):
+            return [float(len(text)), 1.0]
+
+    monkeypatch.setattr(chain, "get_llm", lambda: GenericFakeChatModel(messages=iter([AIMessage(content=reply)])))
+    monkeypatch.setattr(chain.llm_governor, "priority_for", lambda session_id: chain.llm_governor.LIVE)
+    docs = [Document(page_content="The castle is in the north.", metadata={"type": "world"})]
+    vectordb, _ = vector_index.sync_index(str(tmp_path), docs, FakeEmbeddings())
+    prompt = PromptTemplate.from_template("{context}\n{input}")
+    character_chains.put(character_id, chain.build_chain(character_id, vectordb, "v1", prompt), vectordb)
+
+def test_aask_character(monkeypatch, tmp_path):
+    import asyncio
+    _fake_chain(monkeypatch, tmp_path, "async-char", "Hello there! [감정: happy]")
+    result = asyncio.run(chain.aask_character("async-char", [{"role": "user", "content": "hi"}]))
+    assert result.emotion.value == "happy"
+
+def test_astream_character_streams_tokens_then_parses(monkeypatch, tmp_path):
+    import asyncio
+    _fake_chain(monkeypatch, tmp_path, "stream-char", "The castle is far away. It is cold there.")
+
+    async def collect():
+        return [event async for event in chain.astream_character("stream-char", [{"role": "user", "content": "where?"}])]
+
+    events = asyncio.run(collect())
+    kinds = [kind for kind, _ in events]
+    assert kinds.count("token") > 1
+    assert kinds[-1] == "done" and "emotion" in kinds
+    tokens = "".join(data["text"] for kind, data in events if kind == "token")
+    assert events[-1][1]["text"] == tokens == "The castle is far away. It is cold there."
+    assert [data["text"] for kind, data in events if kind == "sentence"][0].startswith("The castle")
+
+def test_astream_character_invalid_history():
+    import asyncio
+    from backend.rag.chain_cache import character_chains
+    character_chains.put("empty-history", object())
+
+    async def collect():
+        return [event async for event in chain.astream_character("empty-history", [])]
+
+    assert asyncio.run(collect()) == [("error", {"error": "Invalid chat history"})]
+
+def test_retrieval_cache_hits_across_different_histories(monkeypatch, tmp_path):
+    from backend.rag.retrieval_cache import retrieval_cache
+    monkeypatch.setattr(chain.conversation_memory, "build_context", lambda cid, sid, turns, budget=None: "\n".join(t["content"] for t in turns[:-1]))
+    _fake_chain(monkeypatch, tmp_path, "history-char", "It is in the north. [감정: neutral]")
+    question = {"role": "user", "content": "Where is the castle?"}
+    chain.ask_character("history-char", [{"role": "user", "content": "hi"}, question])
+    before = retrieval_cache.stats()["hits"]
+    _fake_chain(monkeypatch, tmp_path, "history-char", "It is in the north. [감정: neutral]")
+    chain.ask_character("history-char", [{"role": "user", "content": "who are you?"}, {"role": "assistant", "content": "a knight"}, question])
+    assert retrieval_cache.stats()["hits"] == before + 1
+
+def test_character_prompt_includes_retrieved_context(monkeypatch, tmp_path):
+    from langchain_core.documents import Document
+    from langchain_core.embeddings import Embeddings
+    from langchain_core.messages import AIMessage
+    from langchain_core.runnables import RunnableLambda
+    from backend.rag import vector_index
+
+    class FakeEmbeddings(Embeddings):
+        def embed_documents(self, texts):
+            return [[float(len(t)), 1.0] for t in texts]
+
+        def embed_query(self, text):
+            return [float(len(text)), 1.0]
+
+    prompts = []
+
+    def fake_llm(prompt_value):
+        prompts.append(prompt_value.to_string())
+        return AIMessage(content="North. [감정: neutral]")
+
+    monkeypatch.setattr(chain, "get_llm", lambda: RunnableLambda(fake_llm))
+    docs = [Document(page_content="The dragon sleeps under the northern castle.", metadata={"type": "world"})]
+    vectordb, _ = vector_index.sync_index(str(tmp_path), docs, FakeEmbeddings())
+    prompt = chain.character_prompt("context-char", "world", {"name": "Saju", "country": "english"})
+    rag = chain.build_chain("context-char", vectordb, "v1", prompt)
+    rag.invoke({"input": "User: where is the dragon?", "query": "where is the dragon?"})
+    assert "The dragon sleeps under the northern castle." in prompts[0]
+    assert prompts[0].rstrip().endswith('"User: where is the dragon?"')
@@ -0,0 +1,71 @@
+from backend.services.response_cache import ResponseCache
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+# 글자 빈도 벡터: 철자가 거의 같으면 cosine 유사도가 높음
+def char_embed(text):
+    vector = [0.0] * 64
+    for ch in text:
+        vector[ord(ch) % 64] += 1.0
+    return vector
+
+def make_cache(**kwargs):
+    clock = FakeClock()
+    kwargs.setdefault("embed", char_embed)
+    return ResponseCache(clock=clock, **kwargs), clock
+
+def test_exact_hit_ignores_punctuation_and_case():
+    cache, _ = make_cache(semantic=False)
+    cache.store("c1", "fp", "What's your name?", "I'm Saju.")
+    assert cache.lookup("c1", "fp", "whats your name") == "I'm Saju."
+    assert cache.lookup("c2", "fp", "whats your name") is None
+    assert cache.lookup("c1", "other", "whats your name") is None
+    stats = cache.stats("c1")["c1"]
+    assert stats["exact_hits"] == 1 and stats["misses"] == 1
+
+def test_semantic_hit_above_threshold():
+    cache, _ = make_cache(threshold=0.9, semantic=True)
+    cache.store("c1", "fp", "tell my fortune please", "Good luck today.")
+    assert cache.lookup("c1", "fp", "tell my fortune pls") == "Good luck today."
+    assert cache.lookup("c1", "fp", "where do you live") is None
+    assert cache.stats("c1")["c1"]["semantic_hits"] == 1
+
+def test_ttl_and_lru_eviction():
+    cache, clock = make_cache(semantic=False, ttl_sec=10, max_entries=2)
+    cache.store("c1", "fp", "a1", "r1")
+    cache.store("c1", "fp", "a2", "r2")
+    cache.lookup("c1", "fp", "a1")
+    cache.store("c1", "fp", "a3", "r3")
+    assert cache.lookup("c1", "fp", "a2") is None
+    assert cache.lookup("c1", "fp", "a1") == "r1"
+    clock.now += 11
+    assert cache.lookup("c1", "fp", "a1") is None
+
+def test_invalidate_character():
+    cache, _ = make_cache(semantic=False)
+    cache.store("c1", "fp", "hello", "hi")
+    cache.store("c2", "fp", "hello", "hey")
+    cache.invalidate("c1")
+    assert cache.lookup("c1", "fp", "hello") is None
+    assert cache.lookup("c2", "fp", "hello") == "hey"
+
+def test_miss_vector_is_reused_by_store():
+    calls = []
+
+    def embed(text):
+        calls.append(text)
+        return char_embed(text)
+
+    cache, _ = make_cache(threshold=0.9, embed=embed, semantic=True)
+    cache.store("c1", "fp", "tell my fortune please", "Good luck today.")
+    calls.clear()
+    response, vector = cache.match("c1", "fp", "where do you live")
+    assert response is None and vector is not None
+    cache.store("c1", "fp", "where do you live", "In the castle.", vector=vector)
+    assert calls == ["where do you live"]
+    assert cache.lookup("c1", "fp", "where do you live now") == "In the castle."
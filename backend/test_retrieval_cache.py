@@ -0,0 +1,35 @@
+from backend.rag.retrieval_cache import RetrievalCache, normalize_query
+
+def test_normalized_queries_share_entry():
+    cache = RetrievalCache()
+    calls = []
+
+    def search(query):
+        calls.append(query)
+        return ["doc"]
+
+    assert cache.get_or_search("c1", "v1", "Where  is the Castle?", search) == ["doc"]
+    assert cache.get_or_search("c1", "v1", " where is the castle? ", search) == ["doc"]
+    assert len(calls) == 1
+    assert normalize_query("ＡＢＣ\n d") == "abc d"
+
+def test_new_index_version_invalidates_old_entries():
+    cache = RetrievalCache()
+    cache.put("c1", "v1", "q", ["old"])
+    cache.put("c2", "v1", "q", ["other"])
+    assert cache.get("c1", "v2", "q") is None
+    cache.put("c1", "v2", "q", ["new"])
+    assert cache.get("c1", "v1", "q") is None
+    assert cache.get("c1", "v2", "q") == ["new"]
+    assert cache.get("c2", "v1", "q") == ["other"]
+    assert cache.stats()["invalidations"] == 1
+
+def test_lru_eviction():
+    cache = RetrievalCache(max_entries=2)
+    cache.put("c1", "v1", "a", [1])
+    cache.put("c1", "v1", "b", [2])
+    cache.get("c1", "v1", "a")
+    cache.put("c1", "v1", "c", [3])
+    assert cache.get("c1", "v1", "b") is None
+    assert cache.get("c1", "v1", "a") == [1]
+    assert cache.stats()["evictions"] == 1
@@ -0,0 +1,26 @@
+from backend.services.sentence_stream import SentenceBuffer, find_emotion_tag
+
+def feed_all(buffer, tokens):
+    sentences = []
+    for token in tokens:
+        sentences.extend(buffer.feed(token))
+    return sentences + buffer.flush()
+
+def test_sentences_are_emitted_as_they_finish():
+    buffer = SentenceBuffer()
+    assert buffer.feed("A: 오늘 운세가 ") == []
+    assert buffer.feed("아주 좋네요! 재물") == ["오늘 운세가 아주 좋네요!"]
+    assert feed_all(buffer, ["운도 ", "있어요. [감정: ", "happy]"]) == ["재물운도 있어요."]
+
+def test_short_fragments_are_merged():
+    buffer = SentenceBuffer()
+    assert feed_all(buffer, ["네. ", "그럼 봐드릴게요. "]) == ["네. 그럼 봐드릴게요."]
+
+def test_open_tag_blocks_split():
+    buffer = SentenceBuffer()
+    assert buffer.feed("좋아요 [동작: 손 흔들기. ") == []
+    assert buffer.feed("웃음] 반가워요!\n") == ["좋아요 반가워요!"]
+
+def test_find_emotion_tag():
+    assert find_emotion_tag("좋아요 [감정: happy]") == "happy"
+    assert find_emotion_tag("좋아요 [감정: hap") is None
@@ -0,0 +1,119 @@
+import asyncio
+import json
+import os
+import time
+from datetime import datetime, timezone
+import pytest
+from backend.services import session_replay
+from backend.services.session_replay import SessionReplay
+
+def comment(ts, text, nick="viewer"):
+    return {"event_type": "CommentEvent", "timestamp": ts, "data": {"content": text, "user_info": {"id": 1, "nick_name": nick}}}
+
+@pytest.fixture
+def published(monkeypatch):
+    sent = []
+    monkeypatch.setattr(session_replay.ws_relay, "publish", lambda room_id, msg: sent.append((time.monotonic(), room_id, msg)))
+    monkeypatch.setattr(session_replay.comment_triage, "submit_comment", lambda *args: None)
+    return sent
+
+def test_replay_keeps_original_pacing_scaled_by_speed(published):
+    events = [comment(f"2024-01-01T00:00:0{i}", f"c{i}") for i in range(3)]
+    replay = SessionReplay(events, target_room_id="room", speed=10)
+    started = time.monotonic()
+    asyncio.run(replay.run())
+    offsets = [t - started for t, _, _ in published]
+    assert replay.state == "completed" and replay.sent == 3
+    assert [msg["comment"] for _, _, msg in published] == ["c0", "c1", "c2"]
+    # 2초 간격 → 10배속이면 0.1초 간격
+    assert offsets[1] == pytest.approx(0.1, abs=0.05)
+    assert offsets[2] == pytest.approx(0.2, abs=0.05)
+
+def test_max_speed_does_not_wait(published):
+    events = [comment(f"2024-01-01T00:0{i}:00", f"c{i}") for i in range(5)]
+    replay = SessionReplay(events, target_room_id="room", speed=0)
+    started = time.monotonic()
+    asyncio.run(replay.run())
+    assert time.monotonic() - started < 0.5
+    assert replay.sent == 5
+
+def test_redis_target_pushes_in_batches_without_blocking(monkeypatch, published):
+    class FakeAsyncRedis:
+        def __init__(self):
+            self.pushes = []
+            self.closed = False
+
+        async def rpush(self, key, *values):
+            self.pushes.append((key, [json.loads(v) for v in values]))
+
+        async def aclose(self):
+            self.closed = True
+
+    client = FakeAsyncRedis()
+    monkeypatch.setattr(session_replay.ws_relay, "get_async_redis_client", lambda: client)
+    monkeypatch.setattr(session_replay, "REDIS_BATCH_SIZE", 2)
+    events = [comment(f"2024-01-01T00:00:0{i}", f"c{i}") for i in range(5)]
+    replay = SessionReplay(events, target_room_id="room", speed=0, targets=["redis"], target_session_id="s1")
+    asyncio.run(replay.run())
+    assert [len(values) for _, values in client.pushes] == [2, 2, 1]
+    assert {key for key, _ in client.pushes} == {"broadcast:room:s1:events"}
+    assert [v["data"]["content"] for _, values in client.pushes for v in values] == [f"c{i}" for i in range(5)]
+    assert client.closed and not published
+
+def test_load_events_from_jsonl_sorts_by_timestamp(tmp_path):
+    path = tmp_path / "session.jsonl"
+    lines = [comment("2024-01-01T00:00:02", "late"), comment("2024-01-01T00:00:01", "early")]
+    path.write_text("\n".join(json.dumps(e) for e in lines) + "\n\n", encoding="utf-8")
+    events = session_replay.load_events_from_jsonl(str(path))
+    assert [e["data"]["content"] for e in events] == ["early", "late"]
+
+def test_load_events_from_mongo_and_convert_archived_events(monkeypatch):
+    import pymongo
+    queries = []
+
+    class FakeCursor(list):
+        def sort(self, key, direction):
+            queries.append(("sort", key, direction))
+            return self
+
+    class FakeClient:
+        def __init__(self, uri):
+            pass
+
+        def __getitem__(self, name):
+            return {"broadcast_logs": self}
+
+        def find(self, query, projection):
+            queries.append(("find", query, projection))
+            return FakeCursor([
+                comment(datetime(2024, 1, 1, tzinfo=timezone.utc), "hi", nick="닉네임"),
+                {"event_type": "GiftEvent", "timestamp": datetime(2024, 1, 1, 0, 0, 1, tzinfo=timezone.utc),
+                 "data": {"user_info": {"id": 7, "nick_name": "fan"}, "repeat_count": "3", "repeat_end": True,
+                          "m_gift": {"id": 5655, "name": "Rose", "diamond_count": "1", "type": 1}}},
+            ])
+
+        def close(self):
+            pass
+
+    monkeypatch.setattr(pymongo, "MongoClient", FakeClient)
+    events = session_replay.load_events_from_mongo("room", "s1")
+    assert queries[0] == ("find", {"room_id": "room", "session_id": "s1"}, {"_id": 0})
+    assert session_replay._parse_timestamp(events[0]["timestamp"]) == datetime(2024, 1, 1, tzinfo=timezone.utc).timestamp()
+    assert session_replay.comment_from_archived(events[0]["data"]) == {"user": "닉네임", "comment": "hi"}
+    gift = session_replay.gift_from_archived(events[1]["data"])
+    assert gift["user_id"] == "7" and gift["gift_coin"] == 1 and gift["repeat_count"] == 3
+    assert gift["streakable"] and gift["repeat_end"]
+
+def test_resolve_replay_file_stays_inside_replay_dir(monkeypatch, tmp_path):
+    replay_dir = tmp_path / "replays"
+    replay_dir.mkdir()
+    (replay_dir / "ok.jsonl").write_text("")
+    (tmp_path / "secret.jsonl").write_text("")
+    os.symlink(tmp_path / "secret.jsonl", replay_dir / "link.jsonl")
+    monkeypatch.setattr(session_replay, "REPLAY_DIR", str(replay_dir))
+    assert session_replay.resolve_replay_file("ok.jsonl") == os.path.realpath(replay_dir / "ok.jsonl")
+    for name in ("../secret.jsonl", str(tmp_path / "secret.jsonl"), "link.jsonl"):
+        with pytest.raises(ValueError):
+            session_replay.resolve_replay_file(name)
+    with pytest.raises(FileNotFoundError):
+        session_replay.resolve_replay_file("missing.jsonl")
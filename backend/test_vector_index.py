@@ -0,0 +1,80 @@
+import hashlib
+import pytest
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from backend.rag.embedding_cache import EmbeddingCache, CachedEmbeddings
+from backend.rag import vector_index
+from backend.rag.vector_index import sync_index, load_index, read_meta
+
+class CountingEmbeddings(Embeddings):
+    def __init__(self):
+        self.embedded = []
+
+    def _vector(self, text):
+        digest = hashlib.md5(text.encode("utf-8")).digest()
+        return [b / 255.0 for b in digest[:8]]
+
+    def embed_documents(self, texts):
+        self.embedded.extend(texts)
+        return [self._vector(t) for t in texts]
+
+    def embed_query(self, text):
+        return self._vector(text)
+
+def docs(*texts):
+    return [Document(page_content=t, metadata={"type": "world"}) for t in texts]
+
+def test_embedding_cache_roundtrip(tmp_path):
+    base = CountingEmbeddings()
+    cached = CachedEmbeddings(base, "fake", EmbeddingCache(str(tmp_path / "cache.sqlite3")))
+    first = cached.embed_documents(["a", "b", "a"])
+    second = cached.embed_documents(["b", "a", "c"])
+    assert base.embedded == ["a", "b", "c"]
+    assert first[0] == pytest.approx(second[1], rel=1e-6)
+
+def test_sync_index_is_incremental(tmp_path):
+    base = CountingEmbeddings()
+    embeddings = CachedEmbeddings(base, "fake", EmbeddingCache(str(tmp_path / "cache.sqlite3")))
+    path = str(tmp_path / "character")
+
+    _, stats = sync_index(path, docs("p1", "p2", "p3"), embeddings)
+    assert stats == {"added": 3, "removed": 0, "rebuilt": True, "total": 3, "kind": "flat"}
+
+    base.embedded.clear()
+    vectordb, stats = sync_index(path, docs("p1", "p2 수정", "p3"), embeddings)
+    assert stats == {"added": 1, "removed": 1, "rebuilt": False, "total": 3, "kind": "flat"}
+    assert base.embedded == ["p2 수정"]
+    contents = sorted(d.page_content for d in vectordb.docstore._dict.values())
+    assert contents == ["p1", "p2 수정", "p3"]
+
+    # 되돌리면 예전 chunk 임베딩은 캐시에서 가져옴
+    base.embedded.clear()
+    _, stats = sync_index(path, docs("p1", "p2", "p3"), embeddings)
+    assert stats["added"] == 1 and base.embedded == []
+
+    _, stats = sync_index(path, docs("p1", "p2", "p3"), embeddings)
+    assert stats == {"added": 0, "removed": 0, "rebuilt": False, "total": 3, "kind": "flat"}
+
+def test_index_kind_follows_size_and_hnsw_delete_rebuilds(tmp_path, monkeypatch):
+    base = CountingEmbeddings()
+    embeddings = CachedEmbeddings(base, "fake", EmbeddingCache(str(tmp_path / "cache.sqlite3")))
+    path = str(tmp_path / "character")
+    monkeypatch.setattr(vector_index, "FLAT_MAX", 3)
+
+    _, stats = sync_index(path, docs("p1", "p2"), embeddings)
+    assert stats["kind"] == "flat"
+    _, stats = sync_index(path, docs("p1", "p2", "p3", "p4"), embeddings)
+    assert stats["kind"] == "hnsw" and stats["rebuilt"]
+
+    base.embedded.clear()
+    vectordb, stats = sync_index(path, docs("p1", "p2", "p3", "p5"), embeddings)
+    assert stats["kind"] == "hnsw" and stats["rebuilt"] and stats["total"] == 4
+    assert base.embedded == ["p5"]  # 나머지는 캐시에서 재구성
+    assert read_meta(path)["kind"] == "hnsw"
+
+def test_mmap_load_searches(tmp_path):
+    embeddings = CachedEmbeddings(CountingEmbeddings(), "fake", EmbeddingCache(str(tmp_path / "cache.sqlite3")))
+    path = str(tmp_path / "character")
+    sync_index(path, docs("p1", "p2", "p3"), embeddings)
+    vectordb = load_index(path, embeddings, mmap=True)
+    assert vectordb.similarity_search("p2", k=1)[0].page_content == "p2"
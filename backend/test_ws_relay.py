@@ -0,0 +1,105 @@
+import asyncio
+import threading
+import time
+import pytest
+from backend.services import ws_relay
+
+class FakeSocket:
+    def __init__(self, delay=0.0, fail=False):
+        self.delay = delay
+        self.fail = fail
+        self.received = []
+
+    async def send_json(self, message):
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("closed")
+        self.received.append((time.monotonic(), message))
+
+@pytest.fixture(autouse=True)
+def clean_clients(monkeypatch):
+    monkeypatch.setattr(ws_relay, "_main_loop", None)
+    ws_relay.websocket_clients.clear()
+    yield
+    ws_relay.websocket_clients.clear()
+
+def test_slow_socket_does_not_delay_others_and_is_dropped(monkeypatch):
+    monkeypatch.setattr(ws_relay, "SEND_TIMEOUT", 0.2)
+    fast, slow, broken = FakeSocket(), FakeSocket(delay=1.0), FakeSocket(fail=True)
+
+    async def run():
+        for ws in (slow, fast, broken):
+            await ws_relay.register("room", ws)
+        started = time.monotonic()
+        await ws_relay._send_local(["room"], {"comment": "hi"})
+        return started, time.monotonic()
+
+    started, finished = asyncio.run(run())
+    assert fast.received[0][0] - started < 0.1
+    assert finished - started < 0.5
+    assert ws_relay.websocket_clients["room"] == {fast}
+
+def test_publish_without_relay_reaches_room_and_all_sockets(monkeypatch):
+    monkeypatch.setattr(ws_relay, "RELAY_ENABLED", False)
+    room_ws, all_ws, other_ws = FakeSocket(), FakeSocket(), FakeSocket()
+
+    async def run():
+        await ws_relay.start()
+        await ws_relay.register("room", room_ws)
+        await ws_relay.register(ws_relay.ALL_ROOMS, all_ws)
+        await ws_relay.register("other", other_ws)
+        # 리스너 스레드에서 발행하는 경우
+        thread = threading.Thread(target=ws_relay.publish, args=("room", {"comment": "hi"}))
+        thread.start()
+        thread.join()
+        await asyncio.sleep(0.05)
+
+    asyncio.run(run())
+    assert [m for _, m in room_ws.received] == [{"comment": "hi"}]
+    assert [m for _, m in all_ws.received] == [{"comment": "hi"}]
+    assert not other_ws.received
+
+def test_listener_ttl_refresh_runs_off_event_loop(monkeypatch):
+    calls = []
+
+    class FakeRedis:
+        def expire(self, key, ttl):
+            calls.append((key, ttl, threading.current_thread()))
+
+    monkeypatch.setattr(ws_relay, "_redis", FakeRedis())
+    monkeypatch.setattr(ws_relay, "_owned_listeners", {"streamer"})
+    monkeypatch.setattr(ws_relay, "_last_refresh", float("-inf"))
+    asyncio.run(ws_relay._refresh_owned_listeners())
+    assert [(key, ttl) for key, ttl, _ in calls] == [("ws:listener:streamer", ws_relay.LISTENER_TTL)]
+    assert calls[0][2] is not threading.main_thread()
+
+def test_control_message_calls_registered_handler(monkeypatch):
+    monkeypatch.setattr(ws_relay, "_control_handlers", {})
+    received = []
+
+    async def handler(data):
+        received.append(data)
+
+    ws_relay.on_control("stop_listener", handler)
+    asyncio.run(ws_relay._handle_control({"action": "stop_listener", "unique_id": "u1"}))
+    asyncio.run(ws_relay._handle_control({"action": "unknown"}))
+    assert received == [{"action": "stop_listener", "unique_id": "u1"}]
+
+def test_release_listener_compares_and_deletes_atomically_off_loop(monkeypatch):
+    calls = []
+
+    class FakeRedis:
+        def eval(self, script, numkeys, *args):
+            calls.append((script, numkeys, args, threading.current_thread()))
+            return 0
+
+    monkeypatch.setattr(ws_relay, "RELAY_ENABLED", True)
+    monkeypatch.setattr(ws_relay, "_redis", FakeRedis())
+    monkeypatch.setattr(ws_relay, "_owned_listeners", {"streamer"})
+    asyncio.run(ws_relay.arelease_listener("streamer"))
+    assert not ws_relay._owned_listeners
+    script, numkeys, args, thread = calls[0]
+    # GET 후 DELETE가 아니라 한 번의 Lua 스크립트로 (다른 worker가 다시 가져간 키는 지우지 않음)
+    assert "get" in script and "del" in script and numkeys == 1
+    assert args == ("ws:listener:streamer", ws_relay.WORKER_ID)
+    assert thread is not threading.main_thread()
@@ -0,0 +1,121 @@
+"""
+/chat/ask 경로 동시성 벤치마크 (OpenAI 호출 없이 stub LLM 사용)
+
+stub LLM은 고정 지연(--llm-latency) 후 응답을 돌려준다.
+1) sync: run_chat_graph를 threadpool(--workers)에서 실행 (기존 sync route와 동일한 구조)
+2) async: arun_chat_graph를 한 이벤트 루프에서 asyncio.gather로 실행
+
+사용법:
+  python scripts/bench_chat_concurrency.py --requests 200 --concurrency 50 --llm-latency 0.5
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+# ChatOpenAI 생성에 키가 필요하므로 더미 값 사용 (실제 호출은 stub으로 대체)
+os.environ.setdefault("OPENAI_API_KEY", "sk-bench")
+
+from langchain_core.runnables import RunnableLambda
+
+from backend.services import chat_graph, llm_governor
+
+
+def install_stub_llm(latency: float):
+    def _sync(inputs):
+        time.sleep(latency)
+        return f"{inputs['selected_input']}에 대한 답변입니다. [감정: happy]"
+
+    async def _async(inputs):
+        await asyncio.sleep(latency)
+        return f"{inputs['selected_input']}에 대한 답변입니다. [감정: happy]"
+
+    chat_graph.llm_chain = RunnableLambda(_sync, afunc=_async)
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    values = sorted(values)
+    idx = min(len(values) - 1, max(0, int(round(pct / 100.0 * (len(values) - 1)))))
+    return values[idx]
+
+
+def report(name, count, elapsed, latencies_ms):
+    print(f"\n[{name}]")
+    print(f"  requests    : {count}")
+    print(f"  elapsed     : {elapsed:.3f}s")
+    print(f"  req/sec     : {count / elapsed:.1f}" if elapsed else "  req/sec     : -")
+    if latencies_ms:
+        print(f"  latency p50 : {percentile(latencies_ms, 50):.1f} ms")
+        print(f"  latency p99 : {percentile(latencies_ms, 99):.1f} ms")
+
+
+def memory_for(i: int) -> dict:
+    return {"chat_log": [{"role": "user", "content": f"질문 {i}"}]}
+
+
+def bench_sync(args):
+    latencies = []
+
+    def one(i):
+        started = time.perf_counter()
+        chat_graph.run_chat_graph(memory=memory_for(i))
+        latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        list(pool.map(one, range(args.requests)))
+    report(f"sync run_chat_graph (threadpool {args.workers})", args.requests, time.perf_counter() - started, latencies)
+
+
+async def bench_async(args):
+    latencies = []
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def one(i):
+        async with semaphore:
+            started = time.perf_counter()
+            await chat_graph.arun_chat_graph(memory=memory_for(i))
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(args.requests)))
+    report(f"async arun_chat_graph (concurrency {args.concurrency})", args.requests, time.perf_counter() - started, latencies)
+
+
+def bench_compile(args):
+    # 요청마다 compile하던 기존 방식과 캐시된 그래프 비교
+    started = time.perf_counter()
+    for _ in range(args.compile_rounds):
+        chat_graph.build_chat_graph()
+    per_build = (time.perf_counter() - started) * 1000 / args.compile_rounds
+    started = time.perf_counter()
+    for _ in range(args.compile_rounds):
+        chat_graph.get_chat_graph()
+    per_cached = (time.perf_counter() - started) * 1000 / args.compile_rounds
+    print(f"\n[graph compile]\n  build_chat_graph : {per_build:.2f} ms\n  get_chat_graph   : {per_cached:.4f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50, help="async 동시 실행 수")
+    parser.add_argument("--workers", type=int, default=40, help="sync threadpool 크기 (anyio 기본값 40)")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="stub LLM 응답 지연(초)")
+    parser.add_argument("--compile-rounds", type=int, default=20)
+    parser.add_argument("--skip-sync", action="store_true")
+    parser.add_argument("--llm-max-concurrency", type=int, default=0,
+                        help="llm_governor 전체 동시 호출 수 (0이면 제한 없음, 그래프 자체 처리량 측정)")
+    args = parser.parse_args()
+
+    # stub LLM이므로 rate limit 없이, 동시 호출 수만 지정한 값으로
+    llm_governor.governor = llm_governor.LLMGovernor(max_concurrency=args.llm_max_concurrency, rpm=0)
+    install_stub_llm(args.llm_latency)
+    bench_compile(args)
+    if not args.skip_sync:
+        bench_sync(args)
+    asyncio.run(bench_async(args))
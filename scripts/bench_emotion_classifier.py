@@ -0,0 +1,89 @@
+"""
+감정 분류 처리량 벤치마크: 기존 방식(태그 정규식 + 감정별 any() 스캔) vs precompiled 분류기
+
+기존 방식은 처음 걸린 감정에서 멈추고, 분류기는 가중치 점수를 위해 모든 키워드를 센다.
+캐릭터별 키워드가 늘어날수록(--extra-keywords) 기존 방식은 키워드 수만큼 스캔이 늘지만
+분류기는 합쳐진 정규식 한 번으로 처리한다.
+
+사용법:
+  python scripts/bench_emotion_classifier.py --texts 20000
+  python scripts/bench_emotion_classifier.py --texts 20000 --tagged-ratio 0 --extra-keywords 50
+"""
+import os
+import re
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from backend.rag.parsers.emotion_classifier import DEFAULT_KEYWORDS, EMOTION_PRIORITY, EmotionClassifier, merge_keywords
+
+SAMPLES = [
+    "오늘 운세가 정말 좋아요! 행복한 하루 보내세요.",
+    "그런 일이 있었다니 슬퍼요. 눈물이 나네요.",
+    "헉, 깜짝 놀랐어요! 정말요?",
+    "별일 없는 하루였어요. 내일도 평범하게 지나갈 거예요.",
+    "그 사람 때문에 너무 짜증나고 화나요.",
+]
+
+
+def legacy_classify(text: str, keywords=DEFAULT_KEYWORDS) -> str:
+    # 기존 emotion_node + EmotionOutputParser와 같은 동작
+    match = re.search(r"\[감정: (.*?)\]", text)
+    if match:
+        return match.group(1)
+    lower = text.lower()
+    for emotion in EMOTION_PRIORITY:
+        if any(word in lower for word in keywords[emotion]):
+            return emotion
+    return "neutral"
+
+
+def extra_keywords(per_emotion: int, seed: int):
+    # 캐릭터별 키워드 설정을 흉내 낸 임의의 한글 단어
+    rng = random.Random(seed)
+    return {
+        emotion: ["".join(chr(rng.randint(0xAC00, 0xD7A3)) for _ in range(rng.randint(2, 3))) for _ in range(per_emotion)]
+        for emotion in EMOTION_PRIORITY
+    }
+
+
+def make_texts(count: int, tagged_ratio: float, seed: int):
+    rng = random.Random(seed)
+    texts = []
+    for _ in range(count):
+        text = " ".join(rng.choice(SAMPLES) for _ in range(rng.randint(1, 4)))
+        if rng.random() < tagged_ratio:
+            text += f" [감정: {rng.choice(EMOTION_PRIORITY)}]"
+        texts.append(text)
+    return texts
+
+
+def bench(name, fn, texts, rounds):
+    best = None
+    for _ in range(rounds):
+        started = time.perf_counter()
+        fn(texts)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    print(f"[{name}] {len(texts) / best:,.0f} texts/sec ({best * 1000:.1f} ms / {len(texts)})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--texts", type=int, default=20000)
+    parser.add_argument("--tagged-ratio", type=float, default=0.5, help="[감정: ...] 태그가 붙은 텍스트 비율")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--extra-keywords", type=int, default=0, help="감정별로 추가할 키워드 수")
+    args = parser.parse_args()
+
+    texts = make_texts(args.texts, args.tagged_ratio, args.seed)
+    keywords = merge_keywords(DEFAULT_KEYWORDS, extra_keywords(args.extra_keywords, args.seed)) if args.extra_keywords else DEFAULT_KEYWORDS
+    classifier = EmotionClassifier(keywords)
+    print(f"texts={len(texts)}, tagged_ratio={args.tagged_ratio}, keywords={sum(len(w) for w in keywords.values())}")
+    bench("legacy", lambda items: [legacy_classify(t, keywords) for t in items], texts, args.rounds)
+    bench("classifier.classify", lambda items: [classifier.classify(t) for t in items], texts, args.rounds)
+    bench("classifier.classify_batch", classifier.classify_batch, texts, args.rounds)
@@ -0,0 +1,119 @@
+"""
+FAISS 인덱스 종류별 recall / 검색 지연 / 로드 시간 벤치마크 (임베딩 모델 없이 synthetic 벡터 사용)
+
+크기마다 flat(정답 기준), hnsw, ivfpq를 만들고 recall 목표별 검색 파라미터(vector_index.SEARCH_PARAMS)로
+- recall@k (flat 결과 대비)
+- 쿼리 1개 검색 지연 p50/p99
+- 빌드 시간, 일반 로드 vs mmap 로드 시간
+을 출력한다. vector_index의 RAG_FLAT_MAX/RAG_HNSW_MAX/RAG_RECALL_TARGET 값을 정할 때 사용.
+
+사용법:
+  python scripts/bench_faiss_index.py --sizes 1000,10000,100000 --queries 200
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import faiss  # noqa: E402
+from backend.rag import vector_index  # noqa: E402
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    values = sorted(values)
+    idx = min(len(values) - 1, max(0, int(round(pct / 100.0 * (len(values) - 1)))))
+    return values[idx]
+
+
+def make_vectors(count: int, queries: int, dim: int, seed: int):
+    """
+    문서 임베딩처럼 군집이 있는 분포 (균일 난수는 근사 검색에 비현실적으로 불리함)
+    질문 벡터는 같은 군집에서 뽑음 (실제 질문도 문서 주제 근처에 있음)
+    """
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(max(count // 100, 8), dim)).astype(np.float32)
+
+    def sample(n):
+        labels = rng.integers(0, len(centers), size=n)
+        vectors = centers[labels] + 0.05 * rng.normal(size=(n, dim)).astype(np.float32) * np.sqrt(dim)
+        return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+    return sample(count), sample(queries)
+
+
+def search_latencies(index, queries, k):
+    latencies, results = [], []
+    for query in queries:
+        started = time.perf_counter()
+        _, ids = index.search(query[None, :], k)
+        latencies.append((time.perf_counter() - started) * 1000)
+        results.append(ids[0])
+    return latencies, np.array(results)
+
+
+def recall(found, truth, k):
+    return float(np.mean([len(set(f[:k]) & set(t[:k])) / k for f, t in zip(found, truth)]))
+
+
+def load_times(index, kind):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "index.faiss")
+        faiss.write_index(index, path)
+        started = time.perf_counter()
+        faiss.read_index(path)
+        normal = (time.perf_counter() - started) * 1000
+        started = time.perf_counter()
+        faiss.read_index(path, vector_index._mmap_flags(kind))
+        mmap = (time.perf_counter() - started) * 1000
+    return normal, mmap
+
+
+def bench_size(count, args):
+    vectors, queries = make_vectors(count, args.queries, args.dim, args.seed)
+    print(f"\n=== {count:,} vectors (dim {args.dim}) ===")
+
+    started = time.perf_counter()
+    flat = vector_index.build_faiss_index(vectors, "flat")
+    flat_build = time.perf_counter() - started
+    flat_lat, truth = search_latencies(flat, queries, args.k)
+    normal, mmap = load_times(flat, "flat")
+    print(f"[flat ] build {flat_build:.2f}s | p50 {percentile(flat_lat, 50):.3f} ms p99 {percentile(flat_lat, 99):.3f} ms"
+          f" | load {normal:.1f} ms, mmap {mmap:.1f} ms")
+
+    for kind in ("hnsw", "ivfpq"):
+        if kind == "ivfpq" and count < 10000:
+            continue  # 학습 데이터가 부족해 의미 없음
+        started = time.perf_counter()
+        index = vector_index.build_faiss_index(vectors, kind)
+        build = time.perf_counter() - started
+        normal, mmap = load_times(index, kind)
+        print(f"[{kind:5}] build {build:.2f}s | load {normal:.1f} ms, mmap {mmap:.1f} ms")
+        for target, _ in vector_index.SEARCH_PARAMS:
+            vector_index.tune(index, target)
+            latencies, found = search_latencies(index, queries, args.k)
+            if kind == "hnsw":
+                param = f"efSearch={index.hnsw.efSearch}"
+            else:
+                param = f"nprobe={faiss.extract_index_ivf(index).nprobe}, k_factor={index.k_factor:g}"
+            print(f"    target {target:.2f} ({param:22}) recall@{args.k} {recall(found, truth, args.k):.3f}"
+                  f" | p50 {percentile(latencies, 50):.3f} ms p99 {percentile(latencies, 99):.3f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="1000,10000,100000")
+    parser.add_argument("--dim", type=int, default=384, help="bge-small-en-v1.5 = 384")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    for size in (int(s) for s in args.sizes.split(",")):
+        bench_size(size, args)
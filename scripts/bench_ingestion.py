@@ -0,0 +1,158 @@
+"""
+라이브 이벤트 수집 경로 벤치마크 (실제 TikTok 방송 없이 synthetic 이벤트 사용)
+
+1) collector → Redis → batch worker → MongoDB
+2) run_tiktok_listener → ws_relay → WebSocket (인프로세스 가짜 소켓)
+
+사용법 (Redis/MongoDB 실행 중이어야 함):
+  python scripts/bench_ingestion.py --events 5000 --rate 0
+  python scripts/bench_ingestion.py --events 2000 --rate 500 --skip-collector
+"""
+import os
+import sys
+import time
+import uuid
+import asyncio
+import argparse
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    values = sorted(values)
+    idx = min(len(values) - 1, max(0, int(round(pct / 100.0 * (len(values) - 1)))))
+    return values[idx]
+
+
+def report(name, count, elapsed, latencies_ms):
+    print(f"\n[{name}]")
+    print(f"  events      : {count}")
+    print(f"  elapsed     : {elapsed:.3f}s")
+    print(f"  events/sec  : {count / elapsed:.1f}" if elapsed else "  events/sec  : -")
+    if latencies_ms:
+        print(f"  latency p50 : {percentile(latencies_ms, 50):.2f} ms")
+        print(f"  latency p99 : {percentile(latencies_ms, 99):.2f} ms")
+        print(f"  latency max : {max(latencies_ms):.2f} ms")
+
+
+async def bench_collector(args):
+    from backend.services.tiktoklive_event_collector import TikTokLiveEventCollector
+    from backend.services.tiktoklive_batch_worker import TikTokLiveBatchWorker
+
+    room_id = f"bench-{uuid.uuid4().hex[:8]}"
+    session_id = str(uuid.uuid4())
+    collector = TikTokLiveEventCollector(room_id_or_unique_id=room_id, session_id=session_id, source="synthetic")
+    client = collector.client
+
+    # rpush 완료 시점으로 이벤트별 지연 측정 (synthetic_sent_at → Redis 반영)
+    latencies_ms = []
+    original_rpush = collector.redis_client.rpush
+
+    def timed_rpush(key, value):
+        result = original_rpush(key, value)
+        sent_at = _sent_at_from_json(value)
+        if sent_at:
+            latencies_ms.append((time.time() - sent_at) * 1000)
+        return result
+    collector.redis_client.rpush = timed_rpush
+
+    async def stop_when_done():
+        while client.emitted < args.events or client.connected:
+            await asyncio.sleep(0.05)
+        collector.request_shutdown()
+
+    started = time.perf_counter()
+    await asyncio.gather(collector.run(), stop_when_done())
+    elapsed = time.perf_counter() - started
+    report("collector → Redis", len(latencies_ms), elapsed, latencies_ms)
+
+    # collector는 unique_id 기준 키를 쓰므로 batch worker에도 같은 id 전달
+    worker = TikTokLiveBatchWorker(room_id=room_id, session_id=session_id)
+    started = time.perf_counter()
+    events = worker.fetch_events_from_redis()
+    worker.archive_to_mongodb(events)
+    worker.cleanup_redis()
+    elapsed = time.perf_counter() - started
+    report("Redis → batch worker → MongoDB", len(events), elapsed, [])
+    if not args.keep:
+        worker.collection.delete_many({"room_id": room_id, "session_id": session_id})
+
+
+def _sent_at_from_json(value):
+    import json
+    try:
+        return json.loads(value)["data"].get("synthetic_sent_at")
+    except Exception:
+        return None
+
+
+class BenchSocket:
+    def __init__(self, sent_at_lookup):
+        self.sent_at_lookup = sent_at_lookup
+        self.received = 0
+        self.latencies_ms = []
+
+    async def send_json(self, message):
+        self.received += 1
+        sent_at = self.sent_at_lookup(message)
+        if sent_at:
+            self.latencies_ms.append((time.time() - sent_at) * 1000)
+
+
+async def bench_listener(args):
+    from backend.services import ws_relay
+    from backend.routers.tiktok import run_tiktok_listener, active_clients
+
+    unique_id = f"bench-{uuid.uuid4().hex[:8]}"
+    await ws_relay.start()
+
+    def lookup(message):
+        client = active_clients.get(unique_id)
+        if client is None or "comment" not in message:
+            return None
+        return client.sent_at.get(message["comment"])
+
+    sockets = [BenchSocket(lookup) for _ in range(args.sockets)]
+    for ws in sockets:
+        await ws_relay.register(unique_id, ws)
+
+    started = time.perf_counter()
+    await asyncio.to_thread(run_tiktok_listener, unique_id, 0)
+    # 마지막 메시지가 소켓까지 전달될 시간
+    await asyncio.sleep(0.5)
+    elapsed = time.perf_counter() - started
+    latencies = [lat for ws in sockets for lat in ws.latencies_ms]
+    report(f"listener → WebSocket x{args.sockets}", sum(ws.received for ws in sockets), elapsed, latencies)
+    await ws_relay.stop()
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--events", type=int, default=2000, help="생성할 이벤트 수")
+    parser.add_argument("--rate", type=float, default=0, help="초당 이벤트 수 (0=최대 속도)")
+    parser.add_argument("--mix", default=None, help="예: comment=0.6,like=0.25,join=0.1,gift=0.05")
+    parser.add_argument("--sockets", type=int, default=10, help="listener 벤치마크의 WebSocket 수")
+    parser.add_argument("--skip-collector", action="store_true")
+    parser.add_argument("--skip-listener", action="store_true")
+    parser.add_argument("--keep", action="store_true", help="MongoDB에 아카이브된 벤치마크 이벤트 유지")
+    args = parser.parse_args()
+
+    # event_sources는 import 시점에 환경 변수를 읽으므로 먼저 설정
+    os.environ["TIKTOK_EVENT_SOURCE"] = "synthetic"
+    os.environ["SYNTHETIC_EVENT_RATE"] = str(args.rate)
+    os.environ["SYNTHETIC_MAX_EVENTS"] = str(args.events)
+    os.environ["SYNTHETIC_UNIQUE_TEXT"] = "true"
+    os.environ["SYNTHETIC_EVENT_SEED"] = "42"
+    if args.mix:
+        os.environ["SYNTHETIC_EVENT_MIX"] = args.mix
+
+    if not args.skip_collector:
+        await bench_collector(args)
+    if not args.skip_listener:
+        await bench_listener(args)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,112 @@
+"""
+질문 임베딩 micro-batching 벤치마크 (backend/rag/query_batcher.py)
+
+동시 질문 수(1~64)마다 같은 개수의 질문을
+1) direct : 요청 thread마다 embed_query (1행 forward pass)
+2) batched: MicroBatchEmbeddings.embed_query (worker가 모아서 한 번에)
+로 임베딩해서 처리량(queries/s), 지연 p50/p99, 평균 batch 크기를 출력한다.
+
+기본은 실제 임베딩 모델(RAG_EMBEDDING_MODEL, langchain_huggingface 필요).
+--synthetic: 모델 없이 numpy로 bge-small 크기(384차원, 12층)의 행렬 연산을 흉내 냄 (CPU batching 효과 확인용)
+
+사용법:
+  python scripts/bench_query_batching.py --concurrency 1,2,4,8,16,32,64 --queries 256
+  python scripts/bench_query_batching.py --synthetic
+"""
+import os
+import sys
+import time
+import argparse
+import threading
+from typing import List
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from langchain_core.embeddings import Embeddings  # noqa: E402
+from backend.rag.query_batcher import MicroBatchEmbeddings  # noqa: E402
+
+
+class SyntheticEncoder(Embeddings):
+    """토큰 32개 × 384차원을 12층 feed-forward로 통과시키는 가짜 인코더 (호출당 고정 비용 + 행 수에 비례하는 비용)"""
+
+    def __init__(self, dim: int = 384, layers: int = 12, tokens: int = 32, seed: int = 0):
+        rng = np.random.default_rng(seed)
+        self.tokens = tokens
+        self.weights = [
+            (rng.normal(scale=dim ** -0.5, size=(dim, dim * 4)).astype(np.float32),
+             rng.normal(scale=(dim * 4) ** -0.5, size=(dim * 4, dim)).astype(np.float32))
+            for _ in range(layers)
+        ]
+        self.dim = dim
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        x = np.full((len(texts) * self.tokens, self.dim), 0.01, dtype=np.float32)
+        for w1, w2 in self.weights:
+            x = x + np.maximum(x @ w1, 0) @ w2
+        pooled = x.reshape(len(texts), self.tokens, self.dim).mean(axis=1)
+        return (pooled / np.linalg.norm(pooled, axis=1, keepdims=True)).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    values = sorted(values)
+    idx = min(len(values) - 1, max(0, int(round(pct / 100.0 * (len(values) - 1)))))
+    return values[idx]
+
+
+def run(embed, concurrency: int, total: int) -> dict:
+    latencies = []
+    lock = threading.Lock()
+    per_thread = max(1, total // concurrency)
+
+    def worker(n):
+        for i in range(per_thread):
+            started = time.perf_counter()
+            embed(f"viewer {n} question {i}")
+            with lock:
+                latencies.append((time.perf_counter() - started) * 1000)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(concurrency)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+    return {"qps": len(latencies) / elapsed, "p50": percentile(latencies, 50), "p99": percentile(latencies, 99)}
+
+
+def load_model(synthetic: bool) -> Embeddings:
+    if synthetic:
+        return SyntheticEncoder()
+    from langchain_huggingface import HuggingFaceEmbeddings
+    return HuggingFaceEmbeddings(model_name=os.getenv("RAG_EMBEDDING_MODEL", "BAAI/bge-small-en-v1.5"))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", default="1,2,4,8,16,32,64")
+    parser.add_argument("--queries", type=int, default=256, help="동시 질문 수마다 임베딩할 질문 수")
+    parser.add_argument("--wait-ms", type=float, default=5)
+    parser.add_argument("--max-batch", type=int, default=64)
+    parser.add_argument("--synthetic", action="store_true", help="임베딩 모델 대신 numpy 가짜 인코더")
+    args = parser.parse_args()
+
+    model = load_model(args.synthetic)
+    model.embed_query("warmup")
+    print(f"{'conc':>4} | {'direct q/s':>10} {'p50':>8} {'p99':>8} | {'batched q/s':>11} {'p50':>8} {'p99':>8}"
+          f" {'avg batch':>9} | speedup")
+    for concurrency in (int(c) for c in args.concurrency.split(",")):
+        direct = run(model.embed_query, concurrency, args.queries)
+        batcher = MicroBatchEmbeddings(model, max_batch=args.max_batch, max_wait_ms=args.wait_ms)
+        batched = run(batcher.embed_query, concurrency, args.queries)
+        avg_batch = batcher.stats["queries"] / max(batcher.stats["batches"], 1)
+        print(f"{concurrency:>4} | {direct['qps']:>10.1f} {direct['p50']:>6.1f}ms {direct['p99']:>6.1f}ms"
+              f" | {batched['qps']:>11.1f} {batched['p50']:>6.1f}ms {batched['p99']:>6.1f}ms {avg_batch:>9.1f}"
+              f" | x{batched['qps'] / direct['qps']:.2f}")
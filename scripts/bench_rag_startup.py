@@ -0,0 +1,63 @@
+"""
+rag/chain import 비용 벤치마크 (lazy 로딩 전후 비교)
+
+각 측정은 새 python 프로세스에서 실행한다 (이미 import된 모듈/모델 캐시의 영향 없음).
+1) lazy  : import backend.rag.chain 만 (현재 동작, 모델은 첫 사용 때 로드)
+2) eager : import 직후 warmup() (예전처럼 import 시점에 임베딩/LLM을 만들던 동작과 같은 비용)
+시간과 최대 RSS(MB)를 출력한다.
+
+사용법:
+  python scripts/bench_rag_startup.py --rounds 3
+"""
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+CHILD = """
+import json, time, resource
+started = time.perf_counter()
+import backend.rag.chain as chain
+imported = time.perf_counter() - started
+warmup = chain.warmup() if {eager} else {{}}
+total = time.perf_counter() - started
+print(json.dumps({{
+    "import_ms": imported * 1000,
+    "total_ms": total * 1000,
+    "warmup": warmup,
+    "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+}}))
+"""
+
+
+def run(eager: bool) -> dict:
+    env = {**os.environ, "OPENAI_API_KEY": os.getenv("OPENAI_API_KEY", "sk-bench")}
+    out = subprocess.run(
+        [sys.executable, "-c", CHILD.format(eager=eager)],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def report(name, results):
+    best = min(results, key=lambda r: r["total_ms"])
+    print(f"\n[{name}] (best of {len(results)})")
+    print(f"  import      : {best['import_ms']:.0f} ms")
+    print(f"  total       : {best['total_ms']:.0f} ms")
+    if best["warmup"]:
+        print(f"  warmup      : {best['warmup']}")
+    print(f"  max RSS     : {best['max_rss_mb']:.0f} MB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--skip-eager", action="store_true", help="모델 다운로드/로드 없이 lazy import만 측정")
+    args = parser.parse_args()
+
+    report("lazy import", [run(False) for _ in range(args.rounds)])
+    if not args.skip_eager:
+        report("eager (import + warmup)", [run(True) for _ in range(args.rounds)])
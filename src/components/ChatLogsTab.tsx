@@ -52,6 +52,8 @@ const ChatLogsTab: React.FC = () => {
   const [selectedDate, setSelectedDate] = useState<Dayjs | null>(null);
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState<string | null>(null);
+  // /chat/logs는 최신순 페이지 단위로 내려주고, 다음 페이지가 있으면 X-Next-Cursor 헤더를 줌
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
 
   // Fetch character list for filter
   useEffect(() => {
@@ -77,20 +79,22 @@ const ChatLogsTab: React.FC = () => {
       .catch(() => setError('FastAPI 서버에서 세션 목록을 불러오지 못했습니다.'));
   }, [selectedCharacters]);
 
-  // Fetch chat logs
-  const fetchLogs = () => {
+  // Fetch chat logs (cursor가 있으면 다음 페이지를 이어 붙임)
+  const fetchLogs = (cursor: string | null = null) => {
     setLoading(true);
     setError(null);
     let url = `${BASE_URL}/chat/logs?`;
     if (selectedCharacters) url += `characters_id=${selectedCharacters}&`;
     if (selectedSession) url += `session_id=${selectedSession}&`;
     if (selectedDate) url += `date=${selectedDate.format('YYYY-MM-DD')}&`;
+    if (cursor) url += `cursor=${encodeURIComponent(cursor)}&`;
     fetch(url)
       .then(res => {
         if (!res.ok) throw new Error('FastAPI 서버에서 채팅 로그를 불러오지 못했습니다.');
+        setNextCursor(res.headers.get('X-Next-Cursor'));
         return res.json();
       })
-      .then(data => setLogs(data))
+      .then(data => setLogs(prev => (cursor ? [...prev, ...data] : data)))
       .catch(() => setError('FastAPI 서버에서 채팅 로그를 불러오지 못했습니다.'))
       .finally(() => setLoading(false));
   };
@@ -144,7 +148,7 @@ const ChatLogsTab: React.FC = () => {
             slotProps={{ textField: { size: 'small' } }}
           />
         </Box>
-        <Button variant="outlined" onClick={fetchLogs} disabled={loading}>
+        <Button variant="outlined" onClick={() => fetchLogs()} disabled={loading}>
           새로고침
         </Button>
       </Box>
@@ -200,6 +204,13 @@ const ChatLogsTab: React.FC = () => {
             </TableBody>
           </Table>
         </TableContainer>
+        {nextCursor && (
+          <Box mt={2} display="flex" justifyContent="center">
+            <Button variant="outlined" onClick={() => fetchLogs(nextCursor)} disabled={loading}>
+              {loading ? '로딩 중...' : '더 보기'}
+            </Button>
+          </Box>
+        )}
       </Box>
     </Box>
   );